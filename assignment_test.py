@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+import requests
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+def register(user_type, **extra):
+    response = requests.post(f"{API_URL}/auth/register", json={
+        "email": f"{user_type}_assignment_{uuid.uuid4()}@example.com",
+        "password": "SecurePass123!",
+        "name": f"Assignment Test {user_type.title()}",
+        "user_type": user_type,
+        **extra
+    })
+    assert response.status_code == 200, f"Failed to register {user_type}: {response.text}"
+    body = response.json()
+    return body['user']['id'], {"Authorization": f"Bearer {body['access_token']}"}
+
+class TestClassAssignments(unittest.TestCase):
+    """Test class assignments: one shared test per class, submissions tracked per student"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.teacher_id, cls.teacher = register("teacher", school_name="Assignment High")
+        response = requests.post(f"{API_URL}/teacher/classes", headers=cls.teacher, json={
+            "subject": "math", "class_name": "Assignment Period 1", "grade_level": "9th"
+        })
+        assert response.status_code == 200, response.text
+        cls.class_id, join_code = response.json()['class_id'], response.json()['join_code']
+
+        cls.students = []
+        for _ in range(2):
+            student_id, headers = register("student", grade_level="9th")
+            response = requests.post(f"{API_URL}/student/join-class", headers=headers, json={"join_code": join_code})
+            assert response.status_code == 200, response.text
+            cls.students.append((student_id, headers))
+        cls.outsider_id, cls.outsider = register("student", grade_level="9th")
+
+    def create_assignment(self, due_date):
+        response = requests.post(f"{API_URL}/teacher/assignments", headers=self.teacher, json={
+            "class_id": self.class_id,
+            "title": f"Algebra check {uuid.uuid4().hex[:6]}",
+            "topics": ["Linear Equations"],
+            "difficulty": "easy",
+            "question_count": 5,
+            "due_date": due_date.isoformat(),
+            "use_stored_questions": True
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def submit(self, assignment_id, headers, answers):
+        response = requests.post(f"{API_URL}/student/assignments/{assignment_id}/submit", headers=headers,
+                                 json={"student_answers": answers, "time_taken": 120})
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_01_every_student_gets_the_same_test_without_answers(self):
+        """Members fetch one shared test with no answer key; outsiders get a 404"""
+        print("\n🔍 Testing assignment creation and fetch...")
+        assignment = self.create_assignment(datetime.utcnow() + timedelta(days=7))
+        self.assertEqual(assignment['question_count'], 5)
+
+        tests = [
+            requests.get(f"{API_URL}/student/assignments/{assignment['id']}", headers=headers).json()
+            for _, headers in self.students
+        ]
+        self.assertEqual([q['id'] for q in tests[0]['questions']], assignment['question_ids'])
+        self.assertEqual(tests[0]['questions'], tests[1]['questions'])
+        for question in tests[0]['questions']:
+            self.assertNotIn('correct_answer', question)
+            self.assertNotIn('explanation', question)
+
+        response = requests.get(f"{API_URL}/student/assignments/{assignment['id']}", headers=self.outsider)
+        self.assertEqual(response.status_code, 404)
+        response = requests.post(f"{API_URL}/student/assignments/{assignment['id']}/submit", headers=self.outsider,
+                                 json={"student_answers": {}, "time_taken": 0})
+        self.assertEqual(response.status_code, 404)
+        print("✅ Shared assignment test passed")
+
+    def test_02_first_submission_is_graded_and_late_status_sticks(self):
+        """The first submission is graded; re-attempts neither earn XP nor change lateness"""
+        print("\n🔍 Testing assignment submissions and status...")
+        on_time = self.create_assignment(datetime.utcnow() + timedelta(days=7))
+        past_due = self.create_assignment(datetime.utcnow() - timedelta(days=1))
+        (first_id, first), (second_id, _) = self.students
+
+        test = requests.get(f"{API_URL}/student/assignments/{on_time['id']}", headers=first).json()
+        result = self.submit(on_time['id'], first, {q['id']: (q.get('options') or [''])[0] for q in test['questions']})
+        self.assertTrue(result['graded'])
+        self.assertFalse(result['late'])
+        self.assertEqual(len(result['question_results']), 5)
+        self.assertIn('correct_answer', result['question_results'][0])
+
+        # A perfect re-attempt is practice: the graded score, XP and on-time status stay
+        perfect = {q['question_id']: q['correct_answer'] for q in result['question_results']}
+        again = self.submit(on_time['id'], first, perfect)
+        self.assertFalse(again['graded'])
+        self.assertEqual(again['xp_earned'], 0)
+        self.assertEqual(again['graded_score'], result['score'])
+        self.assertEqual(again['attempts'], 2)
+
+        late = self.submit(past_due['id'], first, perfect)
+        self.assertTrue(late['late'])
+
+        progress = requests.get(f"{API_URL}/teacher/assignments/{on_time['id']}", headers=self.teacher).json()
+        statuses = {row['student_id']: row for row in progress['students']}
+        self.assertEqual(statuses[first_id]['status'], "submitted")
+        self.assertEqual(statuses[first_id]['attempts'], 2)
+        self.assertEqual(statuses[first_id]['score'], result['score'])
+        self.assertEqual(statuses[second_id]['status'], "pending")
+
+        progress = requests.get(f"{API_URL}/teacher/assignments/{past_due['id']}", headers=self.teacher).json()
+        statuses = {row['student_id']: row['status'] for row in progress['students']}
+        self.assertEqual(statuses, {first_id: "late", second_id: "missing"})
+        print("✅ Assignment submission test passed")
+
+    def test_03_list_routes(self):
+        """Teachers see submission counts per assignment; students see their own status"""
+        print("\n🔍 Testing assignment lists...")
+        assignment = self.create_assignment(datetime.utcnow() + timedelta(days=3))
+        (_, first), (_, second) = self.students
+        self.submit(assignment['id'], first, {})
+
+        response = requests.get(f"{API_URL}/teacher/classes/{self.class_id}/assignments", headers=self.teacher)
+        self.assertEqual(response.status_code, 200, response.text)
+        listed = {row['id']: row for row in response.json()}
+        self.assertEqual(listed[assignment['id']]['submitted'], 1)
+        self.assertEqual(listed[assignment['id']]['roster_size'], 2)
+        self.assertNotIn('question_ids', listed[assignment['id']])
+
+        statuses = [
+            {row['id']: row['status'] for row in requests.get(f"{API_URL}/student/assignments", headers=headers).json()}
+            for headers in (first, second)
+        ]
+        self.assertEqual(statuses[0][assignment['id']], "submitted")
+        self.assertEqual(statuses[1][assignment['id']], "pending")
+
+        outsider = requests.get(f"{API_URL}/student/assignments", headers=self.outsider).json()
+        self.assertNotIn(assignment['id'], [row['id'] for row in outsider])
+
+        other_teacher = register("teacher", school_name="Other High")[1]
+        response = requests.get(f"{API_URL}/teacher/classes/{self.class_id}/assignments", headers=other_teacher)
+        self.assertEqual(response.status_code, 404)
+        print("✅ Assignment list test passed")
+
+    def test_04_practice_routes_do_not_grade_assignment_questions(self):
+        """Assignment questions posted to /practice/submit are rejected, so no answers leak into the results"""
+        print("\n🔍 Testing assignment questions on the practice routes...")
+        assignment = self.create_assignment(datetime.utcnow() + timedelta(days=7))
+        (_, first), _ = self.students
+        test = requests.get(f"{API_URL}/student/assignments/{assignment['id']}", headers=first).json()
+        question_ids = [q['id'] for q in test['questions']]
+
+        response = requests.post(f"{API_URL}/practice/submit", headers=first, json={
+            "test_id": str(uuid.uuid4()),
+            "questions": question_ids,
+            "student_answers": {question_id: "A" for question_id in question_ids},
+            "time_taken": 60
+        })
+        self.assertEqual(response.status_code, 403, response.text)
+
+        # Listing the questions without answering them is rejected too
+        response = requests.post(f"{API_URL}/practice/submit", headers=self.outsider, json={
+            "test_id": str(uuid.uuid4()), "questions": question_ids, "student_answers": {}, "time_taken": 0
+        })
+        self.assertEqual(response.status_code, 403, response.text)
+
+        response = requests.get(f"{API_URL}/practice/results", headers=first)
+        self.assertEqual(response.status_code, 200, response.text)
+        for result in response.json():
+            for question in result['question_results']:
+                if question['question_id'] in question_ids:
+                    self.assertIsNone(question['correct_answer'])
+                    self.assertIsNone(question['explanation'])
+        print("✅ Practice routes reject assignment questions")
+
+if __name__ == "__main__":
+    unittest.main()
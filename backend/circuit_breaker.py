@@ -0,0 +1,106 @@
+"""Circuit breaker for a flaky dependency.
+
+Closed: calls go through and their outcomes are kept for ``window`` seconds.
+Once ``min_calls`` have been recorded, the breaker opens when the share of
+failed calls, or of calls slower than ``slow_call_seconds``, reaches its
+threshold.
+
+Open: calls are refused for ``open_seconds`` so callers can fail fast
+instead of queueing behind a dependency that isn't answering.
+
+Half-open: up to ``probes`` calls are let through. The breaker closes when
+they all succeed and opens again on the first failure or slow call.
+
+A breaker belongs to one worker and must be used from its event loop.
+"""
+import time
+from collections import deque
+from typing import Callable, Optional
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+class CircuitBreaker:
+    def __init__(self, name: str, window: float = 30, min_calls: int = 10, failure_threshold: float = 0.5,
+                 slow_call_seconds: float = 20, slow_threshold: float = 0.5, open_seconds: float = 30,
+                 probes: int = 3, on_change: Optional[Callable[[str, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.on_change = on_change
+        self._clock = clock
+        self.state = CLOSED
+        self.rejected = 0
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; a True in half-open state takes a probe slot"""
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes_started >= self.probes:
+                self.rejected += 1
+                return False
+            self._probes_started += 1
+        return True
+
+    def record(self, ok: bool, seconds: float):
+        """Record the outcome of a call that allow() let through"""
+        slow = seconds >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if not ok or slow:
+                self._open()
+                return
+            self._probes_passed += 1
+            if self._probes_passed >= self.probes:
+                self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            # A call started before the breaker opened
+            return
+
+        now = self._clock()
+        self._outcomes.append((now, ok, slow))
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for _, succeeded, _ in self._outcomes if not succeeded)
+        slow_calls = sum(1 for _, _, was_slow in self._outcomes if was_slow)
+        if failures / calls >= self.failure_threshold or slow_calls / calls >= self.slow_threshold:
+            self._open()
+
+    def release(self):
+        """Give back a probe slot taken by a call that ended without an outcome (e.g. cancelled)"""
+        if self.state == HALF_OPEN and self._probes_started > self._probes_passed:
+            self._probes_started -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker will let a probe through"""
+        if self.state != OPEN:
+            return 0
+        return max(1, int(self.open_seconds - (self._clock() - self._opened_at)) + 1)
+
+    def _open(self):
+        self._transition(OPEN)
+        self._opened_at = self._clock()
+
+    def _transition(self, state: str):
+        self.state = state
+        self._outcomes.clear()
+        self._probes_started = 0
+        self._probes_passed = 0
+        if self.on_change:
+            self.on_change(self.name, state)
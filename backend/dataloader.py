@@ -0,0 +1,118 @@
+"""Request-scoped batching of document fetches.
+
+A ``DataLoader`` collects the ``load(key)`` calls made while the event loop
+works through one round of ready tasks and resolves them all with a single
+batch call, memoizing the results for the rest of its life. Loaders are
+created per request (see ``Loaders``) so memoized documents are never served
+to another request.
+
+    question_lists = await asyncio.gather(*(
+        loaders.questions.load_many(attempt['questions']) for attempt in attempts
+    ))  # one practice_questions query for every attempt
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import student_stats
+
+BatchFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+class DataLoader:
+    """Coalesces concurrent single-key loads into one batch call and memoizes the results"""
+
+    def __init__(self, batch_fn: BatchFn):
+        self._batch_fn = batch_fn
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self.loads = 0
+        self.batches = 0
+        self.keys = 0
+
+    def load(self, key: Hashable) -> "asyncio.Future":
+        """A future for the value of key (None when there is no such document)"""
+        self.loads += 1
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # Dispatch once the tasks already scheduled have had their turn
+                loop.call_soon(lambda: loop.create_task(self._dispatch()))
+        return future
+
+    async def load_many(self, keys: List[Hashable]) -> List[Any]:
+        """Values for keys in order, skipping keys with no document"""
+        values = await asyncio.gather(*(self.load(key) for key in keys))
+        return [value for value in values if value is not None]
+
+    def prime(self, key: Hashable, value: Any):
+        """Seed the memo with a value fetched some other way"""
+        if key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._futures[key] = future
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        self.batches += 1
+        self.keys += len(keys)
+        try:
+            values = await self._batch_fn(keys)
+        except Exception as e:
+            # Failed keys are forgotten so a later load can retry them
+            for key in keys:
+                self._futures.pop(key).set_exception(e)
+            return
+        for key in keys:
+            self._futures[key].set_result(values.get(key))
+
+def collection_batch(db, collection: str, key_field: str, projection: Optional[dict] = None) -> BatchFn:
+    """A batch function fetching documents of a collection by a key field with one $in query"""
+    async def batch(keys):
+        docs = await db[collection].find({key_field: {"$in": keys}}, projection or {"_id": 0}).to_list(None)
+        return {doc[key_field]: doc for doc in docs}
+    return batch
+
+class Loaders:
+    """The loaders of one request, created on first use"""
+
+    def __init__(self, db):
+        self.db = db
+        self._loaders: Dict[Hashable, DataLoader] = {}
+
+    def get(self, name: Hashable, batch_fn: Callable[[], BatchFn]) -> DataLoader:
+        loader = self._loaders.get(name)
+        if loader is None:
+            loader = self._loaders[name] = DataLoader(batch_fn())
+        return loader
+
+    def collection(self, collection: str, key_field: str, projection: Optional[dict] = None) -> DataLoader:
+        """The loader for documents of a collection by key field (one per projection)"""
+        name = (collection, key_field, repr(sorted((projection or {}).items())))
+        return self.get(name, lambda: collection_batch(self.db, collection, key_field, projection))
+
+    @property
+    def questions(self) -> DataLoader:
+        return self.collection("practice_questions", "id", {"_id": 0, "fingerprint": 0})
+
+    @property
+    def student_profiles(self) -> DataLoader:
+        return self.collection("student_profiles", "user_id")
+
+    @property
+    def classrooms(self) -> DataLoader:
+        return self.collection("classrooms", "class_id")
+
+    @property
+    def student_stats(self) -> DataLoader:
+        """Materialized stats documents, rebuilding any that are missing"""
+        return self.get("student_stats", lambda: lambda keys: student_stats.get_student_stats(self.db, keys))
+
+    def totals(self) -> Dict[str, int]:
+        """Loads requested, batch queries issued and keys fetched across all loaders"""
+        return {
+            "loads": sum(loader.loads for loader in self._loaders.values()),
+            "queries": sum(loader.batches for loader in self._loaders.values()),
+            "keys": sum(loader.keys for loader in self._loaders.values())
+        }
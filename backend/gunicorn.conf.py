@@ -0,0 +1,54 @@
+"""Gunicorn settings for production serving.
+
+Usage (from the backend directory):
+    gunicorn -c gunicorn.conf.py server:app
+
+Each worker is a uvicorn event loop that opens its own MongoDB client and LLM
+gateway in the app lifespan. Settings can be overridden from the environment:
+
+    WEB_CONCURRENCY       number of workers (default: one per CPU core, capped at 8)
+    PORT                  port to bind on all interfaces (default: 8001)
+    MAX_REQUESTS          recycle a worker after this many requests (0 disables)
+    MAX_REQUESTS_JITTER   random extra requests so workers don't recycle together
+    GRACEFUL_TIMEOUT      seconds in-flight requests get to finish on recycle/shutdown
+    PROMETHEUS_MULTIPROC_DIR  directory where workers share their metrics samples
+"""
+import glob
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+
+# The app is async, so one worker per core keeps every core busy; the cap keeps
+# per-worker MongoDB pools from multiplying on very large hosts
+workers = int(os.environ.get('WEB_CONCURRENCY') or min(multiprocessing.cpu_count(), 8))
+worker_class = "uvicorn_worker.ProductionWorker"
+
+# Workers import the app themselves instead of inheriting a preloaded copy
+preload_app = False
+
+# Recycle workers periodically to bound memory growth; jitter staggers restarts
+max_requests = int(os.environ.get('MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+# LLM calls run off the event loop, so the heartbeat timeout only catches hung workers
+timeout = 60
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+def on_starting(server):
+    # Samples left by a previous run would be summed into this one
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,167 @@
+"""Liveness and readiness probes.
+
+Liveness only says the worker's event loop is answering. Readiness says
+whether the load balancer should keep routing traffic to this worker. It
+combines a MongoDB ping under a tight timeout, the LLM gateway's queue depth,
+event-loop lag and MongoDB pool saturation. A probe
+result is cached for ``READY_CACHE_TTL`` seconds, so frequent probes from
+several balancers cost one check per second.
+
+An open LLM circuit is reported but doesn't make a worker unready: every
+worker sees the same Gemini outage, and while the circuit is open the
+worker fails fast and serves degraded responses, which beats having the
+balancer drain the whole fleet.
+
+Thresholds come from the environment:
+
+    READY_DB_TIMEOUT          seconds the MongoDB ping may take (default 0.5)
+    READY_MAX_LOOP_LAG        seconds of event-loop lag tolerated (default 1.0)
+    READY_MAX_LLM_QUEUE       LLM calls waiting for a thread tolerated (default 100)
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from pymongo import monitoring
+
+READY_CACHE_TTL = 1.0
+READY_DB_TIMEOUT = float(os.environ.get('READY_DB_TIMEOUT', '0.5'))
+READY_MAX_LOOP_LAG = float(os.environ.get('READY_MAX_LOOP_LAG', '1.0'))
+READY_MAX_LLM_QUEUE = int(os.environ.get('READY_MAX_LLM_QUEUE', '100'))
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps for a fixed interval"""
+
+    def __init__(self, interval: float = 0.25, window: int = 40):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    @property
+    def lag(self) -> float:
+        return self.samples[-1] if self.samples else 0.0
+
+    @property
+    def max_lag(self) -> float:
+        return max(self.samples, default=0.0)
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Counts MongoDB connections checked out and checkouts waiting for one"""
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.in_use = 0
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def snapshot(self) -> dict:
+        return {
+            "in_use": self.in_use,
+            "waiting": max(0, self.waiting),
+            "max": self.max_pool_size,
+            "saturation": round(self.in_use / self.max_pool_size, 3) if self.max_pool_size else 0
+        }
+
+class ReadinessProbe:
+    """Runs the readiness checks, reusing a result for READY_CACHE_TTL seconds"""
+
+    def __init__(self, ping: Callable[[], Awaitable], llm, pool: PoolMonitor, loop: LoopLagMonitor):
+        self.ping = ping
+        self.llm = llm
+        self.pool = pool
+        self.loop = loop
+        self.started = False
+        self.startup_seconds: Optional[float] = None
+        self._result: Optional[dict] = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> dict:
+        async with self._lock:
+            if self._result is None or time.monotonic() >= self._expires:
+                self._result = await self._run_checks()
+                self._expires = time.monotonic() + READY_CACHE_TTL
+            return self._result
+
+    async def _run_checks(self) -> dict:
+        checks = {"startup": {"ok": self.started, "seconds": self.startup_seconds}}
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.ping(), timeout=READY_DB_TIMEOUT)
+            checks["mongo"] = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        except asyncio.TimeoutError:
+            checks["mongo"] = {"ok": False, "error": f"ping timed out after {READY_DB_TIMEOUT}s"}
+        except Exception as e:
+            checks["mongo"] = {"ok": False, "error": str(e)}
+
+        llm = self.llm.stats()
+        checks["llm"] = {"ok": llm["queued"] <= READY_MAX_LLM_QUEUE, **llm}
+
+        checks["event_loop"] = {
+            "ok": self.loop.max_lag <= READY_MAX_LOOP_LAG,
+            "lag_ms": round(self.loop.lag * 1000, 1),
+            "max_lag_ms": round(self.loop.max_lag * 1000, 1)
+        }
+
+        pool = self.pool.snapshot()
+        # A full pool is fine on its own; requests queueing behind it are not
+        checks["db_pool"] = {"ok": not (pool["in_use"] >= pool["max"] and pool["waiting"] > 0), **pool}
+
+        return {"ready": all(check["ok"] for check in checks.values()), "checks": checks}
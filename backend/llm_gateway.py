@@ -0,0 +1,295 @@
+"""Single entry point for calls to the Gemini API.
+
+The gateway is created once at import time but holds no resources until a
+worker uses it: the SDK (a slow import that pulls in gRPC and protobuf) is
+imported and configured on first use, or ahead of time by ``preload()`` once
+the worker is already serving, and ``close()`` releases the worker's threads.
+Creating the SDK's client inside each worker keeps forked workers from
+sharing a gRPC channel.
+
+The SDK is synchronous, so calls run on the gateway's own thread pool rather
+than the event loop's default executor.
+
+Calls are hedged: when one hasn't returned after the ``LLM_HEDGE_PERCENTILE``
+of the model's recent call latencies (never sooner than ``LLM_HEDGE_MIN_DELAY`` seconds),
+a duplicate is sent and whichever succeeds first is used. At most
+``LLM_HEDGE_MAX_RATE`` of the calls in the stats window are hedged, which
+bounds the extra spend. A loser still waiting for a thread is cancelled. A
+blocking SDK call can't be interrupted, so a loser already running finishes
+in the background, and its tokens are still recorded.
+
+Calls go through a circuit breaker (circuit_breaker.py). A call that hasn't
+succeeded after ``LLM_TIMEOUT`` seconds fails, and once enough recent calls
+fail or take longer than ``LLM_BREAKER_SLOW_SECONDS`` the circuit opens:
+``generate`` then raises ``LLMUnavailable`` straight away, without taking a
+thread, until probe calls show Gemini has recovered. Callers catch
+``LLMUnavailable`` to serve a degraded response.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import metrics
+from circuit_breaker import CircuitBreaker
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+STATS_WINDOW = 60
+LATENCY_WINDOW = 200
+HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', '0.95'))
+HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', '0.5'))
+HEDGE_MAX_RATE = float(os.environ.get('LLM_HEDGE_MAX_RATE', '0.05'))
+HEDGE_MIN_SAMPLES = 20
+CALL_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '30'))
+BREAKER_FAILURE_RATE = float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5'))
+BREAKER_SLOW_SECONDS = float(os.environ.get('LLM_BREAKER_SLOW_SECONDS', '15'))
+BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10'))
+BREAKER_OPEN_SECONDS = float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30'))
+BREAKER_PROBES = int(os.environ.get('LLM_BREAKER_PROBES', '3'))
+
+logger = logging.getLogger(__name__)
+
+class LLMUnavailable(Exception):
+    """Gemini can't be used right now: the circuit is open or the call timed out"""
+
+    def __init__(self, reason: str, retry_after: int = 0):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class Completion(NamedTuple):
+    text: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    seconds: float
+
+class LLMGateway:
+    """Runs Gemini generations off the event loop on a per-worker thread pool"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_concurrency: Optional[int] = None):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency or int(os.environ.get('LLM_MAX_CONCURRENCY', '32'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._genai = None
+        self._import_lock = threading.Lock()
+        self.in_flight = 0
+        self._outcomes = deque()
+        self._latencies: Dict[str, deque] = {}
+        self._hedges = deque()
+        self.hedge_percentile = HEDGE_PERCENTILE
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        # A UsageRecorder (llm_usage.py) attached by the app once the database is open
+        self.recorder = None
+        self.timeout = CALL_TIMEOUT
+        self.breaker = CircuitBreaker(
+            "gemini", window=STATS_WINDOW, min_calls=BREAKER_MIN_CALLS, failure_threshold=BREAKER_FAILURE_RATE,
+            slow_call_seconds=BREAKER_SLOW_SECONDS, slow_threshold=BREAKER_FAILURE_RATE,
+            open_seconds=BREAKER_OPEN_SECONDS, probes=BREAKER_PROBES, on_change=self._circuit_changed
+        )
+
+    @property
+    def genai(self):
+        """The configured SDK module, imported on first access"""
+        if self._genai is None:
+            with self._import_lock:
+                if self._genai is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+                    self._genai = genai
+        return self._genai
+
+    async def preload(self):
+        """Import the SDK on the gateway's pool so the first request doesn't pay for it"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, lambda: self.genai)
+        except Exception as e:
+            logger.warning(f"Could not preload the Gemini SDK: {str(e)}")
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        return self._executor
+
+    def stats(self) -> dict:
+        """Calls in flight and waiting for a thread, the error rate over the last STATS_WINDOW seconds and the circuit state"""
+        self._prune()
+        calls = len(self._outcomes)
+        errors = sum(1 for _, ok in self._outcomes if not ok)
+        delay = self.hedge_delay()
+        return {
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_concurrency),
+            "calls": calls,
+            "error_rate": round(errors / calls, 3) if calls else 0,
+            "hedged": len(self._hedges),
+            "hedge_delay_ms": round(delay * 1000) if delay is not None else None,
+            "circuit": self.breaker.state,
+            "rejected": self.breaker.rejected
+        }
+
+    def _record(self, ok: bool):
+        self._outcomes.append((time.monotonic(), ok))
+        self._prune()
+
+    def _prune(self):
+        cutoff = time.monotonic() - STATS_WINDOW
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+        while self._hedges and self._hedges[0] < cutoff:
+            self._hedges.popleft()
+
+    def _observe_latency(self, model_name: str, seconds: float):
+        self._latencies.setdefault(model_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_delay(self, model_name: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait before hedging a call to a model, or None while hedging is off or its latencies are unknown"""
+        latencies = self._latencies.get(model_name or self.model_name, ())
+        if not self.hedge_percentile or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return max(HEDGE_MIN_DELAY, ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))])
+
+    def _may_hedge(self) -> bool:
+        self._prune()
+        return len(self._hedges) < max(1, HEDGE_MAX_RATE * (len(self._outcomes) + 1))
+
+    async def generate(self, prompt: str, model_name: Optional[str] = None, bot: str = "default",
+                       caller=None, max_output_tokens: Optional[int] = None) -> str:
+        """Generate a completion for prompt and return its text (see complete)"""
+        completion = await self.complete(prompt, model_name, bot, caller, max_output_tokens)
+        return completion.text
+
+    async def complete(self, prompt: str, model_name: Optional[str] = None, bot: str = "default",
+                       caller=None, max_output_tokens: Optional[int] = None, hedge: bool = True,
+                       background: bool = False) -> Completion:
+        """Generate a completion for prompt.
+
+        bot labels the call in metrics and usage; when a caller is given and a
+        usage recorder is attached, the call's tokens are charged to them.
+        Raises LLMUnavailable when the circuit is open or the call times out.
+        A background call (e.g. a shadow comparison) is never hedged and is
+        left out of the circuit breaker and latency statistics.
+        """
+        model_name = model_name or self.model_name
+        if not background and not self.breaker.allow():
+            metrics.LLM_CIRCUIT_REJECTIONS.labels(bot).inc()
+            raise LLMUnavailable("circuit open", self.breaker.retry_after())
+        generation_config = {"max_output_tokens": max_output_tokens} if max_output_tokens else None
+        latency_key = None if background else model_name
+        def call():
+            started = time.perf_counter()
+            model = self.genai.GenerativeModel(model_name)
+            response = model.generate_content(prompt, generation_config=generation_config)
+            return response.text, token_counts(getattr(response, "usage_metadata", None)), time.perf_counter() - started
+        self.in_flight += 1
+        started = time.perf_counter()
+        attempts = [self._submit(call)]
+        try:
+            delay = self.hedge_delay(model_name) if hedge and not background else None
+            if delay is not None and delay < self.timeout:
+                done, _ = await asyncio.wait([attempts[0][1]], timeout=delay)
+                if not done and self._may_hedge():
+                    attempts.append(self._submit(call))
+                    self._hedges.append(time.monotonic())
+                    self.hedges_sent += 1
+            remaining = self.timeout - (time.perf_counter() - started)
+            try:
+                winner = await asyncio.wait_for(self._first_success([waiter for _, waiter in attempts]),
+                                                timeout=max(0, remaining))
+            except asyncio.TimeoutError:
+                for attempt, waiter in attempts:
+                    self._abandon(attempt, waiter, latency_key, bot, caller)
+                raise LLMUnavailable(f"no response after {self.timeout:g}s")
+            text, (prompt_tokens, completion_tokens), seconds = winner.result()
+        except asyncio.CancelledError:
+            if not background:
+                self.breaker.release()
+            for attempt, waiter in attempts:
+                self._abandon(attempt, waiter, latency_key, bot, caller)
+            raise
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            if not background:
+                self._record(False)
+                self.breaker.record(False, elapsed)
+            metrics.observe_llm_call(bot, elapsed, error=e)
+            if self.recorder and caller:
+                self.recorder.record(caller, bot, elapsed, ok=False)
+            raise
+        finally:
+            self.in_flight -= 1
+        elapsed = time.perf_counter() - started
+        if not background:
+            self._record(True)
+            self.breaker.record(True, elapsed)
+            self._observe_latency(model_name, seconds)
+        metrics.observe_llm_call(bot, elapsed, prompt_tokens, completion_tokens)
+        if self.recorder and caller:
+            self.recorder.record(caller, bot, elapsed, prompt_tokens, completion_tokens)
+        if len(attempts) > 1:
+            hedge_won = winner is attempts[1][1]
+            self.hedges_won += hedge_won
+            metrics.observe_llm_hedge(bot, hedge_won)
+            for attempt, waiter in attempts:
+                if waiter is not winner:
+                    self._abandon(attempt, waiter, latency_key, bot, caller)
+        return Completion(text, model_name, prompt_tokens, completion_tokens, seconds)
+
+    def _circuit_changed(self, name: str, state: str):
+        metrics.set_circuit_state(name, state)
+        if state == "open":
+            logger.warning(f"LLM circuit opened; failing fast for {self.breaker.open_seconds:g}s")
+        else:
+            logger.info(f"LLM circuit {state.replace('_', '-')}")
+
+    def _submit(self, call) -> Tuple[Future, asyncio.Future]:
+        """Start call on the pool; returns its thread future and an awaitable for the event loop"""
+        attempt = self.executor.submit(call)
+        return attempt, asyncio.wrap_future(attempt)
+
+    async def _first_success(self, waiters: List[asyncio.Future]) -> asyncio.Future:
+        """The first attempt to succeed; raises the last error if they all fail"""
+        pending = set(waiters)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in done:
+                if waiter.exception() is None:
+                    return waiter
+                error = waiter.exception()
+        raise error
+
+    def _abandon(self, attempt: Future, waiter: asyncio.Future, model_name: Optional[str], bot: str, caller):
+        """Cancel a losing attempt that hasn't started; one already running is charged when it finishes.
+
+        Its latency counts towards model_name's hedge delay unless that is None.
+        """
+        if waiter.done() or not attempt.cancel():
+            waiter.add_done_callback(lambda finished: self._charge_loser(finished, model_name, bot, caller))
+
+    def _charge_loser(self, waiter: asyncio.Future, model_name: Optional[str], bot: str, caller):
+        if waiter.cancelled() or waiter.exception() is not None:
+            return
+        _, (prompt_tokens, completion_tokens), seconds = waiter.result()
+        if model_name:
+            self._observe_latency(model_name, seconds)
+        metrics.observe_llm_tokens(bot, prompt_tokens, completion_tokens)
+        if self.recorder and caller:
+            self.recorder.record(caller, bot, seconds, prompt_tokens, completion_tokens)
+
+def token_counts(usage) -> tuple:
+    """(prompt, completion) token counts from a response's usage_metadata"""
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0
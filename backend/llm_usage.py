@@ -0,0 +1,211 @@
+"""LLM token accounting and daily budgets.
+
+``llm_usage`` holds one bucket per (scope, key, day, bot) where the scope is
+``user`` (key = user id) or ``school`` (key = school name). Each bucket counts
+the day's calls, errors, prompt and completion tokens and total latency. A
+worker accumulates calls in memory and upserts its buckets with ``$inc`` in
+one bulk write every ``USAGE_FLUSH_INTERVAL`` seconds (sooner once
+``USAGE_BATCH_SIZE`` buckets are pending), so an LLM call adds no round trip.
+
+Budgets are daily token totals (UTC days), checked before a call is made
+against the flushed buckets (cached per worker for ``BUDGET_CACHE_TTL``
+seconds) plus the worker's unflushed usage. Other workers' unflushed usage is
+not visible, so a user can overshoot by about one flush interval of calls.
+
+    LLM_DAILY_USER_TOKENS    tokens per user per day (default 200000, 0 disables)
+    LLM_DAILY_SCHOOL_TOKENS  tokens per school per day (default 5000000, 0 disables)
+"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import TTLCache
+from rollups import day_start
+
+USAGE_COLLECTION = "llm_usage"
+COUNTERS = ("calls", "errors", "prompt_tokens", "completion_tokens", "latency_ms")
+USAGE_FLUSH_INTERVAL = float(os.environ.get('USAGE_FLUSH_INTERVAL', '5'))
+USAGE_BATCH_SIZE = 500
+BUDGET_CACHE_TTL = 10
+DAILY_LIMITS = {
+    "user": int(os.environ.get('LLM_DAILY_USER_TOKENS', '200000')),
+    "school": int(os.environ.get('LLM_DAILY_SCHOOL_TOKENS', '5000000')),
+}
+
+# USD per million tokens, for the cost estimates in the usage summaries
+PROMPT_COST_PER_MILLION = float(os.environ.get('LLM_PROMPT_COST_PER_MILLION', '0.075'))
+COMPLETION_COST_PER_MILLION = float(os.environ.get('LLM_COMPLETION_COST_PER_MILLION', '0.30'))
+
+logger = logging.getLogger(__name__)
+
+class Caller(NamedTuple):
+    """Who an LLM call is charged to"""
+    user_id: str
+    school: Optional[str] = None
+
+    def scopes(self):
+        yield "user", self.user_id
+        if self.school:
+            yield "school", self.school
+
+class BudgetExceeded(Exception):
+    def __init__(self, scope: str, key: str, used: int, limit: int):
+        super().__init__(f"Daily LLM budget of {scope} {key} reached: {used} of {limit} tokens")
+        self.scope = scope
+        self.key = key
+        self.used = used
+        self.limit = limit
+
+def empty_bucket() -> Dict[str, int]:
+    return dict.fromkeys(COUNTERS, 0)
+
+def seconds_until_reset(now: Optional[datetime] = None) -> int:
+    """Seconds until the daily budgets reset at midnight UTC"""
+    now = now or datetime.utcnow()
+    return int((day_start(now) + timedelta(days=1) - now).total_seconds()) + 1
+
+class UsageRecorder:
+    """Accumulates LLM usage per worker, writes it in batches and enforces the daily budgets"""
+
+    def __init__(self, db, flush_interval: float = USAGE_FLUSH_INTERVAL, batch_size: int = USAGE_BATCH_SIZE):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[tuple, Dict[str, int]] = defaultdict(empty_bucket)
+        self._writing: Dict[tuple, Dict[str, int]] = {}
+        self._used = TTLCache(maxsize=8192, ttl=BUDGET_CACHE_TTL)
+        self._task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def record(self, caller: Caller, bot: str, seconds: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, ok: bool = True):
+        day = day_start(datetime.utcnow())
+        for scope, key in caller.scopes():
+            bucket = self._pending[(scope, key, day, bot)]
+            bucket["calls"] += 1
+            bucket["errors"] += 0 if ok else 1
+            bucket["prompt_tokens"] += prompt_tokens
+            bucket["completion_tokens"] += completion_tokens
+            bucket["latency_ms"] += int(seconds * 1000)
+        if len(self._pending) >= self.batch_size and not self._flush_lock.locked():
+            self._early_flush = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """Write the pending buckets in one unordered bulk upsert"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._writing, self._pending = self._pending, defaultdict(empty_bucket)
+            buckets = list(self._writing.items())
+            try:
+                await self.db[USAGE_COLLECTION].bulk_write([
+                    UpdateOne({"scope": scope, "key": key, "day": day, "bot": bot}, {"$inc": counters}, upsert=True)
+                    for (scope, key, day, bot), counters in buckets
+                ], ordered=False)
+            except BulkWriteError as e:
+                # The other upserts were applied; only the failed ones are kept for the next flush
+                failed = sorted({error['index'] for error in e.details.get("writeErrors", [])})
+                logger.error(f"Error writing {len(failed)} of {len(buckets)} LLM usage buckets: {str(e)}")
+                self._requeue(buckets[index] for index in failed)
+                self._invalidate(buckets)
+            except Exception as e:
+                # Keep the usage for the next flush rather than losing it
+                logger.error(f"Error writing LLM usage: {str(e)}")
+                self._requeue(buckets)
+            else:
+                self._invalidate(buckets)
+            finally:
+                self._writing = {}
+
+    def _requeue(self, buckets):
+        for bucket_key, counters in buckets:
+            bucket = self._pending[bucket_key]
+            for name, value in counters.items():
+                bucket[name] += value
+
+    def _invalidate(self, buckets):
+        for (scope, key, day, _), _ in buckets:
+            self._used.invalidate((scope, key, day))
+
+    def _unflushed_tokens(self, scope: str, key: str, day: datetime) -> int:
+        return sum(
+            counters["prompt_tokens"] + counters["completion_tokens"]
+            for buckets in (self._pending, self._writing)
+            for (bucket_scope, bucket_key, bucket_day, _), counters in buckets.items()
+            if (bucket_scope, bucket_key, bucket_day) == (scope, key, day)
+        )
+
+    async def used_today(self, scope: str, key: str) -> int:
+        """Tokens charged to a user or school today"""
+        day = day_start(datetime.utcnow())
+        used = self._used.get((scope, key, day))
+        if used is None:
+            buckets = await self.db[USAGE_COLLECTION].find(
+                {"scope": scope, "key": key, "day": day}, {"_id": 0, "prompt_tokens": 1, "completion_tokens": 1}
+            ).to_list(None)
+            used = sum(bucket.get('prompt_tokens', 0) + bucket.get('completion_tokens', 0) for bucket in buckets)
+            self._used.set((scope, key, day), used)
+        return used + self._unflushed_tokens(scope, key, day)
+
+    async def check_budget(self, caller: Caller):
+        """Raise BudgetExceeded if the caller or their school has used up today's tokens"""
+        for scope, key in caller.scopes():
+            limit = DAILY_LIMITS[scope]
+            if not limit:
+                continue
+            used = await self.used_today(scope, key)
+            if used >= limit:
+                raise BudgetExceeded(scope, key, used, limit)
+
+def estimated_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return round((prompt_tokens * PROMPT_COST_PER_MILLION + completion_tokens * COMPLETION_COST_PER_MILLION) / 1e6, 4)
+
+GROUPINGS = {
+    # Every call is counted under its user, so totals by bot or day use the user buckets
+    "bot": ("user", "$bot"),
+    "day": ("user", "$day"),
+    "user": ("user", "$key"),
+    "school": ("school", "$key"),
+}
+
+async def summarize(db, group_by: str, since: datetime, limit: int = 100) -> List[dict]:
+    """Usage totals since a day, grouped by bot, day, user or school"""
+    scope, group_key = GROUPINGS[group_by]
+    rows = await db[USAGE_COLLECTION].aggregate([
+        {"$match": {"scope": scope, "day": {"$gte": day_start(since)}}},
+        {"$group": {"_id": group_key, **{name: {"$sum": f"${name}"} for name in COUNTERS}}},
+        {"$sort": {"_id": 1} if group_by == "day" else {"completion_tokens": -1, "prompt_tokens": -1}},
+        {"$limit": limit}
+    ]).to_list(None)
+    return [
+        {
+            group_by: row['_id'],
+            **{name: row[name] for name in COUNTERS if name != "latency_ms"},
+            "total_tokens": row['prompt_tokens'] + row['completion_tokens'],
+            "average_latency_ms": round(row['latency_ms'] / row['calls'], 1) if row['calls'] else 0,
+            "error_rate": round(row['errors'] / row['calls'], 3) if row['calls'] else 0,
+            "estimated_cost_usd": estimated_cost(row['prompt_tokens'], row['completion_tokens'])
+        }
+        for row in rows
+    ]
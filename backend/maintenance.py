@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Maintenance jobs for derived collections.
+
+Usage (from the backend directory):
+    python maintenance.py backfill-stats [--student STUDENT_ID ...]
+    python maintenance.py backfill-rollups [--student STUDENT_ID ...]
+    python maintenance.py backfill-memberships
+    python maintenance.py backfill-mastery [--student STUDENT_ID ...]
+    python maintenance.py dedupe-questions [--dry-run] [--prune]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+import mastery
+import question_index
+import rollups
+import student_stats
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger("maintenance")
+
+def get_database():
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    return client, client[os.environ.get('DB_NAME', 'test_database')]
+
+async def backfill_stats(db, args):
+    """Recompute student_stats documents from the raw activity collections"""
+    student_ids = args.student or await db.student_profiles.distinct("user_id")
+    for start in range(0, len(student_ids), args.batch_size):
+        batch = student_ids[start:start + args.batch_size]
+        await student_stats.rebuild_student_stats(db, batch)
+        logger.info(f"Rebuilt stats for {start + len(batch)}/{len(student_ids)} students")
+
+async def backfill_rollups(db, args):
+    """Recompute daily_activity buckets from the raw activity collections"""
+    student_ids = args.student or await db.student_profiles.distinct("user_id")
+    for start in range(0, len(student_ids), args.batch_size):
+        batch = student_ids[start:start + args.batch_size]
+        await rollups.rebuild_student_rollups(db, batch)
+        logger.info(f"Rebuilt student buckets for {start + len(batch)}/{len(student_ids)} students")
+
+    # Class buckets are sums over the members' student buckets
+    class_filter = {"students": {"$in": student_ids}} if args.student else {}
+    classrooms = await db.classrooms.find(class_filter, {"_id": 0, "class_id": 1, "students": 1}).to_list(None)
+    for classroom in classrooms:
+        await rollups.rebuild_class_rollups(db, classroom)
+    logger.info(f"Rebuilt class buckets for {len(classrooms)} classes")
+
+async def backfill_memberships(db, args):
+    """Create class_memberships documents for every student on a class roster"""
+    total = 0
+    async for classroom in db.classrooms.find({}, {"_id": 0, "class_id": 1, "teacher_id": 1, "students": 1}):
+        students = classroom.get('students', [])
+        if not students:
+            continue
+        await db.class_memberships.bulk_write([
+            UpdateOne(
+                {"class_id": classroom['class_id'], "student_id": student_id},
+                {"$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "student_id": student_id,
+                    "class_id": classroom['class_id'],
+                    "teacher_id": classroom['teacher_id'],
+                    "joined_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+            for student_id in students
+        ], ordered=False)
+        total += len(students)
+    logger.info(f"Backfilled {total} class memberships")
+
+async def backfill_mastery(db, args):
+    """Rebuild student_mastery documents by replaying each student's practice attempts"""
+    student_ids = args.student or await db.practice_attempts.distinct("student_id")
+    for done, student_id in enumerate(student_ids, 1):
+        attempts = await db.practice_attempts.find(
+            {"student_id": student_id}, {"_id": 0, "student_answers": 1}
+        ).sort("completed_at", 1).to_list(None)
+        question_ids = list({question_id for attempt in attempts for question_id in attempt['student_answers']})
+        questions = {
+            question['id']: question
+            for question in await db.practice_questions.find(
+                {"id": {"$in": question_ids}}, {"_id": 0, "id": 1, "subject": 1, "topics": 1, "correct_answer": 1}
+            ).to_list(None)
+        }
+        await db[mastery.MASTERY_COLLECTION].delete_many({"student_id": student_id})
+        for attempt in attempts:
+            answers = list(attempt['student_answers'].items())
+            await mastery.record_answers(
+                db, student_id, [questions.get(question_id) for question_id, _ in answers], [answer for _, answer in answers]
+            )
+        if done % 100 == 0 or done == len(student_ids):
+            logger.info(f"Rebuilt mastery for {done}/{len(student_ids)} students")
+
+async def dedupe_questions(db, args):
+    """Fingerprint practice questions and mark near-duplicates of earlier ones with duplicate_of"""
+    indexes = {}
+    updates = []
+    seen = fingerprinted = marked = unmarked = 0
+
+    async def flush():
+        if updates and not args.dry_run:
+            await db.practice_questions.bulk_write(updates, ordered=False)
+        updates.clear()
+
+    # Oldest first, so the question that stays is the one attempts most likely reference
+    cursor = db.practice_questions.find(
+        {}, {"_id": 0, "id": 1, "subject": 1, "question_text": 1, "options": 1, "correct_answer": 1, "fingerprint": 1,
+             "duplicate_of": 1}
+    ).sort("created_at", 1)
+    async for question in cursor:
+        seen += 1
+        changes, update = {}, {}
+        fingerprint = question.get('fingerprint')
+        if fingerprint is None:
+            fingerprint = changes['fingerprint'] = question_index.question_fingerprint(question)
+            fingerprinted += 1
+        index = indexes.setdefault(question['subject'], question_index.BandIndex())
+        original = index.find(fingerprint)
+        if original is None:
+            index.add(question['id'], fingerprint)
+            if 'duplicate_of' in question:
+                update["$unset"] = {"duplicate_of": ""}
+                unmarked += 1
+        elif question.get('duplicate_of') != original:
+            changes['duplicate_of'] = original
+            marked += 1
+        if changes:
+            update["$set"] = changes
+        if update:
+            updates.append(UpdateOne({"id": question['id']}, update))
+        if len(updates) >= args.batch_size:
+            await flush()
+        if seen % 10000 == 0:
+            logger.info(f"Checked {seen} questions, {marked} duplicates so far")
+    await flush()
+    logger.info(f"Checked {seen} questions: fingerprinted {fingerprinted}, marked {marked} duplicates, "
+                f"unmarked {unmarked}"
+                f"{' (dry run)' if args.dry_run else ''}")
+
+    if args.prune and not args.dry_run:
+        # Duplicates that no attempt or assignment references can go; the rest
+        # stay so old attempts still grade and assignments keep their questions
+        duplicate_ids = await db.practice_questions.distinct("id", {"duplicate_of": {"$exists": True}})
+        pruned = 0
+        for start in range(0, len(duplicate_ids), args.batch_size):
+            batch = duplicate_ids[start:start + args.batch_size]
+            referenced = set(await db.practice_attempts.distinct("questions", {"questions": {"$in": batch}}))
+            referenced.update(await db.assignments.distinct("question_ids", {"question_ids": {"$in": batch}}))
+            unused = [question_id for question_id in batch if question_id not in referenced]
+            if unused:
+                result = await db.practice_questions.delete_many({"id": {"$in": unused}})
+                pruned += result.deleted_count
+        logger.info(f"Deleted {pruned} unreferenced duplicates")
+
+COMMANDS = {
+    "backfill-stats": backfill_stats,
+    "backfill-rollups": backfill_rollups,
+    "backfill-memberships": backfill_memberships,
+    "backfill-mastery": backfill_mastery,
+    "dedupe-questions": dedupe_questions,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Project K maintenance jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("backfill-stats", help=backfill_stats.__doc__)
+    stats_parser.add_argument("--student", action="append", help="Only rebuild this student (repeatable)")
+    stats_parser.add_argument("--batch-size", type=int, default=200)
+
+    rollups_parser = subparsers.add_parser("backfill-rollups", help=backfill_rollups.__doc__)
+    rollups_parser.add_argument("--student", action="append", help="Only rebuild this student and their classes (repeatable)")
+    rollups_parser.add_argument("--batch-size", type=int, default=200)
+
+    subparsers.add_parser("backfill-memberships", help=backfill_memberships.__doc__)
+
+    mastery_parser = subparsers.add_parser("backfill-mastery", help=backfill_mastery.__doc__)
+    mastery_parser.add_argument("--student", action="append", help="Only rebuild this student (repeatable)")
+
+    dedupe_parser = subparsers.add_parser("dedupe-questions", help=dedupe_questions.__doc__)
+    dedupe_parser.add_argument("--dry-run", action="store_true", help="Only count the duplicates")
+    dedupe_parser.add_argument("--prune", action="store_true", help="Delete duplicates no practice attempt or assignment references")
+    dedupe_parser.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        client, db = get_database()
+        try:
+            await COMMANDS[args.command](db, args)
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
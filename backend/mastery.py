@@ -0,0 +1,197 @@
+"""Per-student topic mastery and adaptive question selection.
+
+``student_mastery`` holds one document per (student, subject): the topics the
+student has answered questions on, and two float32 vectors over those topics
+stored as packed bytes, the decayed counts of correct answers and of
+answers. Each submission multiplies both by ``MASTERY_DECAY`` before adding
+its answers, so the vector follows recent form. A topic's mastery is
+``(correct + 1) / (answered + 2)``; unseen topics sit at 0.5.
+
+Adaptive tests are assembled from stored questions without an LLM call. A
+subject's questions are loaded as a ``QuestionPool`` (a question × topic
+matrix plus difficulties), cached per worker, and ``select_questions``
+scores the whole pool at once: weak topics score high, and so do
+difficulties that suit the student's mastery of the question's topics. Each
+pick lowers the score of questions on the same topics so a test spreads over
+several weak topics. Questions the student answered recently are skipped.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+MASTERY_COLLECTION = "student_mastery"
+MASTERY_DECAY = 0.9
+RECENT_QUESTIONS = 200
+UPDATE_RETRIES = 3
+
+POOL_SIZE = 5000
+# Mastery below the first cut suits easy questions, below the second medium ones, above it hard ones
+DIFFICULTY_CUTS = np.array([0.45, 0.75], dtype=np.float32)
+DIFFICULTY_LEVELS = {"easy": 0, "medium": 1, "mixed": 1, "hard": 2}
+WEAKNESS_WEIGHT = 1.0
+DIFFICULTY_WEIGHT = 0.3
+SPREAD_PENALTY = 0.5
+EXPLORATION = 0.1
+
+_rng = np.random.default_rng()
+
+def topic_key(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+class Mastery(NamedTuple):
+    topics: List[str]
+    correct: np.ndarray
+    answered: np.ndarray
+    recent: List[str] = []
+    version: int = 0
+
+    def levels(self) -> np.ndarray:
+        return (self.correct + 1) / (self.answered + 2)
+
+    def aligned(self, topics: List[str]) -> np.ndarray:
+        """Mastery of each of topics, 0.5 for those never answered"""
+        position = {topic: i for i, topic in enumerate(self.topics)}
+        levels = self.levels()
+        return np.array([levels[position[topic]] if topic in position else 0.5 for topic in topics], dtype=np.float32)
+
+def empty_mastery() -> Mastery:
+    return Mastery([], np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+def from_document(doc: Optional[dict]) -> Mastery:
+    if not doc:
+        return empty_mastery()
+    return Mastery(
+        doc['topics'],
+        np.frombuffer(doc['correct'], dtype=np.float32),
+        np.frombuffer(doc['answered'], dtype=np.float32),
+        doc.get('recent', []),
+        doc.get('version', 0)
+    )
+
+def updated(mastery: Mastery, answers: List[Tuple[str, List[str], bool]]) -> Mastery:
+    """mastery after decaying it and adding answers, given as (question id, topics, correct)"""
+    topics = list(mastery.topics)
+    position = {topic: i for i, topic in enumerate(topics)}
+    columns, hits = [], []
+    for _, question_topics, is_correct in answers:
+        for topic in {topic_key(topic) for topic in question_topics}:
+            if topic not in position:
+                position[topic] = len(topics)
+                topics.append(topic)
+            columns.append(position[topic])
+            hits.append(is_correct)
+    correct = np.zeros(len(topics), dtype=np.float32)
+    answered = np.zeros(len(topics), dtype=np.float32)
+    correct[:len(mastery.topics)] = mastery.correct * MASTERY_DECAY
+    answered[:len(mastery.topics)] = mastery.answered * MASTERY_DECAY
+    correct += np.bincount(columns, weights=hits, minlength=len(topics)).astype(np.float32)
+    answered += np.bincount(columns, minlength=len(topics)).astype(np.float32)
+    recent = ([question_id for question_id, _, _ in answers] + mastery.recent)[:RECENT_QUESTIONS]
+    return Mastery(topics, correct, answered, recent, mastery.version + 1)
+
+async def get_mastery(db, student_id: str, subject: str) -> Mastery:
+    return from_document(await db[MASTERY_COLLECTION].find_one({"student_id": student_id, "subject": subject}))
+
+async def record_answers(db, student_id: str, questions: Iterable[Optional[dict]], student_answers: Iterable[str]):
+    """Fold a graded submission into the student's mastery of each subject it covers.
+
+    Concurrent submissions are resolved with a version check and a retry.
+    """
+    by_subject: Dict[str, list] = {}
+    for question, student_answer in zip(questions, student_answers):
+        if question and question.get('topics'):
+            is_correct = question['correct_answer'].lower() == student_answer.lower()
+            by_subject.setdefault(question['subject'], []).append((question['id'], question['topics'], is_correct))
+
+    for subject, answers in by_subject.items():
+        selector = {"student_id": student_id, "subject": subject}
+        for _ in range(UPDATE_RETRIES):
+            current = await db[MASTERY_COLLECTION].find_one(selector)
+            mastery = updated(from_document(current), answers)
+            fields = {
+                "topics": mastery.topics,
+                "correct": mastery.correct.tobytes(),
+                "answered": mastery.answered.tobytes(),
+                "recent": mastery.recent,
+                "version": mastery.version,
+                "updated_at": datetime.utcnow()
+            }
+            if current is None:
+                try:
+                    await db[MASTERY_COLLECTION].insert_one({**selector, **fields})
+                    break
+                except DuplicateKeyError:
+                    continue
+            result = await db[MASTERY_COLLECTION].update_one(
+                {**selector, "version": current.get('version', 0)}, {"$set": fields}
+            )
+            if result.matched_count:
+                break
+
+class QuestionPool(NamedTuple):
+    ids: List[str]
+    topics: List[str]
+    # questions × topics, 1 where a question covers a topic
+    matrix: np.ndarray
+    # 0 easy, 1 medium, 2 hard
+    difficulty: np.ndarray
+
+def build_pool(questions: List[dict]) -> QuestionPool:
+    """A pool from stored questions' id, topics and difficulty"""
+    topics: List[str] = []
+    position: Dict[str, int] = {}
+    rows, columns = [], []
+    for row, question in enumerate(questions):
+        for topic in {topic_key(topic) for topic in question.get('topics', [])}:
+            if topic not in position:
+                position[topic] = len(topics)
+                topics.append(topic)
+            rows.append(row)
+            columns.append(position[topic])
+    matrix = np.zeros((len(questions), len(topics)), dtype=np.float32)
+    matrix[rows, columns] = 1
+    difficulty = np.array([DIFFICULTY_LEVELS.get(question.get('difficulty'), 1) for question in questions], dtype=np.float32)
+    return QuestionPool([question['id'] for question in questions], topics, matrix, difficulty)
+
+async def load_pool(db, query: dict) -> QuestionPool:
+    """A pool of the POOL_SIZE newest stored questions matching query"""
+    questions = await db.practice_questions.find(
+        query, {"_id": 0, "id": 1, "topics": 1, "difficulty": 1}
+    ).sort("created_at", -1).to_list(POOL_SIZE)
+    return build_pool(questions)
+
+def select_questions(pool: QuestionPool, mastery: Mastery, count: int,
+                     rng: Optional[np.random.Generator] = None) -> List[int]:
+    """Indexes into pool of up to count questions for an adaptive test, best first"""
+    rng = rng or _rng
+    if not pool.ids:
+        return []
+    levels = mastery.aligned(pool.topics)
+    covered = np.maximum(pool.matrix.sum(axis=1), 1)
+    weakness = pool.matrix @ (1 - levels) / covered
+    target = pool.matrix @ np.searchsorted(DIFFICULTY_CUTS, levels).astype(np.float32) / covered
+    fit = 1 - np.abs(pool.difficulty - target) / 2
+    scores = WEAKNESS_WEIGHT * weakness + DIFFICULTY_WEIGHT * fit + EXPLORATION * rng.random(len(pool.ids))
+
+    recent = set(mastery.recent)
+    scores[[i for i, question_id in enumerate(pool.ids) if question_id in recent]] = -np.inf
+
+    picks = []
+    for _ in range(min(count, len(pool.ids))):
+        best = int(np.argmax(scores))
+        if scores[best] == -np.inf:
+            break
+        picks.append(best)
+        scores -= SPREAD_PENALTY * (pool.matrix @ pool.matrix[best]) / covered
+        scores[best] = -np.inf
+    return picks
+
+def weakest_topics(mastery: Mastery, limit: int = 5) -> List[dict]:
+    """The student's least mastered answered topics"""
+    levels = mastery.levels()
+    return [
+        {"topic": mastery.topics[i], "mastery": round(float(levels[i]), 3), "answered": round(float(mastery.answered[i]), 1)}
+        for i in np.argsort(levels)[:limit]
+    ]
@@ -0,0 +1,177 @@
+"""Prometheus instrumentation.
+
+Exposes per-route request latency and status counts, MongoDB command latency
+and counts per collection, LLM call latency, token usage and errors per bot,
+latency and outcome per model tier, the LLM circuit breaker's state, degraded
+responses served while it is open, and thread-pool/queue depths. Every
+hot-path hook is a label lookup plus an increment; ``benchmarks/bench_metrics_overhead.py`` measures what that costs
+per request and per MongoDB command.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (the gunicorn deployment), samples
+are written there by every worker and ``/metrics`` aggregates them, so a
+scrape of any worker sees the whole instance.
+"""
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template",
+    ["method", "route"]
+)
+HTTP_RESPONSES = Counter(
+    "http_responses_total", "Responses sent, by route template and status code",
+    ["method", "route", "status"]
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round-trip time, by command and collection",
+    ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error",
+    ["command", "collection"]
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Gemini call latency, by bot",
+    ["bot"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by Gemini, by bot and kind (prompt or completion)",
+    ["bot", "kind"]
+)
+LLM_HEDGES = Counter(
+    "llm_hedges_total", "Gemini calls that were hedged, by bot and which attempt won",
+    ["bot", "winner"]
+)
+LLM_ERRORS = Counter(
+    "llm_errors_total", "Gemini calls that raised, by bot and exception type",
+    ["bot", "error"]
+)
+LLM_TIER_SECONDS = Histogram(
+    "llm_tier_duration_seconds", "Gemini call latency by model tier, model and role (primary or shadow)",
+    ["tier", "model", "role"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+LLM_TIER_OUTCOMES = Counter(
+    "llm_tier_outcomes_total", "Gemini calls by model tier, model, role and outcome (ok, truncated, rejected, error)",
+    ["tier", "model", "role", "outcome"]
+)
+LLM_CIRCUIT_STATE = Gauge(
+    "llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open); the worst worker wins",
+    ["breaker"], multiprocess_mode="max"
+)
+LLM_CIRCUIT_REJECTIONS = Counter(
+    "llm_circuit_rejections_total", "Gemini calls refused without being sent because the circuit was open",
+    ["bot"]
+)
+DEGRADED_RESPONSES = Counter(
+    "degraded_responses_total", "Requests answered without the LLM, by route and what was served",
+    ["route", "kind"]
+)
+POOL_DEPTH = Gauge(
+    "worker_pool_depth", "Work in progress per thread pool or connection pool (in_use, queued)",
+    ["pool", "state"], multiprocess_mode="livesum"
+)
+
+async def render(request: Request) -> Response:
+    """The /metrics endpoint"""
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware timing every HTTP request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Routing stores the matched route in the scope; unmatched paths share
+            # one label so random URLs can't blow up the series count
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], template).observe(time.perf_counter() - started)
+            HTTP_RESPONSES.labels(scope["method"], template, str(status_code)).inc()
+
+class CommandMetrics(monitoring.CommandListener):
+    """Records MongoDB command latency per command and collection"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMAND_SECONDS.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMAND_SECONDS.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+
+def observe_llm_call(bot: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+                     error: Exception = None):
+    """Record one Gemini call"""
+    LLM_REQUEST_SECONDS.labels(bot).observe(seconds)
+    if error is not None:
+        LLM_ERRORS.labels(bot, type(error).__name__).inc()
+    observe_llm_tokens(bot, prompt_tokens, completion_tokens)
+
+def observe_llm_tokens(bot: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.labels(bot, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(bot, "completion").inc(completion_tokens)
+
+def observe_llm_hedge(bot: str, hedge_won: bool):
+    LLM_HEDGES.labels(bot, "hedge" if hedge_won else "primary").inc()
+
+def observe_llm_tier(tier: str, model: str, role: str, seconds: float, outcome: str):
+    LLM_TIER_SECONDS.labels(tier, model, role).observe(seconds)
+    LLM_TIER_OUTCOMES.labels(tier, model, role, outcome).inc()
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def set_circuit_state(breaker: str, state: str):
+    LLM_CIRCUIT_STATE.labels(breaker).set(CIRCUIT_STATES[state])
+
+def observe_degraded(route: str, kind: str):
+    DEGRADED_RESPONSES.labels(route, kind).inc()
+
+def set_pool_depth(pool: str, in_use: int, queued: int):
+    POOL_DEPTH.labels(pool, "in_use").set(in_use)
+    POOL_DEPTH.labels(pool, "queued").set(queued)
+
+def executor_depth(executor) -> tuple:
+    """(busy threads, queued work items) of a ThreadPoolExecutor"""
+    queued = executor._work_queue.qsize()
+    idle = executor._idle_semaphore._value
+    return max(0, len(executor._threads) - idle), queued
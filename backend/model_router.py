@@ -0,0 +1,237 @@
+"""Picks the Gemini model and output budget for each kind of LLM task.
+
+Every call belongs to a tier:
+
+    routing           the central brain, whose reply is the answer shown for
+                      messages it handles itself
+    quick_answer      short chat questions
+    deep_explanation  chat questions asking for an explanation or working
+    bulk_generation   practice test generation, budgeted per question
+
+A tier's model and ``max_output_tokens`` come from ``LLM_<TIER>_MODEL`` and
+``LLM_<TIER>_MAX_TOKENS`` (e.g. ``LLM_ROUTING_MODEL``); bulk generation adds
+``LLM_BULK_GENERATION_TOKENS_PER_ITEM`` per question. Latency and outcome
+(ok, truncated at the token budget, failed the caller's check, or error) are
+recorded per tier and model.
+
+Shadow comparison: with ``LLM_<TIER>_SHADOW_MODEL`` set (and optionally
+``LLM_<TIER>_SHADOW_MAX_TOKENS``), ``LLM_SHADOW_SAMPLE`` of the tier's calls
+are repeated against the candidate in the background once the primary has
+answered. The candidate's answer is never shown and its tokens aren't charged
+to the caller (metrics label them ``<bot>:shadow``); both sides are stored in
+``llm_shadow`` for ``summarize``. Shadows are skipped while the circuit isn't
+closed or the gateway is busy.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+import metrics
+from circuit_breaker import CLOSED
+from llm_gateway import Completion, LLMGateway
+
+SHADOW_COLLECTION = "llm_shadow"
+SHADOW_SAMPLE = float(os.environ.get('LLM_SHADOW_SAMPLE', '0.05'))
+SHADOW_RETENTION_DAYS = 30
+MAX_OUTPUT_TOKENS = 8192
+
+# Chat questions with one of these words, or longer than DEEP_QUESTION_WORDS,
+# get the deep_explanation tier
+DEEP_CUES = frozenset((
+    "explain", "why", "how", "steps", "step", "prove", "derive", "solve", "understand", "difference",
+    "compare", "stuck", "confused", "working"
+))
+DEEP_QUESTION_WORDS = 30
+
+logger = logging.getLogger(__name__)
+
+class Tier(NamedTuple):
+    name: str
+    model: str
+    max_output_tokens: int
+    tokens_per_item: int = 0
+    hedge: bool = True
+
+    def budget(self, items: int = 1) -> int:
+        """Output token budget for a call producing items items"""
+        return min(MAX_OUTPUT_TOKENS, self.max_output_tokens + self.tokens_per_item * items)
+
+DEFAULT_TIERS = (
+    # The central brain's text is the reply the student sees, so it gets a chat-sized budget
+    Tier("routing", "gemini-1.5-flash", 2048),
+    Tier("quick_answer", "gemini-1.5-flash", 768),
+    Tier("deep_explanation", "gemini-1.5-flash", 2048),
+    # Long and proportional to the question count, so a latency percentile says little about a stuck call
+    Tier("bulk_generation", "gemini-1.5-flash", 512, tokens_per_item=300, hedge=False),
+)
+
+def _env(tier: str, setting: str) -> Optional[str]:
+    return os.environ.get(f"LLM_{tier.upper()}_{setting}")
+
+def load_tiers() -> Dict[str, Tier]:
+    """The default tiers with their environment overrides"""
+    tiers = {}
+    for tier in DEFAULT_TIERS:
+        tiers[tier.name] = tier._replace(
+            model=_env(tier.name, "MODEL") or tier.model,
+            max_output_tokens=int(_env(tier.name, "MAX_TOKENS") or tier.max_output_tokens),
+            tokens_per_item=int(_env(tier.name, "TOKENS_PER_ITEM") or tier.tokens_per_item)
+        )
+    return tiers
+
+def load_shadows(tiers: Dict[str, Tier]) -> Dict[str, Tier]:
+    """Candidate tiers to shadow, keyed by the tier they're compared with"""
+    shadows = {}
+    for name, tier in tiers.items():
+        model = _env(name, "SHADOW_MODEL")
+        if model:
+            shadows[name] = tier._replace(
+                model=model, max_output_tokens=int(_env(name, "SHADOW_MAX_TOKENS") or tier.max_output_tokens)
+            )
+    return shadows
+
+def chat_tier(message: str) -> str:
+    """quick_answer or deep_explanation, from the wording of a chat question"""
+    words = re.findall(r"[a-z']+", message.lower())
+    if len(words) > DEEP_QUESTION_WORDS or DEEP_CUES.intersection(words):
+        return "deep_explanation"
+    return "quick_answer"
+
+def outcome(completion: Completion, max_output_tokens: int, check: Optional[Callable[[str], bool]]) -> str:
+    """ok, truncated (hit the token budget) or rejected (failed the caller's check)"""
+    if check is not None:
+        try:
+            passed = check(completion.text)
+        except Exception:
+            passed = False
+        if not passed:
+            return "rejected"
+    if completion.completion_tokens >= max_output_tokens:
+        return "truncated"
+    return "ok"
+
+def side(completion: Completion, result: str, error: Optional[str] = None) -> dict:
+    return {
+        "model": completion.model,
+        "outcome": result,
+        "error": error,
+        "seconds": round(completion.seconds, 3),
+        "prompt_tokens": completion.prompt_tokens,
+        "completion_tokens": completion.completion_tokens,
+        "text": completion.text
+    }
+
+class ModelRouter:
+    """Sends each call to its tier's model, and samples calls into shadow comparisons"""
+
+    def __init__(self, gateway: LLMGateway, tiers: Optional[Dict[str, Tier]] = None,
+                 shadows: Optional[Dict[str, Tier]] = None, sample: float = SHADOW_SAMPLE):
+        self.gateway = gateway
+        self.tiers = tiers or load_tiers()
+        self.shadows = shadows if shadows is not None else load_shadows(self.tiers)
+        self.sample = sample
+        # The database, attached by the app once it is open; shadows aren't stored without it
+        self.db = None
+        self._shadow_tasks = set()
+        self._random = random.Random()
+
+    async def generate(self, tier_name: str, prompt: str, bot: str, caller=None, items: int = 1,
+                       check: Optional[Callable[[str], bool]] = None) -> str:
+        """Generate a completion on tier_name's model and return its text.
+
+        items sizes the token budget of per-item tiers; check, if given, says
+        whether a response is usable and feeds the quality metrics only.
+        """
+        tier = self.tiers[tier_name]
+        max_tokens = tier.budget(items)
+        started = time.perf_counter()
+        try:
+            completion = await self.gateway.complete(prompt, tier.model, bot, caller, max_tokens, hedge=tier.hedge)
+        except Exception:
+            metrics.observe_llm_tier(tier.name, tier.model, "primary", time.perf_counter() - started, "error")
+            raise
+        result = outcome(completion, max_tokens, check)
+        metrics.observe_llm_tier(tier.name, tier.model, "primary", time.perf_counter() - started, result)
+        if tier.name in self.shadows and self._should_shadow():
+            task = asyncio.get_running_loop().create_task(
+                self._shadow(self.shadows[tier.name], prompt, bot, items, check, completion, result)
+            )
+            self._shadow_tasks.add(task)
+            task.add_done_callback(self._shadow_tasks.discard)
+        return completion.text
+
+    def _should_shadow(self) -> bool:
+        if self.gateway.breaker.state != CLOSED or self.gateway.in_flight >= self.gateway.max_concurrency // 2:
+            return False
+        return self._random.random() < self.sample
+
+    async def _shadow(self, candidate: Tier, prompt: str, bot: str, items: int, check, primary: Completion,
+                      primary_outcome: str):
+        max_tokens = candidate.budget(items)
+        started = time.perf_counter()
+        completion, error = None, None
+        try:
+            completion = await self.gateway.complete(prompt, candidate.model, f"{bot}:shadow", None, max_tokens,
+                                                     background=True)
+            result = outcome(completion, max_tokens, check)
+        except Exception as e:
+            result, error = "error", f"{type(e).__name__}: {str(e)}"
+        metrics.observe_llm_tier(candidate.name, candidate.model, "shadow", time.perf_counter() - started, result)
+        if self.db is None:
+            return
+        try:
+            await self.db[SHADOW_COLLECTION].insert_one({
+                "tier": candidate.name,
+                "bot": bot,
+                "created_at": datetime.utcnow(),
+                "primary": side(primary, primary_outcome),
+                "candidate": side(completion, result, error) if completion else {
+                    "model": candidate.model, "outcome": result, "error": error
+                }
+            })
+        except Exception as e:
+            logger.error(f"Could not store shadow comparison: {str(e)}")
+
+    async def close(self):
+        """Cancel shadow comparisons still running"""
+        for task in list(self._shadow_tasks):
+            task.cancel()
+        await asyncio.gather(*self._shadow_tasks, return_exceptions=True)
+
+async def summarize(db, since: datetime) -> list:
+    """Shadow comparisons since a date, per tier and model pair: latency, tokens and ok rate of each side"""
+    rows = await db[SHADOW_COLLECTION].aggregate([
+        {"$match": {"created_at": {"$gte": since}}},
+        {"$group": {
+            "_id": {"tier": "$tier", "primary": "$primary.model", "candidate": "$candidate.model"},
+            "samples": {"$sum": 1},
+            "primary_seconds": {"$avg": "$primary.seconds"},
+            "candidate_seconds": {"$avg": "$candidate.seconds"},
+            "primary_completion_tokens": {"$avg": "$primary.completion_tokens"},
+            "candidate_completion_tokens": {"$avg": "$candidate.completion_tokens"},
+            "primary_ok": {"$sum": {"$cond": [{"$eq": ["$primary.outcome", "ok"]}, 1, 0]}},
+            "candidate_ok": {"$sum": {"$cond": [{"$eq": ["$candidate.outcome", "ok"]}, 1, 0]}},
+            "candidate_errors": {"$sum": {"$cond": [{"$eq": ["$candidate.outcome", "error"]}, 1, 0]}}
+        }},
+        {"$sort": {"_id.tier": 1, "samples": -1}}
+    ]).to_list(None)
+    summary = []
+    for row in rows:
+        samples = row["samples"]
+        summary.append({
+            **row.pop("_id"),
+            "samples": samples,
+            "primary_seconds": round(row["primary_seconds"] or 0, 3),
+            "candidate_seconds": round(row["candidate_seconds"] or 0, 3),
+            "primary_completion_tokens": round(row["primary_completion_tokens"] or 0),
+            "candidate_completion_tokens": round(row["candidate_completion_tokens"] or 0),
+            "primary_ok_rate": round(row["primary_ok"] / samples, 3),
+            "candidate_ok_rate": round(row["candidate_ok"] / samples, 3),
+            "candidate_errors": row["candidate_errors"]
+        })
+    return summary
@@ -0,0 +1,139 @@
+"""Per-request MongoDB query accounting for development and test runs.
+
+With ``QUERY_DEBUG=1`` every HTTP request keeps a ledger of the MongoDB
+commands it issues. Responses carry an ``X-Query-Count`` header (commands
+issued before the response started) and an ``X-Query-Repeats`` header (how
+many query shapes were repeated), so tests can hold endpoints to a query
+budget. The worker also logs:
+
+- possible N+1 patterns: one query shape (command, collection and filter with
+  the values blanked out) issued ``QUERY_REPEAT_THRESHOLD`` or more times in
+  a single request;
+- slow commands: anything slower than ``SLOW_QUERY_MS``, with its filter.
+
+With the flag unset neither the listener nor the middleware is installed.
+"""
+import json
+import logging
+import os
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+
+QUERY_DEBUG = os.environ.get('QUERY_DEBUG', '').lower() in ('1', 'true', 'yes')
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', '3'))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+
+# Cursor follow-ups repeat by design and say nothing about the query itself
+UNSHAPED_COMMANDS = {"getMore", "killCursors"}
+
+logger = logging.getLogger(__name__)
+
+class QueryLedger:
+    """The MongoDB commands issued while serving one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def record(self, shape: Optional[str]):
+        self.count += 1
+        if shape:
+            self.shapes[shape] += 1
+
+    def repeats(self) -> Dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count >= QUERY_REPEAT_THRESHOLD}
+
+current_ledger: ContextVar[Optional[QueryLedger]] = ContextVar("query_ledger", default=None)
+
+def blank(value):
+    """value with every literal replaced by its type name; keys and operators are kept"""
+    if isinstance(value, dict):
+        return {key: blank(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # An $in list has the same shape whatever its length
+        return [blank(value[0])] if value else []
+    return type(value).__name__
+
+def command_filter(command_name: str, command: dict):
+    """The part of a command that selects documents"""
+    if command_name == "find":
+        return command.get("filter", {})
+    if command_name == "aggregate":
+        return command.get("pipeline", [])
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query", {})
+    if command_name == "update":
+        return [statement.get("q", {}) for statement in command.get("updates", [])]
+    if command_name == "delete":
+        return [statement.get("q", {}) for statement in command.get("deletes", [])]
+    return None
+
+def query_shape(command_name: str, collection: str, selector) -> str:
+    if command_name == "aggregate":
+        # Every pipeline stage matters, so stages are blanked one by one
+        selector = [blank(stage) for stage in selector]
+    elif selector is not None:
+        selector = blank(selector)
+    return f"{command_name} {collection} {json.dumps(selector, sort_keys=True, default=str)}"
+
+class QueryTracker(monitoring.CommandListener):
+    """Adds each command to the current request's ledger and logs slow ones"""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "-")
+        selector = command_filter(event.command_name, event.command)
+        self._pending[(event.connection_id, event.request_id)] = (collection, selector)
+
+        ledger = current_ledger.get()
+        if ledger is not None:
+            unshaped = event.command_name in UNSHAPED_COMMANDS
+            ledger.record(None if unshaped else query_shape(event.command_name, collection, selector))
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        collection, selector = self._pending.pop((event.connection_id, event.request_id), ("-", None))
+        elapsed_ms = event.duration_micros / 1000
+        if elapsed_ms >= SLOW_QUERY_MS:
+            logger.warning(f"Slow query ({elapsed_ms:.0f} ms): {event.command_name} {collection} {str(selector)[:500]}")
+
+class QueryBudgetMiddleware:
+    """Pure ASGI middleware giving each request a ledger and reporting it"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        ledger = QueryLedger()
+        token = current_ledger.set(ledger)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Query-Count"] = str(ledger.count)
+                headers["X-Query-Repeats"] = str(len(ledger.repeats()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_ledger.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            for shape, count in ledger.repeats().items():
+                logger.warning(f"Possible N+1 in {scope['method']} {route}: {count} x {shape}")
@@ -0,0 +1,158 @@
+"""Near-duplicate detection for stored practice questions.
+
+Every question in ``practice_questions`` carries a ``fingerprint`` of its
+normalized text (lowercased, punctuation and option letters dropped):
+
+    hash     SHA-1 of the question with its options, for exact repeats
+    minhash  a MinHash signature of the question's words and word pairs
+    bands    the signature cut into LSH bands, one indexed key per band
+    numbers  the numbers in the question and its options
+    answer   the normalized correct answer
+
+Two questions are near-duplicates when they share a band, their signatures
+estimate a shingle overlap (Jaccard similarity) of at least
+``QUESTION_DUPLICATE_SIMILARITY``, and their numbers and answers match.
+Questions are short, so wording alone says little: "what is the capital of
+France" and "... of Spain" overlap heavily, and only the answer tells them
+apart; likewise the numbers keep "what is 3 + 4" and "what is 5 + 6" apart.
+
+Generated questions are stored with ``store_questions``, which serves the
+stored question instead of inserting a near-duplicate. ``maintenance.py
+dedupe-questions`` fingerprints older questions and marks the repeats with
+``duplicate_of``; marked questions are kept so past attempts still grade.
+"""
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 20 bands of 3 rows: pairs at 0.6 similarity share a band 99% of the time, pairs at 0.3 about 40%
+BANDS = 20
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+SIMILARITY = float(os.environ.get('QUESTION_DUPLICATE_SIMILARITY', '0.6'))
+# Cap on stored candidates fetched for one batch of new questions
+MAX_CANDIDATES = 1000
+
+_MERSENNE = (1 << 31) - 1
+_permutations = np.random.default_rng(20240601)
+_A = _permutations.integers(1, _MERSENNE, NUM_PERM, dtype=np.uint64)
+_B = _permutations.integers(0, _MERSENNE, NUM_PERM, dtype=np.uint64)
+
+OPTION_LETTER = re.compile(r"^\s*\(?[a-d][.)]\s+", re.IGNORECASE)
+TOKEN = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+def normalize(text: str) -> str:
+    return " ".join(TOKEN.findall(OPTION_LETTER.sub("", text).lower()))
+
+def shingles(text: str) -> set:
+    """The words and adjacent word pairs of a normalized text"""
+    words = text.split()
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+def _hash64(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "little")
+
+def minhash(items: set) -> np.ndarray:
+    """MinHash signature of a set of strings, NUM_PERM values below 2**31"""
+    hashes = np.fromiter((_hash64(item.encode()) & _MERSENNE for item in items), dtype=np.uint64, count=len(items))
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _MERSENNE).min(axis=1)
+
+def fingerprint(question_text: str, options: Iterable[str] = (), correct_answer: str = "") -> dict:
+    text = normalize(question_text)
+    full_text = " ".join([text] + [normalize(option) for option in options])
+    signature = minhash(shingles(text) or {""})
+    return {
+        "hash": hashlib.sha1(full_text.encode()).hexdigest(),
+        "minhash": signature.tolist(),
+        "bands": [
+            f"{band}:{_hash64(signature[band * ROWS:(band + 1) * ROWS].tobytes()):016x}"
+            for band in range(BANDS)
+        ],
+        "numbers": sorted(set(NUMBER.findall(full_text))),
+        "answer": normalize(correct_answer)
+    }
+
+def question_fingerprint(question: dict) -> dict:
+    return fingerprint(question.get('question_text', ''), question.get('options') or (), question.get('correct_answer', ''))
+
+def similarity(first: dict, second: dict) -> float:
+    """Estimated Jaccard similarity of two fingerprints' shingles"""
+    if first["hash"] == second["hash"]:
+        return 1.0
+    return float(np.mean(np.array(first["minhash"]) == np.array(second["minhash"])))
+
+class BandIndex:
+    """In-memory LSH index of fingerprints, keyed by an id"""
+
+    def __init__(self):
+        self.fingerprints: Dict[str, dict] = {}
+        self._buckets: Dict[str, List[str]] = {}
+
+    def add(self, key: str, fp: dict):
+        self.fingerprints[key] = fp
+        for band in fp["bands"]:
+            self._buckets.setdefault(band, []).append(key)
+        self._buckets.setdefault(fp["hash"], []).append(key)
+
+    def find(self, fp: dict, exclude: Iterable[str] = ()) -> Optional[str]:
+        """The most similar indexed near-duplicate of a fingerprint, or None"""
+        excluded = set(exclude)
+        candidates = {key for band in fp["bands"] + [fp["hash"]] for key in self._buckets.get(band, ())}
+        best, best_similarity = None, 0.0
+        for key in candidates - excluded:
+            other = self.fingerprints[key]
+            if other["numbers"] != fp["numbers"] or other["answer"] != fp["answer"]:
+                continue
+            score = similarity(fp, other)
+            if score >= SIMILARITY and score > best_similarity:
+                best, best_similarity = key, score
+        return best
+
+def _subject(question: dict) -> str:
+    # Generated questions hold the Subject enum, stored ones its value
+    return getattr(question['subject'], 'value', question['subject'])
+
+async def store_questions(db, questions: List[dict]) -> List[dict]:
+    """Fingerprint and insert generated questions, reusing stored near-duplicates.
+
+    Returns the questions to serve in order: a new question with a stored
+    near-duplicate is replaced by the stored one and not inserted.
+    """
+    if not questions:
+        return []
+    prints = [question_fingerprint(question) for question in questions]
+    bands = sorted({band for fp in prints for band in fp["bands"]})
+    candidates = await db.practice_questions.find(
+        {
+            "subject": {"$in": sorted({_subject(question) for question in questions})},
+            "duplicate_of": {"$exists": False},
+            "assigned": {"$exists": False},
+            "fingerprint.bands": {"$in": bands}
+        },
+        {"_id": 0}
+    ).to_list(MAX_CANDIDATES)
+
+    indexes: Dict[str, BandIndex] = {}
+    stored = {}
+    for candidate in candidates:
+        indexes.setdefault(candidate['subject'], BandIndex()).add(candidate['id'], candidate['fingerprint'])
+        stored[candidate['id']] = candidate
+
+    served, new, reused = [], [], set()
+    for question, fp in zip(questions, prints):
+        index = indexes.get(_subject(question))
+        match = index.find(fp, exclude=reused) if index else None
+        if match:
+            reused.add(match)
+            served.append(stored[match])
+        else:
+            question = {**question, "fingerprint": fp}
+            new.append(question)
+            served.append(question)
+    if new:
+        await db.practice_questions.insert_many(new)
+    return served
@@ -0,0 +1,131 @@
+"""Daily activity rollups.
+
+``daily_activity`` holds one bucket per (scope, key, day, subject) where the
+scope is ``student`` (key = student id) or ``class`` (key = class id). Each
+bucket counts messages, practice tests and mindfulness minutes for that day,
+and is upserted with ``$inc`` alongside the raw write so analytics read a
+range of buckets instead of scanning raw events. Mindfulness minutes have no
+subject and are stored under ``subject: None``.
+
+The rebuild functions replace buckets wholesale and are meant for backfills
+run from ``maintenance.py``, not for concurrent use with live traffic.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+ROLLUP_COLLECTION = "daily_activity"
+COUNTERS = ("messages", "tests", "minutes")
+
+def day_start(moment: datetime) -> datetime:
+    """Midnight (UTC) of the day a timestamp falls in"""
+    return datetime(moment.year, moment.month, moment.day)
+
+async def record_activity(db, student_id: str, class_ids: Optional[Iterable[str]], moment: datetime,
+                          subject: Optional[str] = None, messages: int = 0, tests: int = 0, minutes: int = 0):
+    """Add activity to the student's bucket and to the bucket of each of their classes.
+
+    ``class_ids`` may be None, in which case they are read from the profile.
+    """
+    if class_ids is None:
+        profile = await db.student_profiles.find_one({"user_id": student_id}, {"_id": 0, "joined_classes": 1})
+        class_ids = (profile or {}).get('joined_classes', [])
+    day = day_start(moment)
+    inc = {name: value for name, value in (("messages", messages), ("tests", tests), ("minutes", minutes)) if value}
+    if not inc:
+        return
+    await db[ROLLUP_COLLECTION].bulk_write([
+        UpdateOne({"scope": scope, "key": key, "day": day, "subject": subject}, {"$inc": inc}, upsert=True)
+        for scope, key in [("student", student_id)] + [("class", class_id) for class_id in class_ids]
+    ], ordered=False)
+
+async def daily_totals(db, scope: str, keys: List[str], since: datetime, until: Optional[datetime] = None) -> Dict[datetime, Dict[str, int]]:
+    """Counters summed over keys and subjects for each day in [since, until)"""
+    day_filter = {"$gte": day_start(since)}
+    if until:
+        day_filter["$lt"] = until
+    rows = await db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"scope": scope, "key": {"$in": keys}, "day": day_filter}},
+        {"$group": {"_id": "$day", **{name: {"$sum": f"${name}"} for name in COUNTERS}}},
+        {"$sort": {"_id": 1}}
+    ]).to_list(None)
+    return {row['_id']: {name: row.get(name, 0) for name in COUNTERS} for row in rows}
+
+def weekly_totals(daily: Dict[datetime, Dict[str, int]], counter: str = "messages") -> List[dict]:
+    """Fold daily totals into Sunday-based weeks, labelled like MongoDB's $week"""
+    weeks = defaultdict(int)
+    for day, counters in daily.items():
+        weeks[(day.year, int(day.strftime("%U")))] += counters.get(counter, 0)
+    return [{"week": f"{year}-W{week}", "count": count} for (year, week), count in sorted(weeks.items()) if count]
+
+async def rebuild_student_rollups(db, student_ids: List[str]):
+    """Recompute the student buckets of the given students from raw events"""
+    buckets = defaultdict(lambda: {name: 0 for name in COUNTERS})
+    match = {"$match": {"student_id": {"$in": student_ids}}}
+
+    def by_day(field):
+        return {"$dateFromParts": {"year": {"$year": field}, "month": {"$month": field}, "day": {"$dayOfMonth": field}}}
+
+    chat_rows = await db.chat_messages.aggregate([
+        match,
+        {"$group": {"_id": {"key": "$student_id", "day": by_day("$timestamp"), "subject": "$subject"}, "count": {"$sum": 1}}}
+    ]).to_list(None)
+    for row in chat_rows:
+        buckets[(row['_id']['key'], row['_id']['day'], row['_id']['subject'])]["messages"] += row['count']
+
+    practice_rows = await db.practice_attempts.aggregate([
+        match,
+        {"$lookup": {
+            "from": "practice_questions",
+            "let": {"first_question": {"$arrayElemAt": ["$questions", 0]}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$first_question"]}}},
+                {"$project": {"_id": 0, "subject": 1}}
+            ],
+            "as": "first_question"
+        }},
+        {"$group": {
+            "_id": {
+                "key": "$student_id",
+                "day": by_day("$completed_at"),
+                "subject": {"$ifNull": ["$subject", {"$arrayElemAt": ["$first_question.subject", 0]}]}
+            },
+            "count": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    for row in practice_rows:
+        buckets[(row['_id']['key'], row['_id']['day'], row['_id'].get('subject'))]["tests"] += row['count']
+
+    mindfulness_rows = await db.mindfulness_activities.aggregate([
+        match,
+        {"$group": {"_id": {"key": "$student_id", "day": by_day("$completed_at")}, "minutes": {"$sum": "$duration"}}}
+    ]).to_list(None)
+    for row in mindfulness_rows:
+        buckets[(row['_id']['key'], row['_id']['day'], None)]["minutes"] += row['minutes']
+
+    await db[ROLLUP_COLLECTION].delete_many({"scope": "student", "key": {"$in": student_ids}})
+    if buckets:
+        await db[ROLLUP_COLLECTION].insert_many([
+            {"scope": "student", "key": key, "day": day, "subject": subject, **counters}
+            for (key, day, subject), counters in buckets.items()
+        ], ordered=False)
+
+async def rebuild_class_rollups(db, classroom: dict):
+    """Recompute a class's buckets by summing its current members' student buckets"""
+    rows = await db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"scope": "student", "key": {"$in": classroom.get('students', [])}}},
+        {"$group": {"_id": {"day": "$day", "subject": "$subject"}, **{name: {"$sum": f"${name}"} for name in COUNTERS}}}
+    ]).to_list(None)
+    await db[ROLLUP_COLLECTION].delete_many({"scope": "class", "key": classroom['class_id']})
+    if rows:
+        await db[ROLLUP_COLLECTION].insert_many([
+            {"scope": "class", "key": classroom['class_id'], "day": row['_id']['day'], "subject": row['_id'].get('subject'),
+             **{name: row[name] for name in COUNTERS}}
+            for row in rows
+        ], ordered=False)
+
+def recent_days(days: int) -> datetime:
+    """Start of the window covering the last ``days`` days including today"""
+    return day_start(datetime.utcnow()) - timedelta(days=days - 1)
@@ -0,0 +1,53 @@
+"""Roster parsing for bulk student provisioning.
+
+A roster lists the students to create, each optionally naming the class they
+should be placed in. It arrives either as CSV with a header row or as JSON (a
+list of objects, or ``{"students": [...]}``) using the same field names:
+
+    email,name,grade_level,class_name,subject,password
+
+Only email, name and grade_level are required. Rows without a password get a
+generated one that is returned to the teacher once in the import summary.
+"""
+import csv
+import io
+import json
+import secrets
+from typing import Any, Dict, List
+
+ROSTER_FIELDS = ("email", "name", "grade_level", "class_name", "subject", "password")
+MAX_ROSTER_SIZE = 5000
+
+def parse_roster(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    """Rows of a CSV or JSON roster as dicts; raises ValueError when malformed"""
+    try:
+        text = body.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError("Roster must be UTF-8 encoded")
+
+    if 'csv' in content_type:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not {"email", "name"} <= {name.strip().lower() for name in reader.fieldnames}:
+            raise ValueError("CSV roster needs a header row with at least email and name columns")
+        rows = [
+            {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            for row in reader
+        ]
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON roster: {e.msg}")
+        rows = data.get('students') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("JSON roster must be a list of student objects")
+
+    # Blank cells mean "not given", so optional fields fall back to their defaults
+    return [
+        {field: row[field] for field in ROSTER_FIELDS if row.get(field) not in (None, '')}
+        for row in rows
+    ]
+
+def generate_password() -> str:
+    """A random initial password for a provisioned student"""
+    return secrets.token_urlsafe(9)
@@ -0,0 +1,57 @@
+"""Fast serialization path for read endpoints.
+
+Documents read back from MongoDB were validated by the pydantic models when
+they were written, so read routes shape them into plain dicts instead of
+constructing (and re-validating) a model per document, and hand the result
+to ``FastJSONResponse`` which encodes it with orjson in a single pass.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple, Type
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+@lru_cache(maxsize=None)
+def _model_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, Any], ...]:
+    """Field names and field infos of a model, computed once per model"""
+    return tuple(model.model_fields.items())
+
+def trusted(model: Type[BaseModel], doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a stored document like ``model(**doc)`` would, without validating it.
+
+    Only the model's fields are kept (so ``_id`` and internal fields such as
+    password hashes never leak), and missing optional fields get their
+    defaults.
+    """
+    shaped = {}
+    for name, field in _model_fields(model):
+        if name in doc:
+            shaped[name] = doc[name]
+        elif field.is_required():
+            shaped[name] = None
+        else:
+            shaped[name] = field.get_default(call_default_factory=True)
+    return shaped
+
+def trusted_list(model: Type[BaseModel], docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Shape a list of stored documents with ``trusted``"""
+    return [trusted(model, doc) for doc in docs]
+
+def _orjson_default(obj: Any) -> Any:
+    """Encode the types orjson does not handle natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson (datetimes, enums and UUIDs natively)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
@@ -1,46 +1,129 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, ReturnDocument, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 import asyncio
 from pathlib import Path
-from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timedelta
-import google.generativeai as genai
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 import jwt
 import bcrypt
 import json
 import random
 import string
+import base64
+import hashlib
+import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from serialization import FastJSONResponse, trusted, trusted_list
+import student_stats
+import rollups
+import roster
+from cache import TTLCache
+from dataloader import Loaders
+from llm_gateway import LLMGateway, LLMUnavailable
+import health
+import metrics
+import query_budget
+import llm_usage
+import model_router
+import question_index
+import mastery
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Configure Gemini API
-genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-
-# MongoDB connection
+# MongoDB connection and Gemini gateway
+# Both are opened per worker process in the lifespan below, never at import
+# time, so workers forked from a preloaded app don't share sockets or threads.
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
 db_name = os.environ.get('DB_NAME', 'test_database')
-db = client[db_name]
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+client = None
+db = None
+llm = LLMGateway()
+llm_router = model_router.ModelRouter(llm)
+usage_recorder = None
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-super-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open and warm up this worker's database client and thread pools, and close them on shutdown.
+
+    The readiness probe (see /api/health/ready) fails until the warm-up has
+    finished; the Gemini SDK is imported in the background after that so it
+    doesn't delay readiness.
+    """
+    global client, db, usage_recorder
+    started = time.perf_counter()
+    pool_monitor = health.PoolMonitor(MONGO_MAX_POOL_SIZE)
+    loop_monitor = health.LoopLagMonitor()
+    listeners = [pool_monitor, metrics.CommandMetrics()]
+    if query_budget.QUERY_DEBUG:
+        listeners.append(query_budget.QueryTracker())
+    client = AsyncIOMotorClient(mongo_url, maxPoolSize=MONGO_MAX_POOL_SIZE, event_listeners=listeners)
+    db = client[db_name]
+    usage_recorder = llm_usage.UsageRecorder(db)
+    llm.recorder = usage_recorder
+    llm_router.db = db
+    app.state.readiness = health.ReadinessProbe(lambda: client.admin.command("ping"), llm, pool_monitor, loop_monitor)
+    try:
+        await client.admin.command("ping")
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error warming up database: {str(e)}")
+    prespawn_threads(password_pool, 2)
+    prespawn_threads(llm.executor, 4)
+    loop_monitor.start()
+    usage_recorder.start()
+    depth_sampler = asyncio.create_task(sample_pool_depths(pool_monitor))
+    app.state.readiness.started = True
+    app.state.readiness.startup_seconds = round(time.perf_counter() - started, 3)
+    logger.info(f"Worker {os.getpid()} started in {app.state.readiness.startup_seconds}s")
+    
+    sdk_preload = asyncio.create_task(llm.preload())
+    yield
+    sdk_preload.cancel()
+    depth_sampler.cancel()
+    loop_monitor.stop()
+    await llm_router.close()
+    await usage_recorder.close()
+    llm.close()
+    client.close()
+
+async def sample_pool_depths(pool_monitor: health.PoolMonitor, interval: float = 1.0):
+    """Publish the thread and connection pool depths to the metrics every interval seconds"""
+    while True:
+        llm_stats = llm.stats()
+        metrics.set_pool_depth("llm", llm_stats["in_flight"] - llm_stats["queued"], llm_stats["queued"])
+        metrics.set_pool_depth("bcrypt", *metrics.executor_depth(password_pool))
+        metrics.set_pool_depth("mongodb", pool_monitor.in_use, max(0, pool_monitor.waiting))
+        await asyncio.sleep(interval)
+
 # Create the main app without a prefix
 app = FastAPI(
     title="Project K API",
     description="AI-powered educational platform API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # Create a router with the /api prefix
@@ -158,6 +241,24 @@ class ClassRoom(BaseModel):
 class JoinClassRequest(BaseModel):
     join_code: str
 
+class LeaveClassRequest(BaseModel):
+    class_id: str
+
+class ClassMembership(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    student_id: str
+    class_id: str
+    teacher_id: str
+    joined_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RosterStudent(BaseModel):
+    email: str
+    name: str
+    grade_level: GradeLevel
+    class_name: Optional[str] = None
+    subject: Optional[Subject] = None
+    password: Optional[str] = None
+
 # Chat and Learning Models
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -198,6 +299,10 @@ class PracticeQuestion(BaseModel):
     learning_objectives: List[str] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class AdaptiveTestRequest(BaseModel):
+    subject: Subject
+    question_count: int = Field(default=10, ge=5, le=50)
+
 class PracticeTestRequest(BaseModel):
     subject: Subject
     topics: List[str]
@@ -212,8 +317,47 @@ class PracticeAttempt(BaseModel):
     student_answers: Dict[str, str]
     score: float
     time_taken: int  # seconds
+    subject: Optional[Subject] = None
+    assignment_id: Optional[str] = None
     completed_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Class Assignment Models
+class AssignmentCreate(BaseModel):
+    class_id: str
+    title: str
+    topics: List[str]
+    difficulty: DifficultyLevel
+    question_count: int = Field(ge=5, le=50)
+    due_date: Optional[datetime] = None
+    use_stored_questions: bool = False
+
+class Assignment(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    class_id: str
+    teacher_id: str
+    subject: Subject
+    title: str
+    topics: List[str]
+    difficulty: DifficultyLevel
+    question_ids: List[str]
+    source: str  # "generated" or "question_bank"
+    due_date: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class AssignedQuestion(BaseModel):
+    """A question as served to a student taking an assignment, without its answer or explanation"""
+    id: str
+    subject: Subject
+    topics: List[str]
+    question_type: QuestionType
+    difficulty: DifficultyLevel
+    question_text: str
+    options: List[str] = []
+
+class AssignmentSubmission(BaseModel):
+    student_answers: Dict[str, str]
+    time_taken: int = 0
+
 # Notification Models
 class Notification(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -248,6 +392,77 @@ class MindfulnessActivity(BaseModel):
     mood_after: Optional[int] = None   # 1-10 scale
     completed_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Summary Views
+# Slim response models for list/overview screens, each paired with the
+# projection that makes MongoDB send only the fields the view needs
+class ClassSummary(BaseModel):
+    class_id: str
+    join_code: str
+    subject: Subject
+    class_name: str
+    grade_level: GradeLevel
+    description: Optional[str] = None
+    student_count: int = 0
+    created_at: datetime
+    is_active: bool = True
+
+class StudentSummary(BaseModel):
+    user_id: str
+    name: str
+    grade_level: Optional[GradeLevel] = None
+    total_xp: int = 0
+    level: int = 1
+    streak_days: int = 0
+    last_active: Optional[datetime] = None
+
+class ChatActivitySummary(BaseModel):
+    id: str
+    student_id: str
+    subject: Subject
+    user_message: str
+    bot_type: str
+    timestamp: datetime
+    topic: Optional[str] = None
+
+CLASS_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "class_id": 1,
+    "join_code": 1,
+    "subject": 1,
+    "class_name": 1,
+    "grade_level": 1,
+    "description": 1,
+    "created_at": 1,
+    "is_active": 1,
+    "student_count": {"$size": {"$ifNull": ["$students", []]}}
+}
+
+STUDENT_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "name": 1,
+    "grade_level": 1,
+    "total_xp": 1,
+    "level": 1,
+    "streak_days": 1,
+    "last_active": 1
+}
+
+CHAT_ACTIVITY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "student_id": 1,
+    "subject": 1,
+    "user_message": 1,
+    "bot_type": 1,
+    "timestamp": 1,
+    "topic": 1
+}
+
+def class_summary(classroom: dict) -> dict:
+    """Summarize a full classroom document (one fetched with its roster)"""
+    return trusted(ClassSummary, {**classroom, "student_count": len(classroom.get('students', []))})
+
 # Utility Functions
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -256,27 +471,147 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
+# Principals
+# Decoded tokens are cached (keyed by the full token string, so a forged token
+# can never hit another token's entry) until they expire, and profile
+# snapshots are cached per user so handlers that only read the caller's
+# profile skip the round trip. Profile writes in this worker refresh or drop
+# the snapshot; other workers may serve it for up to PROFILE_CACHE_TTL
+# seconds, so ETag-validated routes keep reading the profile directly.
+TOKEN_CACHE_TTL = 300
+PROFILE_CACHE_TTL = 30
+token_cache = TTLCache(maxsize=8192, ttl=TOKEN_CACHE_TTL)
+profile_cache = TTLCache(maxsize=4096, ttl=PROFILE_CACHE_TTL)
+PROFILE_COLLECTIONS = {"student": "student_profiles", "teacher": "teacher_profiles"}
+
 # Custom authentication function that returns proper 401 status
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Missing authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    payload = token_cache.get(credentials.credentials)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    ttl = min(TOKEN_CACHE_TTL, payload['exp'] - time.time()) if 'exp' in payload else TOKEN_CACHE_TTL
+    token_cache.set(credentials.credentials, payload, ttl=ttl)
+    return payload
+
+async def load_profile(user_id: str, user_type: str) -> Optional[dict]:
+    """A user's profile, served from the snapshot cache when possible"""
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        collection = PROFILE_COLLECTIONS.get(user_type)
+        profile = await db[collection].find_one({"user_id": user_id}, {"_id": 0}) if collection else None
+        if profile is None:
+            return None
+        profile_cache.set(user_id, profile)
+    return dict(profile)
+
+def remember_profile(profile: dict):
+    """Replace a user's cached snapshot with a profile just read back from a write"""
+    profile_cache.set(profile['user_id'], {key: value for key, value in profile.items() if key != '_id'})
+
+def forget_profile(user_id: str):
+    """Drop a user's cached snapshot after writing to their profile"""
+    profile_cache.invalidate(user_id)
+
+class Principal:
+    """The authenticated caller: the token's claims plus their profile, loaded once per request"""
+
+    def __init__(self, claims: dict):
+        self.claims = claims
+        self.user_id = claims['sub']
+        self.user_type = claims.get('user_type')
+        self._profile = None
+        self._loaded = False
+
+    async def profile(self) -> Optional[dict]:
+        if not self._loaded:
+            self._profile = await load_profile(self.user_id, self.user_type)
+            self._loaded = True
+        return self._profile
+
+async def get_principal(token_data: dict = Depends(verify_token)) -> Principal:
+    return Principal(token_data)
+
+# LLM budgets
+# Routes that call the LLM take the caller from get_llm_caller, which refuses
+# the request with 429 once the user or their school has used up today's
+# tokens (see llm_usage.py). School names rarely change, so they are cached.
+school_cache = TTLCache(maxsize=4096, ttl=300)
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+async def user_school(user_id: str) -> Optional[str]:
+    school = school_cache.get(user_id)
+    if school is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "school_name": 1})
+        school = (user or {}).get('school_name') or ""
+        school_cache.set(user_id, school)
+    return school or None
+
+async def get_llm_caller(principal: Principal = Depends(get_principal)) -> llm_usage.Caller:
+    caller = llm_usage.Caller(principal.user_id, await user_school(principal.user_id))
+    try:
+        await usage_recorder.check_budget(caller)
+    except llm_usage.BudgetExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Daily AI usage limit reached for your {'school' if e.scope == 'school' else 'account'}, it resets at midnight UTC",
+            headers={"Retry-After": str(llm_usage.seconds_until_reset())}
+        )
+    return caller
+
+async def require_admin(token_data: dict = Depends(verify_token)) -> dict:
+    """Allow only the administrators listed in ADMIN_EMAILS"""
+    if token_data.get('email', '').lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Administrator access required")
+    return token_data
+
+# Request-scoped loaders
+# Routes that fetch documents by key take a Loaders instance so lookups made
+# concurrently within the request collapse into one $in query per collection;
+# per-route totals are exposed at /api/metrics/loaders.
+loader_stats = defaultdict(lambda: {"requests": 0, "loads": 0, "queries": 0, "keys": 0})
+
+async def get_loaders(request: Request):
+    loaders = Loaders(db)
+    yield loaders
+    totals = loaders.totals()
+    route = request.scope.get("route")
+    stats = loader_stats[route.path if route else request.url.path]
+    stats["requests"] += 1
+    for name, value in totals.items():
+        stats[name] += value
+    logger.debug(f"{request.method} {request.url.path}: {totals['loads']} loads in {totals['queries']} queries for {totals['keys']} keys")
 
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
+# bcrypt releases the GIL while hashing, so hashes run in parallel on this
+# pool instead of blocking the event loop
+password_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(password_pool, hash_password, password)
+
+def prespawn_threads(executor: ThreadPoolExecutor, count: int):
+    """Start count threads of an executor now instead of on the first requests"""
+    barrier = threading.Barrier(count)
+    for _ in range(count):
+        # Each task waits for the others, so every one of them needs its own thread
+        executor.submit(barrier.wait, 1)
+
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
@@ -293,30 +628,35 @@ async def create_notification(recipient_id: str, title: str, message: str, notif
         type=notification_type
     )
     await db.notifications.insert_one(notification.dict())
+    await bump_user_versions(recipient_id)
     return notification
 
 async def award_xp(student_id: str, xp_amount: int, reason: str = ""):
     """Helper function to award XP and check for achievements"""
-    # Get current profile
-    profile = await db.student_profiles.find_one({"user_id": student_id})
+    # Add the XP and read the updated profile back in one round trip
+    profile = await db.student_profiles.find_one_and_update(
+        {"user_id": student_id},
+        {
+            "$inc": {"total_xp": xp_amount},
+            "$set": {"last_active": datetime.utcnow()}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
     if not profile:
         return
     
-    current_xp = profile.get("total_xp", 0)
-    new_xp = current_xp + xp_amount
+    new_xp = profile.get("total_xp", 0)
+    current_xp = new_xp - xp_amount
     
     # Calculate levels (every 100 XP = 1 level)
     current_level = (current_xp // 100) + 1
     new_level = (new_xp // 100) + 1
     
-    # Update profile
-    await db.student_profiles.update_one(
-        {"user_id": student_id},
-        {
-            "$inc": {"total_xp": xp_amount},
-            "$set": {"level": new_level, "last_active": datetime.utcnow()}
-        }
-    )
+    if profile.get("level") != new_level:
+        await db.student_profiles.update_one({"user_id": student_id}, {"$set": {"level": new_level}})
+        profile["level"] = new_level
+    remember_profile(profile)
     
     # Check for level up
     if new_level > current_level:
@@ -340,12 +680,363 @@ async def award_xp(student_id: str, xp_amount: int, reason: str = ""):
     
     return new_xp, new_level
 
+# Resource Versions
+# Every write bumps a counter for the user it affects (and for the classes a
+# student belongs to), so read endpoints can derive strong ETags from a single
+# lookup on resource_versions and answer If-None-Match with 304 before
+# touching any other collection.
+conditional_get_stats = defaultdict(lambda: {"requests": 0, "not_modified": 0})
+
+async def bump_user_versions(*user_ids: str):
+    """Bump the version counter of each given user"""
+    await db.resource_versions.bulk_write([
+        UpdateOne({"_id": f"user:{user_id}"}, {"$inc": {"v": 1}}, upsert=True)
+        for user_id in user_ids
+    ], ordered=False)
+
+async def bump_student_versions(student_id: str):
+    """Bump a student's version and that of every class they belong to"""
+    await db.resource_versions.bulk_write([
+        UpdateOne({"_id": f"user:{student_id}"}, {"$inc": {"v": 1}}, upsert=True),
+        UpdateMany({"students": student_id}, {"$inc": {"v": 1}})
+    ], ordered=False)
+
+async def track_class_version(classroom: dict, student_ids: Optional[List[str]] = None):
+    """Register a class (and optionally new members) in resource_versions and bump it"""
+    update = {"$inc": {"v": 1}, "$set": {"teacher_id": classroom['teacher_id']}}
+    if student_ids:
+        update["$addToSet"] = {"students": {"$each": classroom.get('students', []) + student_ids}}
+    else:
+        update["$setOnInsert"] = {"students": classroom.get('students', [])}
+    await db.resource_versions.update_one({"_id": f"class:{classroom['class_id']}"}, update, upsert=True)
+
+async def ensure_class_versions(teacher_id: str, classes: List[dict]) -> bool:
+    """Register classes that predate version tracking; returns True if any were added"""
+    class_ids = [f"class:{cls['class_id']}" for cls in classes]
+    if not class_ids:
+        return False
+    tracked = await db.resource_versions.distinct("_id", {"_id": {"$in": class_ids}})
+    missing = [cls for cls in classes if f"class:{cls['class_id']}" not in tracked]
+    if not missing:
+        return False
+    students_by_class = {}
+    if any('students' not in cls for cls in missing):
+        rosters = await db.classrooms.find(
+            {"class_id": {"$in": [cls['class_id'] for cls in missing]}}, {"_id": 0, "class_id": 1, "students": 1}
+        ).to_list(len(missing))
+        students_by_class = {roster['class_id']: roster.get('students', []) for roster in rosters}
+    await db.resource_versions.bulk_write([
+        UpdateOne(
+            {"_id": f"class:{cls['class_id']}"},
+            {"$set": {"teacher_id": teacher_id}, "$setOnInsert": {"v": 0, "students": cls.get('students', students_by_class.get(cls['class_id'], []))}},
+            upsert=True
+        )
+        for cls in missing
+    ], ordered=False)
+    return True
+
+async def compute_etag(scope: str, user_id: str, teacher_id: Optional[str] = None, class_id: Optional[str] = None,
+                       member_classes: bool = False, extra: str = "") -> str:
+    """Derive a strong ETag for a user's view from the relevant version counters.
+
+    ``teacher_id`` folds in every class the teacher owns, ``class_id`` a single
+    class and ``member_classes`` every class the user has joined.
+    """
+    version_filter = {"_id": {"$in": [f"user:{user_id}"] + ([f"class:{class_id}"] if class_id else [])}}
+    if teacher_id:
+        version_filter = {"$or": [version_filter, {"teacher_id": teacher_id}]}
+    elif member_classes:
+        version_filter = {"$or": [version_filter, {"students": user_id}]}
+    versions = await db.resource_versions.find(version_filter, {"v": 1}).to_list(None)
+    version_key = ",".join(sorted(f"{doc['_id']}={doc.get('v', 0)}" for doc in versions))
+    digest = hashlib.sha1(f"{scope}|{user_id}|{version_key}|{extra}".encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+def not_modified(request: Request, scope: str, etag: str) -> Optional[Response]:
+    """Return a 304 response when the client's If-None-Match already matches etag"""
+    stats = conditional_get_stats[scope]
+    stats["requests"] += 1
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        stats["not_modified"] += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+# Class Memberships
+# class_memberships mirrors the class rosters as one (student, class, teacher)
+# document per membership so access checks and roster counts are single
+# indexed queries; authorization answers are cached briefly per worker.
+membership_cache = TTLCache(maxsize=4096, ttl=30)
+
+async def add_membership(classroom: dict, student_id: str):
+    """Record a student's membership of a class"""
+    membership = ClassMembership(student_id=student_id, class_id=classroom['class_id'], teacher_id=classroom['teacher_id'])
+    await db.class_memberships.update_one(
+        {"class_id": membership.class_id, "student_id": student_id},
+        {"$setOnInsert": membership.dict()},
+        upsert=True
+    )
+    membership_cache.invalidate((classroom['teacher_id'], student_id))
+
+async def remove_membership(classroom: dict, student_id: str):
+    """Remove a student's membership of a class"""
+    await db.class_memberships.delete_one({"class_id": classroom['class_id'], "student_id": student_id})
+    membership_cache.invalidate((classroom['teacher_id'], student_id))
+
+async def teacher_has_student(teacher_id: str, student_id: str) -> bool:
+    """Whether a student belongs to any of a teacher's classes"""
+    key = (teacher_id, student_id)
+    cached = membership_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    found = await db.class_memberships.find_one({"teacher_id": teacher_id, "student_id": student_id}, {"_id": 1}) is not None
+    if not found:
+        # Rosters that predate class_memberships are checked (and repaired) directly
+        classroom = await db.classrooms.find_one({"teacher_id": teacher_id, "students": student_id}, {"_id": 0, "class_id": 1, "teacher_id": 1})
+        if classroom:
+            await add_membership(classroom, student_id)
+            found = True
+    
+    membership_cache.set(key, found)
+    return found
+
+async def teacher_student_ids(teacher_id: str) -> List[str]:
+    """Unique students across all of a teacher's classes"""
+    members, rostered = await asyncio.gather(
+        db.class_memberships.distinct("student_id", {"teacher_id": teacher_id}),
+        # Rosters that predate class_memberships
+        db.classrooms.distinct("students", {"teacher_id": teacher_id})
+    )
+    return list(dict.fromkeys(members + rostered))
+
+JOIN_CODE_ATTEMPTS = 10
+
+async def insert_classroom(classroom: ClassRoom) -> ClassRoom:
+    """Insert a class, drawing a fresh join code whenever the unique index rejects one"""
+    for _ in range(JOIN_CODE_ATTEMPTS):
+        try:
+            await db.classrooms.insert_one(classroom.dict())
+            return classroom
+        except DuplicateKeyError as e:
+            if "join_code" not in (e.details or {}).get("keyPattern", {}):
+                raise
+            classroom.join_code = generate_join_code()
+    raise HTTPException(status_code=503, detail="Could not allocate a unique join code, please retry")
+
+# Roster Import
+# Provisions a school's students in bulk: passwords are hashed in parallel on
+# the bcrypt pool and users, profiles, stats, memberships and welcome
+# notifications are written with one bulk write per collection and batch.
+ROSTER_HASH_CHUNK = 100
+ROSTER_WRITE_BATCH = 500
+
+def validate_roster(rows: List[Dict[str, Any]]):
+    """Split roster rows into valid students and per-row errors (rows are 1-based)"""
+    students, errors, seen = [], [], set()
+    for index, row in enumerate(rows, start=1):
+        try:
+            student = RosterStudent(**row)
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+            errors.append({"row": index, "email": row.get('email'), "error": problems})
+            continue
+        student.email = student.email.strip()
+        if student.email in seen:
+            errors.append({"row": index, "email": student.email, "error": "Duplicate email in roster"})
+            continue
+        seen.add(student.email)
+        students.append((index, student))
+    return students, errors
+
+async def provision_roster_classes(teacher_id: str, students, errors) -> Dict[str, dict]:
+    """Find or create the teacher's classes named in the roster, keyed by class name.
+
+    Rows naming a class that doesn't exist yet and giving no subject for it are
+    moved to ``errors`` and dropped from ``students``.
+    """
+    names = {student.class_name for _, student in students if student.class_name}
+    if not names:
+        return {}
+    existing = await db.classrooms.find(
+        {"teacher_id": teacher_id, "class_name": {"$in": list(names)}}, {"_id": 0}
+    ).to_list(None)
+    classes = {cls['class_name']: cls for cls in existing}
+
+    created = []
+    for name in sorted(names - classes.keys()):
+        first = next((student for _, student in students if student.class_name == name and student.subject), None)
+        if not first:
+            continue
+        classroom = ClassRoom(
+            class_id=str(uuid.uuid4()),
+            join_code=generate_join_code(),
+            teacher_id=teacher_id,
+            subject=first.subject,
+            class_name=name,
+            grade_level=first.grade_level
+        )
+        await insert_classroom(classroom)
+        classes[name] = classroom.dict()
+        created.append(classroom.class_id)
+
+    if created:
+        await db.teacher_profiles.update_one(
+            {"user_id": teacher_id},
+            {"$push": {"classes_created": {"$each": created}}}
+        )
+        forget_profile(teacher_id)
+
+    for index, student in list(students):
+        if student.class_name and student.class_name not in classes:
+            errors.append({"row": index, "email": student.email, "error": f"Class '{student.class_name}' does not exist and no subject was given to create it"})
+            students.remove((index, student))
+    return classes
+
+async def provision_roster(teacher_id: str, rows: List[Dict[str, Any]]):
+    """Create the students of a roster, yielding progress events as it goes"""
+    students, errors = validate_roster(rows)
+
+    # Accounts that already exist are reported rather than overwritten
+    existing_emails = set(await db.users.distinct("email", {"email": {"$in": [student.email for _, student in students]}}))
+    skipped = [student.email for _, student in students if student.email in existing_emails]
+    students = [(index, student) for index, student in students if student.email not in existing_emails]
+
+    classes = await provision_roster_classes(teacher_id, students, errors)
+    yield {"stage": "validated", "total": len(rows), "valid": len(students), "skipped": len(skipped), "errors": len(errors)}
+
+    teacher = await load_profile(teacher_id, "teacher") or {}
+    credentials = []
+    passwords = []
+    for _, student in students:
+        if not student.password:
+            student.password = roster.generate_password()
+            credentials.append({"email": student.email, "password": student.password})
+        passwords.append(student.password)
+
+    hashes = []
+    for start in range(0, len(passwords), ROSTER_HASH_CHUNK):
+        hashes.extend(await asyncio.gather(*(
+            hash_password_async(password) for password in passwords[start:start + ROSTER_HASH_CHUNK]
+        )))
+        yield {"stage": "hashing", "done": len(hashes), "total": len(passwords)}
+
+    created = set()
+    members_by_class = defaultdict(list)
+    for start in range(0, len(students), ROSTER_WRITE_BATCH):
+        batch = students[start:start + ROSTER_WRITE_BATCH]
+        users = []
+        for (index, student), hashed in zip(batch, hashes[start:start + ROSTER_WRITE_BATCH]):
+            user = User(email=student.email, name=student.name, user_type=UserType.STUDENT,
+                        grade_level=student.grade_level, school_name=teacher.get('school_name'))
+            users.append((index, student, {**user.dict(), "password": hashed}))
+
+        # An email registered concurrently fails its insert and is skipped
+        try:
+            await db.users.bulk_write([InsertOne(doc) for _, _, doc in users], ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error.get('code') for error in e.details.get('writeErrors', [])}
+            for position, code in sorted(failed.items()):
+                index, student, _ = users[position]
+                if code == 11000:
+                    skipped.append(student.email)
+                else:
+                    errors.append({"row": index, "email": student.email, "error": "Could not create user"})
+            users = [user for position, user in enumerate(users) if position not in failed]
+
+        profiles, memberships, notifications = [], [], []
+        for _, student, doc in users:
+            classroom = classes.get(student.class_name)
+            profile = StudentProfile(user_id=doc['id'], student_id=doc['id'], name=student.name, email=student.email,
+                                     grade_level=student.grade_level, joined_classes=[classroom['class_id']] if classroom else [])
+            profiles.append(InsertOne(profile.dict()))
+            if classroom:
+                members_by_class[student.class_name].append(doc['id'])
+                memberships.append(InsertOne(ClassMembership(student_id=doc['id'], class_id=classroom['class_id'],
+                                                             teacher_id=teacher_id).dict()))
+            notifications.append(InsertOne(Notification(
+                recipient_id=doc['id'],
+                title="Welcome to Project K! 🎓",
+                message=f"Hi {student.name}! Your teacher has set up your account. Ask questions, take practice tests, and track your progress.",
+                type="system"
+            ).dict()))
+
+        if users:
+            writes = [
+                db.student_profiles.bulk_write(profiles, ordered=False),
+                db.student_stats.bulk_write([InsertOne(student_stats.empty_stats(doc['id'])) for _, _, doc in users], ordered=False),
+                db.notifications.bulk_write(notifications, ordered=False)
+            ]
+            if memberships:
+                writes.append(db.class_memberships.bulk_write(memberships, ordered=False))
+            await asyncio.gather(*writes)
+        created.update(student.email for _, student, _ in users)
+        yield {"stage": "writing", "done": start + len(batch), "total": len(students), "created": len(created)}
+
+    for name, student_ids in members_by_class.items():
+        classroom = classes[name]
+        await db.classrooms.update_one({"class_id": classroom['class_id']}, {"$addToSet": {"students": {"$each": student_ids}}})
+        await track_class_version(classroom, student_ids)
+
+    yield {
+        "stage": "complete",
+        "created": len(created),
+        "skipped": skipped,
+        "errors": errors,
+        "classes": [
+            {"class_id": cls['class_id'], "class_name": name, "join_code": cls['join_code'], "added": len(members_by_class.get(name, []))}
+            for name, cls in classes.items()
+        ],
+        "credentials": [credential for credential in credentials if credential['email'] in created]
+    }
+
+def parse_practice_questions(response_text: str, subject: Subject, topics: List[str], difficulty: DifficultyLevel) -> List[PracticeQuestion]:
+    """Turn the practice bot's JSON array into questions; raises JSONDecodeError or KeyError when malformed"""
+    # Extract JSON from response
+    start_idx = response_text.find('[')
+    end_idx = response_text.rfind(']') + 1
+    json_str = response_text[start_idx:end_idx]
+    questions_data = json.loads(json_str)
+
+    # Create PracticeQuestion objects
+    questions = []
+    for q_data in questions_data:
+        # Normalize question type to lowercase to handle AI variations
+        q_type = q_data.get('question_type', 'mcq').lower()
+
+        # Map common variations
+        if q_type in ['mcq', 'multiple_choice', 'multiple choice']:
+            q_type = 'mcq'
+        elif q_type in ['short_answer', 'short answer', 'short']:
+            q_type = 'short_answer'
+        elif q_type in ['numerical', 'numeric', 'number']:
+            q_type = 'numerical'
+        elif q_type in ['long_answer', 'long answer', 'long']:
+            q_type = 'long_answer'
+        else:
+            q_type = 'mcq'  # Default fallback
+
+        question = PracticeQuestion(
+            subject=subject,
+            topics=topics,
+            question_type=QuestionType(q_type),
+            difficulty=difficulty,
+            question_text=q_data['question_text'],
+            options=q_data.get('options', []),
+            correct_answer=q_data['correct_answer'],
+            explanation=q_data['explanation'],
+            learning_objectives=[q_data.get('learning_objective', '')]
+        )
+        questions.append(question)
+
+    return questions
+
 # AI Bot Classes
 class CentralBrainBot:
     def __init__(self):
         self.api_key = os.environ.get('GEMINI_API_KEY')
         
-    async def analyze_and_route(self, message: str, session_id: str, student_profile=None):
+    async def analyze_and_route(self, message: str, session_id: str, student_profile=None, caller=None):
         """Analyze user message and determine which bot should handle it"""
         profile_context = ""
         if student_profile:
@@ -381,22 +1072,14 @@ class CentralBrainBot:
         
         Always be encouraging and supportive. Remember, you're helping middle and high school students."""
         
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        chat = model.start_chat(history=[])
-        
-        response = await asyncio.to_thread(
-            chat.send_message,
-            f"System: {system_prompt}\n\nUser: {message}"
-        )
-        
-        return response.text
+        return await llm_router.generate("routing", f"System: {system_prompt}\n\nUser: {message}", "central_brain", caller)
 
 class SubjectBot:
     def __init__(self, subject: Subject):
         self.subject = subject
         self.api_key = os.environ.get('GEMINI_API_KEY')
         
-    async def teach_subject(self, message: str, session_id: str, student_profile=None, conversation_history=None):
+    async def teach_subject(self, message: str, session_id: str, student_profile=None, conversation_history=None, caller=None):
         """Teach subject using Socratic method with personalized approach"""
         
         # Subject-specific curriculum knowledge (NCERT-based)
@@ -463,21 +1146,16 @@ class SubjectBot:
         
         Remember: You're helping students LEARN, not just getting answers. Make {self.subject.value} feel approachable and fun!"""
         
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        chat = model.start_chat(history=[])
-        
-        response = await asyncio.to_thread(
-            chat.send_message,
-            f"System: {system_prompt}\n\nUser: {message}"
+        return await llm_router.generate(
+            model_router.chat_tier(message), f"System: {system_prompt}\n\nUser: {message}", f"{self.subject.value}_bot", caller
         )
-        
-        return response.text
 
 class PracticeTestBot:
     def __init__(self):
         self.api_key = os.environ.get('GEMINI_API_KEY')
         
-    async def generate_practice_questions(self, subject: Subject, topics: List[str], difficulty: DifficultyLevel, count: int = 5):
+    async def generate_practice_questions(self, subject: Subject, topics: List[str], difficulty: DifficultyLevel, count: int = 5,
+                                          caller=None):
         """Generate adaptive practice questions"""
         
         system_prompt = f"""You are the Practice Test Bot of Project K. Generate {count} practice questions for:
@@ -508,49 +1186,13 @@ class PracticeTestBot:
         
         Make questions NCERT curriculum aligned and age-appropriate. Ensure variety in question types and difficulty within the specified level."""
         
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = await asyncio.to_thread(model.generate_content, system_prompt)
+        response_text = await llm_router.generate(
+            "bulk_generation", system_prompt, "practice_bot", caller, items=count,
+            check=lambda text: len(parse_practice_questions(text, subject, topics, difficulty)) >= count
+        )
         
         try:
-            # Extract JSON from response
-            response_text = response.text
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
-            json_str = response_text[start_idx:end_idx]
-            questions_data = json.loads(json_str)
-            
-            # Create PracticeQuestion objects
-            questions = []
-            for q_data in questions_data:
-                # Normalize question type to lowercase to handle AI variations
-                q_type = q_data.get('question_type', 'mcq').lower()
-                
-                # Map common variations
-                if q_type in ['mcq', 'multiple_choice', 'multiple choice']:
-                    q_type = 'mcq'
-                elif q_type in ['short_answer', 'short answer', 'short']:
-                    q_type = 'short_answer'
-                elif q_type in ['numerical', 'numeric', 'number']:
-                    q_type = 'numerical'
-                elif q_type in ['long_answer', 'long answer', 'long']:
-                    q_type = 'long_answer'
-                else:
-                    q_type = 'mcq'  # Default fallback
-                
-                question = PracticeQuestion(
-                    subject=subject,
-                    topics=topics,
-                    question_type=QuestionType(q_type),
-                    difficulty=difficulty,
-                    question_text=q_data['question_text'],
-                    options=q_data.get('options', []),
-                    correct_answer=q_data['correct_answer'],
-                    explanation=q_data['explanation'],
-                    learning_objectives=[q_data.get('learning_objective', '')]
-                )
-                questions.append(question)
-            
-            return questions
+            return parse_practice_questions(response_text, subject, topics, difficulty)
         except (json.JSONDecodeError, KeyError) as e:
             # Fallback to simple questions if JSON parsing fails
             return await self._generate_fallback_questions(subject, topics, difficulty, count)
@@ -567,7 +1209,7 @@ class PracticeTestBot:
                 question_text=f"Sample {subject.value} question {i+1} on {', '.join(topics)}",
                 options=["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"],
                 correct_answer="A. Option 1",
-                explanation="This is a sample explanation.",
+                explanation=FALLBACK_EXPLANATION,
                 learning_objectives=["Practice basic concepts"]
             )
             questions.append(question)
@@ -586,6 +1228,54 @@ subject_bots = {
 }
 practice_bot = PracticeTestBot()
 
+# Degraded mode
+# While the LLM circuit is open (or a call times out), chat repeats an answer
+# this worker gave to the same standalone question in the same subject, and
+# practice tests are drawn from questions stored by earlier generations.
+# Anything else fails fast with a 503.
+ANSWER_CACHE_TTL = 6 * 3600
+answer_cache = TTLCache(maxsize=4096, ttl=ANSWER_CACHE_TTL)
+FALLBACK_EXPLANATION = "This is a sample explanation."
+
+def answer_key(subject: Subject, message: str) -> tuple:
+    """Cache key of a chat question, ignoring case and spacing"""
+    return subject.value, " ".join(message.lower().split())
+
+def llm_unavailable(e: LLMUnavailable) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The AI tutor is temporarily unavailable, please try again shortly",
+        headers={"Retry-After": str(e.retry_after or 30)}
+    )
+
+def question_bank_query(subject: Subject) -> dict:
+    """Stored questions of a subject worth serving again: no marked repeats, assignment or placeholder questions"""
+    return {
+        "subject": subject.value,
+        "duplicate_of": {"$exists": False},
+        "assigned": {"$exists": False},
+        "explanation": {"$ne": FALLBACK_EXPLANATION}
+    }
+
+async def question_bank_test(subject: Subject, topics: List[str], difficulty: DifficultyLevel, count: int) -> List[dict]:
+    """Random stored questions for a practice test, or [] if the bank can't fill one.
+
+    Questions on the requested topics are preferred; otherwise any stored
+    question of the subject and difficulty is used.
+    """
+    query = question_bank_query(subject)
+    if difficulty != DifficultyLevel.MIXED:
+        query["difficulty"] = difficulty.value
+    for match in ({**query, "topics": {"$in": topics}}, query):
+        questions = await db.practice_questions.aggregate([
+            {"$match": match},
+            {"$sample": {"size": count}},
+            {"$project": {"_id": 0, "fingerprint": 0}}
+        ]).to_list(count)
+        if len(questions) >= count:
+            return questions
+    return []
+
 # Authentication Routes
 @api_router.post("/auth/register")
 async def register_user(user_data: UserCreate):
@@ -596,7 +1286,7 @@ async def register_user(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     
     # Create user
     user = User(
@@ -686,16 +1376,16 @@ async def login_user(login_data: UserLogin):
 
 # Student Routes
 @api_router.get("/student/profile")
-async def get_student_profile(token_data: dict = Depends(verify_token)):
+async def get_student_profile(principal: Principal = Depends(get_principal)):
     """Get current student profile"""
-    if token_data.get('user_type') != 'student':
+    if principal.user_type != 'student':
         raise HTTPException(status_code=403, detail="Student access required")
     
-    profile = await db.student_profiles.find_one({"user_id": token_data['sub']})
+    profile = await principal.profile()
     if not profile:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    return StudentProfile(**profile)
+    return FastJSONResponse(trusted(StudentProfile, profile))
 
 @api_router.put("/student/profile")
 async def update_student_profile(updates: Dict[str, Any], token_data: dict = Depends(verify_token)):
@@ -704,29 +1394,33 @@ async def update_student_profile(updates: Dict[str, Any], token_data: dict = Dep
         raise HTTPException(status_code=403, detail="Student access required")
     
     updates['last_active'] = datetime.utcnow()
-    result = await db.student_profiles.update_one(
+    profile = await db.student_profiles.find_one_and_update(
         {"user_id": token_data['sub']}, 
-        {"$set": updates}
+        {"$set": updates},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not profile:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    profile = await db.student_profiles.find_one({"user_id": token_data['sub']})
+    remember_profile(profile)
+    await bump_student_versions(token_data['sub'])
+    
     return StudentProfile(**profile)
 
 # Teacher Routes
 @api_router.get("/teacher/profile")
-async def get_teacher_profile(token_data: dict = Depends(verify_token)):
+async def get_teacher_profile(principal: Principal = Depends(get_principal)):
     """Get current teacher profile"""
-    if token_data.get('user_type') != 'teacher':
+    if principal.user_type != 'teacher':
         raise HTTPException(status_code=403, detail="Teacher access required")
     
-    profile = await db.teacher_profiles.find_one({"user_id": token_data['sub']})
+    profile = await principal.profile()
     if not profile:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
     
-    return TeacherProfile(**profile)
+    return FastJSONResponse(trusted(TeacherProfile, profile))
 
 # Class Management Routes
 @api_router.post("/teacher/classes")
@@ -735,14 +1429,9 @@ async def create_class(class_data: Dict[str, Any], token_data: dict = Depends(ve
     if token_data.get('user_type') != 'teacher':
         raise HTTPException(status_code=403, detail="Teacher access required")
     
-    # Generate unique join code
-    join_code = generate_join_code()
-    while await db.classrooms.find_one({"join_code": join_code}):
-        join_code = generate_join_code()
-    
     classroom = ClassRoom(
         class_id=str(uuid.uuid4()),
-        join_code=join_code,
+        join_code=generate_join_code(),
         teacher_id=token_data['sub'],
         subject=Subject(class_data['subject']),
         class_name=class_data['class_name'],
@@ -750,24 +1439,61 @@ async def create_class(class_data: Dict[str, Any], token_data: dict = Depends(ve
         description=class_data.get('description', '')
     )
     
-    await db.classrooms.insert_one(classroom.dict())
+    await insert_classroom(classroom)
     
     # Update teacher's classes
     await db.teacher_profiles.update_one(
         {"user_id": token_data['sub']},
         {"$push": {"classes_created": classroom.class_id}}
     )
+    forget_profile(token_data['sub'])
+    await track_class_version(classroom.dict())
     
     return classroom
 
 @api_router.get("/teacher/classes")
-async def get_teacher_classes(token_data: dict = Depends(verify_token)):
+async def get_teacher_classes(request: Request, token_data: dict = Depends(verify_token)):
     """Get all classes created by teacher"""
     if token_data.get('user_type') != 'teacher':
         raise HTTPException(status_code=403, detail="Teacher access required")
     
-    classes = await db.classrooms.find({"teacher_id": token_data['sub']}).to_list(100)
-    return [ClassRoom(**cls) for cls in classes]
+    etag = await compute_etag("teacher_classes", token_data['sub'], teacher_id=token_data['sub'])
+    cached = not_modified(request, "teacher_classes", etag)
+    if cached:
+        return cached
+    
+    classes = await db.classrooms.find({"teacher_id": token_data['sub']}, CLASS_SUMMARY_PROJECTION).to_list(100)
+    repaired = await ensure_class_versions(token_data['sub'], classes)
+    return FastJSONResponse(trusted_list(ClassSummary, classes), headers={} if repaired else {"ETag": etag})
+
+@api_router.post("/teacher/roster/import")
+async def import_roster(request: Request, token_data: dict = Depends(verify_token)):
+    """Create student accounts (and their classes) from a CSV or JSON roster.
+
+    Progress is streamed as newline-delimited JSON events, ending with a
+    ``complete`` event that carries the summary and any generated passwords.
+    """
+    if token_data.get('user_type') != 'teacher':
+        raise HTTPException(status_code=403, detail="Teacher access required")
+
+    try:
+        rows = roster.parse_roster(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not rows:
+        raise HTTPException(status_code=400, detail="Roster is empty")
+    if len(rows) > roster.MAX_ROSTER_SIZE:
+        raise HTTPException(status_code=413, detail=f"Rosters are limited to {roster.MAX_ROSTER_SIZE} students per import")
+
+    async def events():
+        try:
+            async for event in provision_roster(token_data['sub'], rows):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Error importing roster: {str(e)}")
+            yield json.dumps({"stage": "failed", "error": "Roster import failed, students created so far were kept"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 @api_router.post("/student/join-class")
 async def join_class(request: JoinClassRequest, token_data: dict = Depends(verify_token)):
@@ -785,14 +1511,17 @@ async def join_class(request: JoinClassRequest, token_data: dict = Depends(verif
     if student_id not in classroom['students']:
         await db.classrooms.update_one(
             {"join_code": request.join_code},
-            {"$push": {"students": student_id}}
+            {"$addToSet": {"students": student_id}}
         )
         
         # Update student's joined classes
         await db.student_profiles.update_one(
             {"user_id": student_id},
-            {"$push": {"joined_classes": classroom['class_id']}}
+            {"$addToSet": {"joined_classes": classroom['class_id']}}
         )
+        forget_profile(student_id)
+        await add_membership(classroom, student_id)
+        await track_class_version(classroom, [student_id])
         
         # Create notification for successful class joining
         await create_notification(
@@ -804,21 +1533,71 @@ async def join_class(request: JoinClassRequest, token_data: dict = Depends(verif
     
     return {"message": "Successfully joined class", "class": ClassRoom(**classroom)}
 
+@api_router.post("/student/leave-class")
+async def leave_class(request: LeaveClassRequest, token_data: dict = Depends(verify_token)):
+    """Student leaves a class they joined"""
+    if token_data.get('user_type') != 'student':
+        raise HTTPException(status_code=403, detail="Student access required")
+    
+    student_id = token_data['sub']
+    classroom = await db.classrooms.find_one({"class_id": request.class_id, "students": student_id}, {"_id": 0, "class_id": 1, "teacher_id": 1})
+    if not classroom:
+        raise HTTPException(status_code=404, detail="Not a member of this class")
+    
+    await db.classrooms.update_one({"class_id": request.class_id}, {"$pull": {"students": student_id}})
+    await db.student_profiles.update_one({"user_id": student_id}, {"$pull": {"joined_classes": request.class_id}})
+    forget_profile(student_id)
+    await remove_membership(classroom, student_id)
+    
+    # The class drops out of the student's views and the roster changes for the teacher
+    await db.resource_versions.update_one(
+        {"_id": f"class:{request.class_id}"},
+        {"$inc": {"v": 1}, "$pull": {"students": student_id}}
+    )
+    await bump_user_versions(student_id)
+    
+    return {"message": "Successfully left class"}
+
 @api_router.get("/student/classes")
-async def get_student_classes(token_data: dict = Depends(verify_token)):
+async def get_student_classes(request: Request, token_data: dict = Depends(verify_token)):
     """Get all classes joined by student"""
     if token_data.get('user_type') != 'student':
         raise HTTPException(status_code=403, detail="Student access required")
     
+    etag = await compute_etag("student_classes", token_data['sub'], member_classes=True)
+    cached = not_modified(request, "student_classes", etag)
+    if cached:
+        return cached
+    
     student_profile = await db.student_profiles.find_one({"user_id": token_data['sub']})
     if not student_profile:
         return []
     
     class_ids = student_profile.get('joined_classes', [])
-    classes = await db.classrooms.find({"class_id": {"$in": class_ids}}).to_list(100)
-    return [ClassRoom(**cls) for cls in classes]
+    classes = await db.classrooms.find({"class_id": {"$in": class_ids}}, {"_id": 0}).to_list(100)
+    return FastJSONResponse(trusted_list(ClassRoom, classes), headers={"ETag": etag})
 
 # Chat Routes
+CHAT_HISTORY_DEFAULT_LIMIT = 100
+CHAT_PAGE_DEFAULT_LIMIT = 30
+CHAT_HISTORY_MAX_LIMIT = 1000
+CHAT_PREVIEW_LENGTH = 160
+
+# Compact list view: everything but the full bot response, which is only sent
+# when a message is expanded
+CHAT_LIST_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "session_id": 1,
+    "student_id": 1,
+    "subject": 1,
+    "user_message": 1,
+    "bot_type": 1,
+    "timestamp": 1,
+    "topic": 1,
+    "bot_response_preview": {"$substrCP": ["$bot_response", 0, CHAT_PREVIEW_LENGTH]}
+}
+
 @api_router.post("/chat/session")
 async def create_chat_session(session_data: Dict[str, Any], token_data: dict = Depends(verify_token)):
     """Create a new chat session"""
@@ -828,14 +1607,17 @@ async def create_chat_session(session_data: Dict[str, Any], token_data: dict = D
         subject=Subject(session_data['subject'])
     )
     await db.chat_sessions.insert_one(session.dict())
+    await bump_user_versions(token_data['sub'])
     return session
 
 @api_router.post("/chat/message")
-async def send_chat_message(message_data: Dict[str, Any], token_data: dict = Depends(verify_token)):
+async def send_chat_message(message_data: Dict[str, Any], response: Response, principal: Principal = Depends(get_principal),
+                            caller: llm_usage.Caller = Depends(get_llm_caller)):
     """Send a message and get AI response"""
+    token_data = principal.claims
     try:
         # Get student profile for context
-        student_profile = await db.student_profiles.find_one({"user_id": token_data['sub']})
+        student_profile = await principal.profile() if principal.user_type == 'student' else None
         
         # Get conversation history for context
         conversation_history = await db.chat_messages.find(
@@ -846,18 +1628,29 @@ async def send_chat_message(message_data: Dict[str, Any], token_data: dict = Dep
         user_message = message_data['user_message']
         
         # Route to appropriate subject bot
-        if subject in subject_bots:
-            bot_response = await subject_bots[subject].teach_subject(
-                user_message, message_data['session_id'], student_profile, conversation_history
-            )
-            bot_type = f"{subject.value}_bot"
-        else:
-            # Handle with central brain
-            central_response = await central_brain.analyze_and_route(
-                user_message, message_data['session_id'], student_profile
-            )
-            bot_response = central_response
-            bot_type = "central_brain"
+        try:
+            if subject in subject_bots:
+                bot_response = await subject_bots[subject].teach_subject(
+                    user_message, message_data['session_id'], student_profile, conversation_history, caller
+                )
+                bot_type = f"{subject.value}_bot"
+            else:
+                # Handle with central brain
+                central_response = await central_brain.analyze_and_route(
+                    user_message, message_data['session_id'], student_profile, caller
+                )
+                bot_response = central_response
+                bot_type = "central_brain"
+            if not conversation_history:
+                answer_cache.set(answer_key(subject, user_message), bot_response)
+        except LLMUnavailable as e:
+            bot_response = answer_cache.get(answer_key(subject, user_message))
+            if bot_response is None:
+                metrics.observe_degraded("/chat/message", "unavailable")
+                raise llm_unavailable(e)
+            metrics.observe_degraded("/chat/message", "cached_answer")
+            response.headers["X-Degraded"] = "cached-answer"
+            bot_type = f"{subject.value}_bot" if subject in subject_bots else "central_brain"
         
         # Create and save the message
         message_obj = ChatMessage(
@@ -870,6 +1663,10 @@ async def send_chat_message(message_data: Dict[str, Any], token_data: dict = Dep
         )
         
         await db.chat_messages.insert_one(message_obj.dict())
+        await student_stats.record_chat_message(db, token_data['sub'], subject.value, message_obj.timestamp)
+        await rollups.record_activity(
+            db, token_data['sub'], (student_profile or {}).get('joined_classes', []), message_obj.timestamp, subject.value, messages=1
+        )
         
         # Update session activity
         await db.chat_sessions.update_one(
@@ -884,90 +1681,286 @@ async def send_chat_message(message_data: Dict[str, Any], token_data: dict = Dep
         if student_profile:
             await award_xp(token_data['sub'], 5, "Asked a question to AI tutor")
         
+        await bump_student_versions(token_data['sub'])
+        
         return message_obj
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+def encode_chat_cursor(message: dict) -> str:
+    """Encode the (timestamp, id) keyset position of a message as an opaque cursor"""
+    raw = f"{message['timestamp'].isoformat()}|{message['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_chat_cursor(cursor: str):
+    """Decode a cursor produced by encode_chat_cursor back into (timestamp, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, message_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp), message_id
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_chat_page(query: dict, limit: int, before: Optional[str] = None, after: Optional[str] = None, projection: Optional[dict] = None):
+    """Fetch one keyset page of chat messages in chronological order.
+
+    Without a cursor (or with ``before``) the newest messages older than the
+    cursor are returned; with ``after`` the oldest messages newer than it.
+    Returns ``(messages, has_more)`` where ``has_more`` refers to the direction
+    that was paged in.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    
+    page_query = dict(query)
+    if after:
+        timestamp, message_id = decode_chat_cursor(after)
+        page_query["$or"] = [
+            {"timestamp": {"$gt": timestamp}},
+            {"timestamp": timestamp, "id": {"$gt": message_id}}
+        ]
+        direction = 1
+    else:
+        if before:
+            timestamp, message_id = decode_chat_cursor(before)
+            page_query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "id": {"$lt": message_id}}
+            ]
+        direction = -1
+    
+    # Fetch one extra row to know whether another page exists
+    messages = await db.chat_messages.find(page_query, projection or {"_id": 0}).sort(
+        [("timestamp", direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if direction == -1:
+        messages.reverse()
+    return messages, has_more
+
 @api_router.get("/chat/history")
-async def get_chat_history(subject: Optional[str] = None, token_data: dict = Depends(verify_token)):
-    """Get chat history for a student, optionally filtered by subject"""
+async def get_chat_history(
+    subject: Optional[str] = None,
+    session_id: Optional[str] = None,
+    limit: int = Query(CHAT_HISTORY_DEFAULT_LIMIT, ge=1, le=CHAT_HISTORY_MAX_LIMIT),
+    before: Optional[str] = None,
+    token_data: dict = Depends(verify_token)
+):
+    """Get the most recent chat history for a student, optionally filtered by subject or session"""
     query = {"student_id": token_data['sub']}
     if subject:
         query["subject"] = subject
-        
-    messages = await db.chat_messages.find(query).sort("timestamp", 1).to_list(1000)
-    return [ChatMessage(**message) for message in messages]
+    if session_id:
+        query["session_id"] = session_id
+    
+    messages, _ = await fetch_chat_page(query, limit, before=before)
+    return FastJSONResponse(trusted_list(ChatMessage, messages))
+
+@api_router.get("/chat/history/page")
+async def get_chat_history_page(
+    subject: Optional[str] = None,
+    session_id: Optional[str] = None,
+    limit: int = Query(CHAT_PAGE_DEFAULT_LIMIT, ge=1, le=CHAT_HISTORY_MAX_LIMIT),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    token_data: dict = Depends(verify_token)
+):
+    """Get a compact, keyset-paginated page of chat history.
+
+    Pass ``before`` to load older messages and ``after`` to load newer ones.
+    Bot responses are truncated to a preview; fetch ``/chat/messages/{id}``
+    to expand a message.
+    """
+    query = {"student_id": token_data['sub']}
+    if subject:
+        query["subject"] = subject
+    if session_id:
+        query["session_id"] = session_id
+    
+    messages, has_more = await fetch_chat_page(query, limit, before=before, after=after, projection=CHAT_LIST_PROJECTION)
+    
+    if after:
+        has_older, has_newer = True, has_more
+    else:
+        has_older, has_newer = has_more, bool(before)
+    
+    return FastJSONResponse({
+        "messages": messages,
+        "older_cursor": encode_chat_cursor(messages[0]) if messages and has_older else None,
+        "newer_cursor": encode_chat_cursor(messages[-1]) if messages and has_newer else None,
+        "has_older": has_older,
+        "has_newer": has_newer
+    })
+
+@api_router.get("/chat/messages/{message_id}")
+async def get_chat_message(message_id: str, token_data: dict = Depends(verify_token)):
+    """Get a single chat message with its full bot response"""
+    message = await db.chat_messages.find_one({"id": message_id, "student_id": token_data['sub']}, {"_id": 0})
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return FastJSONResponse(trusted(ChatMessage, message))
 
 # Practice Test Routes
 @api_router.post("/practice/generate")
-async def generate_practice_test(request: PracticeTestRequest, token_data: dict = Depends(verify_token)):
+async def generate_practice_test(request: PracticeTestRequest, token_data: dict = Depends(verify_token),
+                                 caller: llm_usage.Caller = Depends(get_llm_caller)):
     """Generate practice questions"""
     try:
-        questions = await practice_bot.generate_practice_questions(
-            request.subject, request.topics, request.difficulty, request.question_count
-        )
-        
-        # Store questions in database
-        question_ids = []
-        for question in questions:
-            await db.practice_questions.insert_one(question.dict())
-            question_ids.append(question.id)
-        
-        return {
+        try:
+            questions = await practice_bot.generate_practice_questions(
+                request.subject, request.topics, request.difficulty, request.question_count, caller
+            )
+        except LLMUnavailable as e:
+            stored = await question_bank_test(request.subject, request.topics, request.difficulty, request.question_count)
+            if not stored:
+                metrics.observe_degraded("/practice/generate", "unavailable")
+                raise llm_unavailable(e)
+            metrics.observe_degraded("/practice/generate", "question_bank")
+            return FastJSONResponse({
+                "test_id": str(uuid.uuid4()),
+                "questions": trusted_list(PracticeQuestion, stored),
+                "total_questions": len(stored)
+            }, headers={"X-Degraded": "question-bank"})
+        
+        # Store the new questions; near-duplicates of stored ones are served from the store instead
+        questions = await question_index.store_questions(db, [question.dict() for question in questions])
+        
+        return FastJSONResponse({
             "test_id": str(uuid.uuid4()),
-            "questions": questions,
+            "questions": trusted_list(PracticeQuestion, questions),
             "total_questions": len(questions)
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating practice test: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating practice test: {str(e)}")
 
+# Adaptive tests
+# Question pools are cached per worker for ADAPTIVE_POOL_TTL seconds, so
+# questions stored since then are picked up on the next rebuild.
+ADAPTIVE_POOL_TTL = 300
+adaptive_pools = TTLCache(maxsize=len(Subject), ttl=ADAPTIVE_POOL_TTL)
+
+async def adaptive_pool(subject: Subject) -> mastery.QuestionPool:
+    pool = adaptive_pools.get(subject.value)
+    if pool is None:
+        pool = await mastery.load_pool(db, question_bank_query(subject))
+        adaptive_pools.set(subject.value, pool)
+    return pool
+
+@api_router.post("/practice/adaptive")
+async def generate_adaptive_test(request: AdaptiveTestRequest, token_data: dict = Depends(verify_token)):
+    """Assemble a practice test from stored questions on the student's weakest topics"""
+    pool = await adaptive_pool(request.subject)
+    student_mastery = await mastery.get_mastery(db, token_data['sub'], request.subject.value)
+    picks = mastery.select_questions(pool, student_mastery, request.question_count)
+    if len(picks) < request.question_count:
+        raise HTTPException(status_code=404, detail=f"Not enough stored {request.subject.value} questions for an adaptive test yet")
+    
+    ids = [pool.ids[i] for i in picks]
+    # The pool may predate a question being assigned to a class
+    stored = await db.practice_questions.find(
+        {"id": {"$in": ids}, "assigned": {"$exists": False}}, {"_id": 0, "fingerprint": 0}
+    ).to_list(None)
+    by_id = {question['id']: question for question in stored}
+    questions = [by_id[question_id] for question_id in ids if question_id in by_id]
+    return FastJSONResponse({
+        "test_id": str(uuid.uuid4()),
+        "questions": trusted_list(PracticeQuestion, questions),
+        "total_questions": len(questions),
+        "focus_topics": mastery.weakest_topics(student_mastery)
+    })
+
+@api_router.get("/practice/mastery/{subject}")
+async def get_topic_mastery(subject: Subject, token_data: dict = Depends(verify_token)):
+    """The student's mastery of each topic they have answered questions on, weakest first"""
+    student_mastery = await mastery.get_mastery(db, token_data['sub'], subject.value)
+    return {"subject": subject.value, "topics": mastery.weakest_topics(student_mastery, limit=len(student_mastery.topics))}
+
+async def grade_practice_attempt(student_id: str, test_id: str, question_ids: List[str], student_answers: Dict[str, str],
+                                 time_taken: int, loaders: Loaders, assignment_id: Optional[str] = None):
+    """Grade a completed practice test; returns the attempt (not stored yet), its answered questions and the number correct.
+
+    Assignment questions are only graded for their assignment, whose answers stay hidden until the student submits it.
+    """
+    # Calculate score
+    total_questions = len(question_ids)
+    
+    answers = list(student_answers.items())
+    questions, listed = await asyncio.gather(
+        asyncio.gather(*(loaders.questions.load(question_id) for question_id, _ in answers)),
+        loaders.questions.load_many(question_ids)
+    )
+    if assignment_id is None and any(question and question.get('assigned') for question in [*questions, *listed]):
+        raise HTTPException(status_code=403, detail="Assignment questions can only be submitted through their assignment")
+    correct_answers, attempt_subject = grade_answers(questions, [answer for _, answer in answers])
+    
+    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+    
+    # Create attempt record
+    attempt = PracticeAttempt(
+        student_id=student_id,
+        test_id=test_id,
+        questions=question_ids,
+        student_answers=student_answers,
+        score=score,
+        time_taken=time_taken,
+        subject=attempt_subject,
+        assignment_id=assignment_id
+    )
+    return attempt, questions, correct_answers
+
+async def record_practice_attempt(attempt: PracticeAttempt, questions: List[Optional[dict]]) -> int:
+    """Store a graded attempt and count it towards the student's stats, mastery and XP; returns the XP earned"""
+    student_id = attempt.student_id
+    subject = getattr(attempt.subject, 'value', attempt.subject)
+    await db.practice_attempts.insert_one(attempt.dict())
+    await student_stats.record_practice_attempt(
+        db, student_id, subject, attempt.score, attempt.time_taken, attempt.completed_at
+    )
+    await mastery.record_answers(db, student_id, questions, list(attempt.student_answers.values()))
+    await rollups.record_activity(db, student_id, None, attempt.completed_at, subject, tests=1)
+    
+    # Award XP based on score
+    xp_earned = int(attempt.score / 10) * 5  # 5 XP per 10% score
+    await award_xp(student_id, xp_earned, f"Completed practice test with {attempt.score:.1f}% score")
+    await bump_student_versions(student_id)
+    return xp_earned
+
 @api_router.post("/practice/submit")
-async def submit_practice_test(test_data: Dict[str, Any], token_data: dict = Depends(verify_token)):
+async def submit_practice_test(test_data: Dict[str, Any], token_data: dict = Depends(verify_token),
+                               loaders: Loaders = Depends(get_loaders)):
     """Submit practice test answers"""
     try:
-        # Calculate score
-        total_questions = len(test_data['questions'])
-        correct_answers = 0
-        
-        for question_id, student_answer in test_data['student_answers'].items():
-            question = await db.practice_questions.find_one({"id": question_id})
-            if question and question['correct_answer'].lower() == student_answer.lower():
-                correct_answers += 1
-        
-        score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-        
-        # Create attempt record
-        attempt = PracticeAttempt(
-            student_id=token_data['sub'],
-            test_id=test_data['test_id'],
-            questions=test_data['questions'],
-            student_answers=test_data['student_answers'],
-            score=score,
-            time_taken=test_data.get('time_taken', 0)
+        attempt, questions, correct_answers = await grade_practice_attempt(
+            token_data['sub'], test_data['test_id'], test_data['questions'], test_data['student_answers'],
+            test_data.get('time_taken', 0), loaders
         )
-        
-        await db.practice_attempts.insert_one(attempt.dict())
-        
-        # Award XP based on score
-        xp_earned = int(score / 10) * 5  # 5 XP per 10% score
-        await award_xp(token_data['sub'], xp_earned, f"Completed practice test with {score:.1f}% score")
+        xp_earned = await record_practice_attempt(attempt, questions)
         
         return {
-            "score": score,
+            "score": attempt.score,
             "correct_answers": correct_answers,
-            "total_questions": total_questions,
+            "total_questions": len(attempt.questions),
             "xp_earned": xp_earned
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error submitting practice test: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error submitting practice test: {str(e)}")
 
 @api_router.get("/practice/results")
-async def get_practice_results(subject: Optional[str] = None, token_data: dict = Depends(verify_token)):
+async def get_practice_results(subject: Optional[str] = None, token_data: dict = Depends(verify_token),
+                               loaders: Loaders = Depends(get_loaders)):
     """Get practice test results for a student, optionally filtered by subject"""
     try:
         # Build query
@@ -976,58 +1969,81 @@ async def get_practice_results(subject: Optional[str] = None, token_data: dict =
         # Get all practice attempts
         attempts = await db.practice_attempts.find(query).sort("completed_at", -1).to_list(100)
         
-        # For each attempt, get the questions to determine subject and build detailed results
-        results = []
-        for attempt in attempts:
-            if attempt.get('questions'):
-                # Get all questions for this attempt
-                question_ids = attempt['questions']
-                questions = await db.practice_questions.find({"id": {"$in": question_ids}}).to_list(len(question_ids))
-                
-                if questions:
-                    attempt_subject = questions[0].get('subject')
-                    
-                    # Filter by subject if specified
-                    if subject is None or attempt_subject == subject:
-                        # Build detailed question results
-                        question_results = []
-                        for question in questions:
-                            student_answer = attempt['student_answers'].get(question['id'], '')
-                            is_correct = question['correct_answer'].lower().strip() == student_answer.lower().strip()
-                            
-                            question_result = {
-                                "question_id": question['id'],
-                                "question_text": question['question_text'],
-                                "question_type": question['question_type'],
-                                "options": question.get('options', []),
-                                "student_answer": student_answer,
-                                "correct_answer": question['correct_answer'],
-                                "is_correct": is_correct,
-                                "explanation": question.get('explanation', ''),
-                                "topics": question.get('topics', [])
-                            }
-                            question_results.append(question_result)
-                        
-                        result = {
-                            "id": attempt['id'],
-                            "subject": attempt_subject,
-                            "score": attempt['score'],
-                            "total_questions": len(attempt['questions']),
-                            "time_taken": attempt['time_taken'],
-                            "completed_at": attempt['completed_at'],
-                            "difficulty": questions[0].get('difficulty', 'medium'),
-                            "question_results": question_results,
-                            "correct_count": sum(1 for qr in question_results if qr['is_correct']),
-                            "incorrect_count": sum(1 for qr in question_results if not qr['is_correct'])
-                        }
-                        results.append(result)
+        # Load the questions of every attempt in one batch (shared questions are fetched once)
+        questions_by_attempt = await asyncio.gather(*(
+            loaders.questions.load_many(attempt.get('questions') or []) for attempt in attempts
+        ))
+        hidden = await hidden_assignment_questions(token_data['sub'], [
+            question for questions in questions_by_attempt for question in questions
+        ])
         
-        return results
+        return build_practice_results(attempts, questions_by_attempt, subject, hidden)
         
     except Exception as e:
         logger.error(f"Error fetching practice results: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching practice results: {str(e)}")
 
+def grade_answers(questions: List[Optional[dict]], student_answers: List[str]):
+    """Count the correct answers to a test; returns (correct, subject of the first known question)"""
+    correct = 0
+    subject = None
+    for question, student_answer in zip(questions, student_answers):
+        if question and subject is None:
+            subject = question.get('subject')
+        if question and question['correct_answer'].lower() == student_answer.lower():
+            correct += 1
+    return correct, subject
+
+def question_result(question: dict, student_answer: str, hidden: bool = False) -> dict:
+    """One question of a practice attempt as shown in the results; hidden leaves out the answer and explanation"""
+    return {
+        "question_id": question['id'],
+        "question_text": question['question_text'],
+        "question_type": question['question_type'],
+        "options": question.get('options', []),
+        "student_answer": student_answer,
+        "correct_answer": None if hidden else question['correct_answer'],
+        "is_correct": question['correct_answer'].lower().strip() == student_answer.lower().strip(),
+        "explanation": None if hidden else question.get('explanation', ''),
+        "topics": question.get('topics', [])
+    }
+
+def build_practice_results(attempts: List[dict], questions_by_attempt: List[List[dict]], subject: Optional[str] = None,
+                           hidden: Optional[set] = None) -> List[dict]:
+    """Detailed results of practice attempts, taking each attempt's subject from its questions.
+
+    Questions in hidden are shown without their answer and explanation.
+    """
+    hidden = hidden or set()
+    results = []
+    for attempt, questions in zip(attempts, questions_by_attempt):
+        if not attempt.get('questions') or not questions:
+            continue
+        attempt_subject = questions[0].get('subject')
+        
+        # Filter by subject if specified
+        if subject is not None and attempt_subject != subject:
+            continue
+        
+        question_results = [
+            question_result(question, attempt['student_answers'].get(question['id'], ''), question['id'] in hidden)
+            for question in questions
+        ]
+        correct_count = sum(1 for qr in question_results if qr['is_correct'])
+        results.append({
+            "id": attempt['id'],
+            "subject": attempt_subject,
+            "score": attempt['score'],
+            "total_questions": len(attempt['questions']),
+            "time_taken": attempt['time_taken'],
+            "completed_at": attempt['completed_at'],
+            "difficulty": questions[0].get('difficulty', 'medium'),
+            "question_results": question_results,
+            "correct_count": correct_count,
+            "incorrect_count": len(question_results) - correct_count
+        })
+    return results
+
 async def check_answer_correct(question_id: str, student_answer: str) -> bool:
     """Helper function to check if a student answer is correct"""
     question = await db.practice_questions.find_one({"id": question_id})
@@ -1036,7 +2052,8 @@ async def check_answer_correct(question_id: str, student_answer: str) -> bool:
     return question['correct_answer'].lower().strip() == student_answer.lower().strip()
 
 @api_router.get("/practice/results/{result_id}/details")
-async def get_practice_result_details(result_id: str, token_data: dict = Depends(verify_token)):
+async def get_practice_result_details(result_id: str, token_data: dict = Depends(verify_token),
+                                      loaders: Loaders = Depends(get_loaders)):
     """Get detailed breakdown of a specific practice test result"""
     try:
         # Get the practice attempt
@@ -1045,14 +2062,15 @@ async def get_practice_result_details(result_id: str, token_data: dict = Depends
             raise HTTPException(status_code=404, detail="Practice test result not found")
         
         # Get all questions for this attempt
-        question_ids = attempt['questions']
-        questions = await db.practice_questions.find({"id": {"$in": question_ids}}).to_list(len(question_ids))
+        questions = await loaders.questions.load_many(attempt['questions'])
+        hidden = await hidden_assignment_questions(token_data['sub'], questions)
         
         # Build detailed question breakdown
         question_details = []
         for question in questions:
             student_answer = attempt['student_answers'].get(question['id'], '')
             is_correct = question['correct_answer'].lower().strip() == student_answer.lower().strip()
+            reveal = question['id'] not in hidden
             
             question_detail = {
                 "question_id": question['id'],
@@ -1060,9 +2078,9 @@ async def get_practice_result_details(result_id: str, token_data: dict = Depends
                 "question_type": question['question_type'],
                 "options": question.get('options', []),
                 "student_answer": student_answer,
-                "correct_answer": question['correct_answer'],
+                "correct_answer": question['correct_answer'] if reveal else None,
                 "is_correct": is_correct,
-                "explanation": question.get('explanation', ''),
+                "explanation": question.get('explanation', '') if reveal else None,
                 "topics": question.get('topics', []),
                 "difficulty": question.get('difficulty', 'medium')
             }
@@ -1089,11 +2107,12 @@ async def get_practice_result_details(result_id: str, token_data: dict = Depends
         raise HTTPException(status_code=500, detail=f"Error fetching result details: {str(e)}")
 
 @api_router.get("/practice/stats/{subject}")
-async def get_subject_practice_stats(subject: str, token_data: dict = Depends(verify_token)):
+async def get_subject_practice_stats(subject: str, token_data: dict = Depends(verify_token),
+                                     loaders: Loaders = Depends(get_loaders)):
     """Get detailed practice test statistics for a specific subject"""
     try:
         # Get all practice attempts for this subject
-        results = await get_practice_results(subject, token_data)
+        results = await get_practice_results(subject, token_data, loaders)
         
         if not results:
             return {
@@ -1127,6 +2146,347 @@ async def get_subject_practice_stats(subject: str, token_data: dict = Depends(ve
         logger.error(f"Error fetching subject stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching subject stats: {str(e)}")
 
+# Class Assignments
+# A teacher assigns a practice test to a class once: its questions are drawn
+# from the question bank or generated in one call and stored, and every
+# student of the class gets the same test. Assignments don't change once
+# created, so each worker caches the encoded test for ASSIGNMENT_CACHE_TTL
+# seconds; it holds no answers or explanations, which students see in their
+# results once they have submitted. Assignment questions are marked assigned:
+# question-bank draws skip them, and /practice/submit rejects them. assignment_submissions holds one document
+# per (assignment, student). The first submission is the graded one: its
+# score, time and lateness are kept and it counts towards the student's stats
+# and XP. Later attempts are practice and only update the latest and best
+# scores and the attempt count.
+ASSIGNMENT_CACHE_TTL = 3600
+assignment_cache = TTLCache(maxsize=1024, ttl=ASSIGNMENT_CACHE_TTL)
+
+ASSIGNMENT_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "class_id": 1,
+    "subject": 1,
+    "title": 1,
+    "topics": 1,
+    "difficulty": 1,
+    "source": 1,
+    "due_date": 1,
+    "created_at": 1,
+    "question_count": {"$size": "$question_ids"}
+}
+
+def utc_naive(moment: Optional[datetime]) -> Optional[datetime]:
+    """A datetime in naive UTC, as the rest of the stored timestamps are"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def submission_status(submission: Optional[dict], due_date: Optional[datetime], now: datetime) -> str:
+    """submitted, late, missing (past due without a submission) or pending"""
+    if submission:
+        return "late" if submission.get('late') else "submitted"
+    if due_date and now > due_date:
+        return "missing"
+    return "pending"
+
+async def assignment_question_set(request: AssignmentCreate, subject: Subject, caller: llm_usage.Caller):
+    """The questions of a new assignment and where they came from ("question_bank" or "generated")"""
+    if request.use_stored_questions:
+        stored = await question_bank_test(subject, request.topics, request.difficulty, request.question_count)
+        if stored:
+            return stored, "question_bank"
+    try:
+        questions = await practice_bot.generate_practice_questions(
+            subject, request.topics, request.difficulty, request.question_count, caller
+        )
+    except LLMUnavailable as e:
+        stored = [] if request.use_stored_questions else await question_bank_test(
+            subject, request.topics, request.difficulty, request.question_count
+        )
+        if not stored:
+            metrics.observe_degraded("/teacher/assignments", "unavailable")
+            raise llm_unavailable(e)
+        metrics.observe_degraded("/teacher/assignments", "question_bank")
+        return stored, "question_bank"
+    return await question_index.store_questions(db, [{**question.dict(), "assigned": True} for question in questions]), "generated"
+
+async def cached_assignment(assignment_id: str) -> Optional[dict]:
+    """An assignment and its encoded test, from this worker's cache while fresh"""
+    cached = assignment_cache.get(assignment_id)
+    if cached is None:
+        assignment = await db.assignments.find_one({"id": assignment_id}, {"_id": 0})
+        if not assignment:
+            return None
+        stored = await db.practice_questions.find(
+            {"id": {"$in": assignment['question_ids']}}, {"_id": 0, "correct_answer": 0, "explanation": 0, "fingerprint": 0}
+        ).to_list(None)
+        by_id = {question['id']: question for question in stored}
+        questions = [by_id[question_id] for question_id in assignment['question_ids'] if question_id in by_id]
+        body = FastJSONResponse({
+            "assignment_id": assignment['id'],
+            "test_id": assignment['id'],
+            "title": assignment['title'],
+            "subject": assignment['subject'],
+            "due_date": assignment.get('due_date'),
+            "questions": trusted_list(AssignedQuestion, questions),
+            "total_questions": len(questions)
+        }).body
+        cached = {"assignment": assignment, "body": body}
+        assignment_cache.set(assignment_id, cached)
+    return cached
+
+async def hidden_assignment_questions(student_id: str, questions: List[dict]) -> set:
+    """Ids of the assignment questions among questions whose assignments the student hasn't submitted yet"""
+    assigned = {question['id'] for question in questions if question.get('assigned')}
+    if not assigned:
+        return set()
+    submitted = await db.assignment_submissions.distinct("assignment_id", {"student_id": student_id})
+    revealed = await db.assignments.distinct("question_ids", {"id": {"$in": submitted}, "question_ids": {"$in": list(assigned)}})
+    return assigned - set(revealed)
+
+async def student_in_class(student_id: str, class_id: str) -> bool:
+    if await db.class_memberships.find_one({"class_id": class_id, "student_id": student_id}, {"_id": 1}):
+        return True
+    # Rosters that predate class_memberships
+    return await db.classrooms.find_one({"class_id": class_id, "students": student_id}, {"_id": 1}) is not None
+
+async def student_assignment(assignment_id: str, student_id: str) -> dict:
+    """The cached assignment, if the student belongs to its class"""
+    cached = await cached_assignment(assignment_id)
+    if not cached or not await student_in_class(student_id, cached['assignment']['class_id']):
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    return cached
+
+@api_router.post("/teacher/assignments")
+async def create_assignment(request: AssignmentCreate, token_data: dict = Depends(verify_token),
+                            caller: llm_usage.Caller = Depends(get_llm_caller), loaders: Loaders = Depends(get_loaders)):
+    """Assign a practice test to a class, generating its questions once for every student"""
+    if token_data.get('user_type') != 'teacher':
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    
+    classroom = await loaders.classrooms.load(request.class_id)
+    if not classroom or classroom['teacher_id'] != token_data['sub']:
+        raise HTTPException(status_code=404, detail="Class not found or access denied")
+    
+    try:
+        subject = Subject(classroom['subject'])
+        questions, source = await assignment_question_set(request, subject, caller)
+        
+        assignment = Assignment(
+            class_id=request.class_id,
+            teacher_id=token_data['sub'],
+            subject=subject,
+            title=request.title,
+            topics=request.topics,
+            difficulty=request.difficulty,
+            question_ids=[question['id'] for question in questions],
+            source=source,
+            due_date=utc_naive(request.due_date)
+        )
+        await db.assignments.insert_one(assignment.dict())
+        # Stored near-duplicates and question-bank draws leave the bank too
+        await db.practice_questions.update_many(
+            {"id": {"$in": assignment.question_ids}, "assigned": {"$exists": False}}, {"$set": {"assigned": True}}
+        )
+        
+        # Tell the class
+        student_ids = classroom.get('students', [])
+        if student_ids:
+            due = f" It is due {assignment.due_date.strftime('%d %b %Y, %H:%M')} UTC." if assignment.due_date else ""
+            await db.notifications.insert_many([
+                Notification(
+                    recipient_id=student_id,
+                    sender_id=token_data['sub'],
+                    title=f"New assignment: {assignment.title}",
+                    message=f"Your {classroom['class_name']} teacher assigned a {len(questions)}-question {subject.value} test.{due}",
+                    type="teacher_message"
+                ).dict()
+                for student_id in student_ids
+            ])
+            await bump_user_versions(*student_ids)
+        
+        return FastJSONResponse({**assignment.dict(), "question_count": len(questions)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating assignment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error creating assignment: {str(e)}")
+
+@api_router.get("/teacher/classes/{class_id}/assignments")
+async def get_class_assignments(class_id: str, token_data: dict = Depends(verify_token),
+                                loaders: Loaders = Depends(get_loaders)):
+    """A class's assignments, newest first, with how many students have submitted each"""
+    if token_data.get('user_type') != 'teacher':
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    
+    classroom = await loaders.classrooms.load(class_id)
+    if not classroom or classroom['teacher_id'] != token_data['sub']:
+        raise HTTPException(status_code=404, detail="Class not found or access denied")
+    
+    assignments = await db.assignments.find({"class_id": class_id}, ASSIGNMENT_SUMMARY_PROJECTION).sort("created_at", -1).to_list(100)
+    counts = await db.assignment_submissions.aggregate([
+        {"$match": {"assignment_id": {"$in": [assignment['id'] for assignment in assignments]}}},
+        {"$group": {
+            "_id": "$assignment_id",
+            "submitted": {"$sum": 1},
+            "late": {"$sum": {"$cond": ["$late", 1, 0]}},
+            "average_score": {"$avg": "$score"}
+        }}
+    ]).to_list(None)
+    counts = {row.pop('_id'): row for row in counts}
+    
+    roster_size = len(classroom.get('students', []))
+    for assignment in assignments:
+        row = counts.get(assignment['id'], {})
+        assignment.update(
+            roster_size=roster_size,
+            submitted=row.get('submitted', 0),
+            late=row.get('late', 0),
+            average_score=round(row['average_score'], 1) if row.get('average_score') is not None else None
+        )
+    return FastJSONResponse(assignments)
+
+@api_router.get("/teacher/assignments/{assignment_id}")
+async def get_assignment_progress(assignment_id: str, token_data: dict = Depends(verify_token),
+                                  loaders: Loaders = Depends(get_loaders)):
+    """Each student's submission status for an assignment"""
+    if token_data.get('user_type') != 'teacher':
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    
+    assignment = await db.assignments.find_one({"id": assignment_id, "teacher_id": token_data['sub']}, ASSIGNMENT_SUMMARY_PROJECTION)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    
+    classroom = await loaders.classrooms.load(assignment['class_id'])
+    student_ids = classroom.get('students', []) if classroom else []
+    profiles, submissions = await asyncio.gather(
+        loaders.collection("student_profiles", "user_id", STUDENT_SUMMARY_PROJECTION).load_many(student_ids),
+        db.assignment_submissions.find({"assignment_id": assignment_id}, {"_id": 0}).to_list(None)
+    )
+    names = {profile['user_id']: profile['name'] for profile in profiles}
+    submissions = {submission['student_id']: submission for submission in submissions}
+    
+    now = datetime.utcnow()
+    students = []
+    for student_id in student_ids:
+        submission = submissions.get(student_id)
+        students.append({
+            "student_id": student_id,
+            "name": names.get(student_id, ""),
+            "status": submission_status(submission, assignment.get('due_date'), now),
+            "score": submission['score'] if submission else None,
+            "best_score": submission['best_score'] if submission else None,
+            "attempts": submission['attempts'] if submission else 0,
+            "submitted_at": submission['first_submitted_at'] if submission else None
+        })
+    return FastJSONResponse({"assignment": assignment, "students": students})
+
+@api_router.get("/student/assignments")
+async def get_student_assignments(token_data: dict = Depends(verify_token)):
+    """Assignments of the student's classes by due date, with the student's status on each"""
+    student_id = token_data['sub']
+    members, rostered = await asyncio.gather(
+        db.class_memberships.distinct("class_id", {"student_id": student_id}),
+        # Rosters that predate class_memberships
+        db.classrooms.distinct("class_id", {"students": student_id})
+    )
+    class_ids = list(dict.fromkeys(members + rostered))
+    assignments = await db.assignments.find(
+        {"class_id": {"$in": class_ids}}, ASSIGNMENT_SUMMARY_PROJECTION
+    ).sort([("due_date", 1), ("created_at", -1)]).to_list(200)
+    submissions = await db.assignment_submissions.find(
+        {"student_id": student_id, "assignment_id": {"$in": [assignment['id'] for assignment in assignments]}}, {"_id": 0}
+    ).to_list(None)
+    submissions = {submission['assignment_id']: submission for submission in submissions}
+    
+    now = datetime.utcnow()
+    for assignment in assignments:
+        submission = submissions.get(assignment['id'])
+        assignment.update(
+            status=submission_status(submission, assignment.get('due_date'), now),
+            score=submission['score'] if submission else None,
+            best_score=submission['best_score'] if submission else None,
+            attempts=submission['attempts'] if submission else 0
+        )
+    return FastJSONResponse(assignments)
+
+@api_router.get("/student/assignments/{assignment_id}")
+async def get_assignment_test(assignment_id: str, token_data: dict = Depends(verify_token)):
+    """The assignment's test, the same for every student of the class"""
+    cached = await student_assignment(assignment_id, token_data['sub'])
+    return Response(content=cached['body'], media_type="application/json")
+
+async def record_assignment_submission(assignment: dict, attempt: PracticeAttempt, late: bool) -> dict:
+    """Fold an attempt into the student's submission document and return it.
+
+    The first attempt's score, time and lateness are set on insert and never
+    overwritten; every attempt updates the latest and best score.
+    """
+    selector = {"assignment_id": assignment['id'], "student_id": attempt.student_id}
+    update = {
+        "$setOnInsert": {
+            "class_id": assignment['class_id'],
+            "attempt_id": attempt.id,
+            "score": attempt.score,
+            "time_taken": attempt.time_taken,
+            "first_submitted_at": attempt.completed_at,
+            "late": late
+        },
+        "$set": {"latest_score": attempt.score, "last_submitted_at": attempt.completed_at},
+        "$max": {"best_score": attempt.score},
+        "$inc": {"attempts": 1}
+    }
+    try:
+        return await db.assignment_submissions.find_one_and_update(
+            selector, update, projection={"_id": 0}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent first submission inserted the document; this one updates it
+        return await db.assignment_submissions.find_one_and_update(
+            selector, update, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+@api_router.post("/student/assignments/{assignment_id}/submit")
+async def submit_assignment(assignment_id: str, submission: AssignmentSubmission, token_data: dict = Depends(verify_token),
+                            loaders: Loaders = Depends(get_loaders)):
+    """Grade a student's answers to an assignment and record the submission"""
+    student_id = token_data['sub']
+    assignment = (await student_assignment(assignment_id, student_id))['assignment']
+    try:
+        # Only answers to the assignment's own questions count
+        question_ids = assignment['question_ids']
+        assigned = set(question_ids)
+        answers = {question_id: answer for question_id, answer in submission.student_answers.items() if question_id in assigned}
+        attempt, questions, correct_answers = await grade_practice_attempt(
+            student_id, assignment_id, question_ids, answers, submission.time_taken, loaders, assignment_id=assignment_id
+        )
+        
+        due_date = assignment.get('due_date')
+        recorded = await record_assignment_submission(assignment, attempt, bool(due_date and attempt.completed_at > due_date))
+        graded = recorded['attempt_id'] == attempt.id
+        # Only the graded attempt is stored and counts towards stats and XP
+        xp_earned = await record_practice_attempt(attempt, questions) if graded else 0
+        
+        # Answers and explanations are shown once the student has submitted
+        assigned_questions = await loaders.questions.load_many(question_ids)
+        return FastJSONResponse({
+            "assignment_id": assignment_id,
+            "score": attempt.score,
+            "correct_answers": correct_answers,
+            "total_questions": len(question_ids),
+            "xp_earned": xp_earned,
+            "graded": graded,
+            "graded_score": recorded['score'],
+            "late": recorded['late'],
+            "attempts": recorded['attempts'],
+            "question_results": [
+                question_result(question, answers.get(question['id'], '')) for question in assigned_questions
+            ]
+        })
+    except Exception as e:
+        logger.error(f"Error submitting assignment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error submitting assignment: {str(e)}")
+
 # Mindfulness Routes
 @api_router.post("/mindfulness/session")
 async def start_mindfulness_session(session_data: Dict[str, Any], token_data: dict = Depends(verify_token)):
@@ -1139,24 +2499,29 @@ async def start_mindfulness_session(session_data: Dict[str, Any], token_data: di
         mood_after=session_data.get('mood_after')
     )
     await db.mindfulness_activities.insert_one(session.dict())
+    await student_stats.record_mindfulness_session(
+        db, token_data['sub'], session.duration, session.mood_before, session.mood_after, session.completed_at
+    )
+    await rollups.record_activity(db, token_data['sub'], None, session.completed_at, minutes=session.duration)
     
     # Award XP for mindfulness activity
     await award_xp(token_data['sub'], 10, f"Completed {session_data['activity_type']} mindfulness session")
+    await bump_student_versions(token_data['sub'])
     
     return session
 
 @api_router.get("/mindfulness/activities")
 async def get_mindfulness_history(token_data: dict = Depends(verify_token)):
     """Get mindfulness activity history"""
-    activities = await db.mindfulness_activities.find({"student_id": token_data['sub']}).sort("completed_at", -1).to_list(50)
-    return [MindfulnessActivity(**activity) for activity in activities]
+    activities = await db.mindfulness_activities.find({"student_id": token_data['sub']}, {"_id": 0}).sort("completed_at", -1).to_list(50)
+    return FastJSONResponse(trusted_list(MindfulnessActivity, activities))
 
 # Notification Routes
 @api_router.get("/notifications")
 async def get_notifications(token_data: dict = Depends(verify_token)):
     """Get user notifications"""
-    notifications = await db.notifications.find({"recipient_id": token_data['sub']}).sort("created_at", -1).to_list(50)
-    return [Notification(**notification) for notification in notifications]
+    notifications = await db.notifications.find({"recipient_id": token_data['sub']}, {"_id": 0}).sort("created_at", -1).to_list(50)
+    return FastJSONResponse(trusted_list(Notification, notifications))
 
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, token_data: dict = Depends(verify_token)):
@@ -1165,6 +2530,7 @@ async def mark_notification_read(notification_id: str, token_data: dict = Depend
         {"id": notification_id, "recipient_id": token_data['sub']},
         {"$set": {"is_read": True}}
     )
+    await bump_user_versions(token_data['sub'])
     return {"message": "Notification marked as read"}
 
 # Calendar Routes
@@ -1182,22 +2548,38 @@ async def create_calendar_event(event_data: Dict[str, Any], token_data: dict = D
     )
     
     await db.calendar_events.insert_one(event.dict())
+    await bump_user_versions(token_data['sub'])
     return event
 
 @api_router.get("/calendar/events")
-async def get_calendar_events(token_data: dict = Depends(verify_token)):
+async def get_calendar_events(request: Request, token_data: dict = Depends(verify_token)):
     """Get user's calendar events"""
-    events = await db.calendar_events.find({"student_id": token_data['sub']}).sort("start_time", 1).to_list(100)
-    return [CalendarEvent(**event) for event in events]
+    etag = await compute_etag("calendar", token_data['sub'])
+    cached = not_modified(request, "calendar", etag)
+    if cached:
+        return cached
+    
+    events = await db.calendar_events.find({"student_id": token_data['sub']}, {"_id": 0}).sort("start_time", 1).to_list(100)
+    return FastJSONResponse(trusted_list(CalendarEvent, events), headers={"ETag": etag})
 
 # Dashboard Routes
 @api_router.get("/dashboard")
-async def get_student_dashboard(token_data: dict = Depends(verify_token)):
+async def get_student_dashboard(request: Request, token_data: dict = Depends(verify_token),
+                                loaders: Loaders = Depends(get_loaders)):
     """Get comprehensive dashboard data for a student"""
     if token_data.get('user_type') != 'student':
         raise HTTPException(status_code=403, detail="Student access required")
     
-    profile = await db.student_profiles.find_one({"user_id": token_data['sub']})
+    # Today's events depend on the (UTC) date as well as on the student's writes
+    etag = await compute_etag("dashboard", token_data['sub'], extra=datetime.utcnow().date().isoformat())
+    cached = not_modified(request, "dashboard", etag)
+    if cached:
+        return cached
+    
+    profile, stats = await asyncio.gather(
+        loaders.student_profiles.load(token_data['sub']),
+        loaders.student_stats.load(token_data['sub'])
+    )
     if not profile:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -1206,11 +2588,11 @@ async def get_student_dashboard(token_data: dict = Depends(verify_token)):
     recent_sessions = await db.chat_sessions.find({"student_id": token_data['sub']}).sort("last_active", -1).limit(5).to_list(5)
     
     # Calculate study stats
-    total_messages = await db.chat_messages.count_documents({"student_id": token_data['sub']})
-    subjects_studied = await db.chat_messages.distinct("subject", {"student_id": token_data['sub']})
+    total_messages = stats.get('total_messages', 0)
+    subjects_studied = [subject for subject, count in stats.get('messages_by_subject', {}).items() if count > 0]
     
     # Get today's events
-    today = datetime.now().date()
+    today = datetime.utcnow().date()
     today_events = await db.calendar_events.find({
         "student_id": token_data['sub'],
         "start_time": {
@@ -1222,8 +2604,8 @@ async def get_student_dashboard(token_data: dict = Depends(verify_token)):
     # Get notifications
     notifications = await db.notifications.find({"recipient_id": token_data['sub'], "is_read": False}).to_list(10)
     
-    return {
-        "profile": StudentProfile(**profile),
+    return FastJSONResponse({
+        "profile": trusted(StudentProfile, profile),
         "stats": {
             "total_messages": total_messages,
             "subjects_studied": len(subjects_studied),
@@ -1232,229 +2614,209 @@ async def get_student_dashboard(token_data: dict = Depends(verify_token)):
             "level": profile.get("level", 1)
         },
         "recent_activity": {
-            "messages": [ChatMessage(**msg) for msg in recent_messages],
-            "sessions": [ChatSession(**session) for session in recent_sessions]
+            "messages": trusted_list(ChatMessage, recent_messages),
+            "sessions": trusted_list(ChatSession, recent_sessions)
         },
-        "today_events": [CalendarEvent(**event) for event in today_events],
-        "notifications": [Notification(**notification) for notification in notifications],
+        "today_events": trusted_list(CalendarEvent, today_events),
+        "notifications": trusted_list(Notification, notifications),
         "subjects_progress": subjects_studied
-    }
+    }, headers={"ETag": etag})
 
 @api_router.get("/teacher/dashboard")
-async def get_teacher_dashboard(token_data: dict = Depends(verify_token)):
+async def get_teacher_dashboard(request: Request, token_data: dict = Depends(verify_token)):
     """Get comprehensive dashboard data for a teacher"""
     if token_data.get('user_type') != 'teacher':
         raise HTTPException(status_code=403, detail="Teacher access required")
     
+    etag = await compute_etag("teacher_dashboard", token_data['sub'], teacher_id=token_data['sub'])
+    cached = not_modified(request, "teacher_dashboard", etag)
+    if cached:
+        return cached
+    
     profile = await db.teacher_profiles.find_one({"user_id": token_data['sub']})
     if not profile:
         raise HTTPException(status_code=404, detail="Teacher not found")
     
     # Get teacher's classes
-    classes = await db.classrooms.find({"teacher_id": token_data['sub']}).to_list(100)
+    classes = await db.classrooms.find({"teacher_id": token_data['sub']}, CLASS_SUMMARY_PROJECTION).to_list(100)
     
-    # Get analytics for all students in teacher's classes
-    all_student_ids = []
-    for cls in classes:
-        all_student_ids.extend(cls.get('students', []))
+    # Get the unique students across all of the teacher's classes
+    all_student_ids = await teacher_student_ids(token_data['sub'])
     
     # Get student activity data
-    total_students = len(set(all_student_ids)) if all_student_ids else 0
+    total_students = len(all_student_ids)
     recent_activity = []
     
     if all_student_ids:
         recent_activity = await db.chat_messages.find(
-            {"student_id": {"$in": all_student_ids}}
+            {"student_id": {"$in": all_student_ids}}, CHAT_ACTIVITY_PROJECTION
         ).sort("timestamp", -1).limit(20).to_list(20)
     
-    return {
-        "profile": TeacherProfile(**profile),
-        "classes": [ClassRoom(**cls) for cls in classes],
+    repaired = await ensure_class_versions(token_data['sub'], classes)
+    
+    return FastJSONResponse({
+        "profile": trusted(TeacherProfile, profile),
+        "classes": trusted_list(ClassSummary, classes),
         "stats": {
             "total_classes": len(classes),
             "total_students": total_students,
             "recent_activity_count": len(recent_activity)
         },
-        "recent_activity": [ChatMessage(**msg) for msg in recent_activity]
-    }
+        "recent_activity": trusted_list(ChatActivitySummary, recent_activity)
+    }, headers={} if repaired else {"ETag": etag})
 
 # Enhanced Teacher Analytics Routes
-@api_router.get("/teacher/analytics/class/{class_id}")
-async def get_class_analytics(class_id: str, token_data: dict = Depends(verify_token)):
-    """Get comprehensive analytics for a specific class"""
-    if token_data.get('user_type') != 'teacher':
-        raise HTTPException(status_code=403, detail="Teacher access required")
-    
-    # Verify teacher owns this class
-    classroom = await db.classrooms.find_one({"class_id": class_id, "teacher_id": token_data['sub']})
-    if not classroom:
-        raise HTTPException(status_code=404, detail="Class not found or access denied")
-    
-    student_ids = classroom.get('students', [])
-    if not student_ids:
-        return {
-            "class_info": ClassRoom(**classroom),
-            "student_count": 0,
-            "analytics": {}
-        }
-    
-    # Get student profiles
-    student_profiles = await db.student_profiles.find({"user_id": {"$in": student_ids}}).to_list(100)
-    
-    # Get chat analytics
-    chat_stats = await db.chat_messages.aggregate([
-        {"$match": {"student_id": {"$in": student_ids}}},
-        {"$group": {
-            "_id": "$student_id",
-            "total_messages": {"$sum": 1},
-            "subjects": {"$addToSet": "$subject"},
-            "last_activity": {"$max": "$timestamp"}
-        }}
-    ]).to_list(100)
-    
-    # Get practice test analytics
-    practice_stats = await db.practice_attempts.aggregate([
-        {"$match": {"student_id": {"$in": student_ids}}},
-        {"$group": {
-            "_id": "$student_id",
-            "total_tests": {"$sum": 1},
-            "avg_score": {"$avg": "$score"},
-            "total_time": {"$sum": "$time_taken"}
-        }}
-    ]).to_list(100)
-    
-    # Get mindfulness analytics
-    mindfulness_stats = await db.mindfulness_activities.aggregate([
-        {"$match": {"student_id": {"$in": student_ids}}},
-        {"$group": {
-            "_id": "$student_id",
-            "total_sessions": {"$sum": 1},
-            "total_minutes": {"$sum": "$duration"},
-            "avg_mood_improvement": {"$avg": {"$subtract": ["$mood_after", "$mood_before"]}}
-        }}
-    ]).to_list(100)
+CLASS_ACTIVITY_DAYS = 30
+STUDENT_ACTIVITY_DAYS = 365
+
+def combine_class_analytics(student_profiles: List[dict], roster_stats: List[dict]):
+    """Join a class's student profiles with their activity stats; returns (per-student analytics, class metrics)"""
+    stats_by_student = {stats['student_id']: stats for stats in roster_stats}
     
     # Combine analytics
     student_analytics = {}
     for profile in student_profiles:
         student_id = profile['user_id']
-        
-        # Find corresponding stats
-        chat_data = next((item for item in chat_stats if item['_id'] == student_id), {})
-        practice_data = next((item for item in practice_stats if item['_id'] == student_id), {})
-        mindfulness_data = next((item for item in mindfulness_stats if item['_id'] == student_id), {})
+        stats = stats_by_student.get(student_id, student_stats.empty_stats(student_id))
         
         student_analytics[student_id] = {
-            "profile": StudentProfile(**profile),
+            "profile": trusted(StudentSummary, profile),
             "engagement": {
-                "total_messages": chat_data.get('total_messages', 0),
-                "subjects_studied": len(chat_data.get('subjects', [])),
-                "last_activity": chat_data.get('last_activity')
+                "total_messages": stats.get('total_messages', 0),
+                "subjects_studied": len(stats.get('messages_by_subject', {})),
+                "last_activity": stats.get('last_message_at')
             },
             "performance": {
-                "total_tests": practice_data.get('total_tests', 0),
-                "average_score": round(practice_data.get('avg_score', 0), 1),
-                "total_study_time": practice_data.get('total_time', 0)
+                "total_tests": stats.get('total_tests', 0),
+                "average_score": round(student_stats.average_score(stats), 1),
+                "total_study_time": stats.get('time_taken_sum', 0)
             },
             "wellness": {
-                "mindfulness_sessions": mindfulness_data.get('total_sessions', 0),
-                "mindfulness_minutes": mindfulness_data.get('total_minutes', 0),
-                "mood_improvement": round(mindfulness_data.get('avg_mood_improvement', 0), 1)
+                "mindfulness_sessions": stats.get('mindfulness_sessions', 0),
+                "mindfulness_minutes": stats.get('mindfulness_minutes', 0),
+                "mood_improvement": round(student_stats.average_mood_improvement(stats), 1)
             }
         }
     
     # Calculate class-wide metrics
+    tested_students = [stats for stats in stats_by_student.values() if stats.get('total_tests', 0) > 0]
     class_metrics = {
         "average_xp": sum(p.get('total_xp', 0) for p in student_profiles) / len(student_profiles) if student_profiles else 0,
         "average_level": sum(p.get('level', 1) for p in student_profiles) / len(student_profiles) if student_profiles else 1,
-        "total_messages": sum(s.get('total_messages', 0) for s in chat_stats),
-        "total_tests": sum(s.get('total_tests', 0) for s in practice_stats),
-        "average_score": sum(s.get('avg_score', 0) for s in practice_stats) / len(practice_stats) if practice_stats else 0,
-        "active_students": len([s for s in chat_stats if s.get('total_messages', 0) > 0])
+        "total_messages": sum(stats.get('total_messages', 0) for stats in stats_by_student.values()),
+        "total_tests": sum(stats.get('total_tests', 0) for stats in stats_by_student.values()),
+        "average_score": sum(student_stats.average_score(stats) for stats in tested_students) / len(tested_students) if tested_students else 0,
+        "active_students": len([stats for stats in stats_by_student.values() if stats.get('total_messages', 0) > 0])
     }
+    return student_analytics, class_metrics
+
+@api_router.get("/teacher/analytics/class/{class_id}")
+async def get_class_analytics(class_id: str, request: Request, token_data: dict = Depends(verify_token),
+                              loaders: Loaders = Depends(get_loaders)):
+    """Get comprehensive analytics for a specific class"""
+    if token_data.get('user_type') != 'teacher':
+        raise HTTPException(status_code=403, detail="Teacher access required")
     
-    return {
-        "class_info": ClassRoom(**classroom),
+    # The daily activity window moves with the UTC date as well as with writes
+    etag = await compute_etag("class_analytics", token_data['sub'], class_id=class_id, extra=datetime.utcnow().date().isoformat())
+    cached = not_modified(request, "class_analytics", etag)
+    if cached:
+        return cached
+    
+    # Verify teacher owns this class
+    classroom = await loaders.classrooms.load(class_id)
+    if not classroom or classroom['teacher_id'] != token_data['sub']:
+        raise HTTPException(status_code=404, detail="Class not found or access denied")
+    
+    headers = {} if await ensure_class_versions(token_data['sub'], [classroom]) else {"ETag": etag}
+    
+    student_ids = classroom.get('students', [])
+    if not student_ids:
+        return FastJSONResponse({
+            "class_info": class_summary(classroom),
+            "student_count": 0,
+            "analytics": {}
+        }, headers=headers)
+    
+    # Get student profiles and materialized activity stats
+    student_profiles, roster_stats = await asyncio.gather(
+        loaders.collection("student_profiles", "user_id", STUDENT_SUMMARY_PROJECTION).load_many(student_ids),
+        loaders.student_stats.load_many(student_ids)
+    )
+    student_analytics, class_metrics = combine_class_analytics(student_profiles, roster_stats)
+    
+    # Daily class activity comes from the class rollup buckets
+    daily_totals = await rollups.daily_totals(db, "class", [class_id], rollups.recent_days(CLASS_ACTIVITY_DAYS))
+    
+    return FastJSONResponse({
+        "class_info": class_summary(classroom),
         "student_count": len(student_ids),
         "class_metrics": class_metrics,
-        "student_analytics": student_analytics
-    }
+        "student_analytics": student_analytics,
+        "daily_activity": {day.date().isoformat(): counters for day, counters in daily_totals.items()}
+    }, headers=headers)
 
 @api_router.get("/teacher/analytics/student/{student_id}")
-async def get_student_detailed_analytics(student_id: str, token_data: dict = Depends(verify_token)):
+async def get_student_detailed_analytics(student_id: str, token_data: dict = Depends(verify_token),
+                                         loaders: Loaders = Depends(get_loaders)):
     """Get detailed analytics for a specific student"""
     if token_data.get('user_type') != 'teacher':
         raise HTTPException(status_code=403, detail="Teacher access required")
     
     # Verify teacher has access to this student
-    teacher_classes = await db.classrooms.find({"teacher_id": token_data['sub']}).to_list(100)
-    student_accessible = False
-    for cls in teacher_classes:
-        if student_id in cls.get('students', []):
-            student_accessible = True
-            break
-    
-    if not student_accessible:
+    if not await teacher_has_student(token_data['sub'], student_id):
         raise HTTPException(status_code=403, detail="Student not in your classes")
     
     # Get student profile
-    student_profile = await db.student_profiles.find_one({"user_id": student_id})
+    student_profile = await loaders.student_profiles.load(student_id)
     if not student_profile:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Get detailed chat history with subject breakdown
-    chat_history = await db.chat_messages.find(
-        {"student_id": student_id}
-    ).sort("timestamp", 1).to_list(1000)
+    # Get the most recent messages, overall and per subject, through the
+    # (student_id[, subject], timestamp) indexes
+    recent_queries = [
+        db.chat_messages.find({"student_id": student_id}, CHAT_ACTIVITY_PROJECTION).sort("timestamp", -1).limit(10).to_list(10)
+    ] + [
+        db.chat_messages.find(
+            {"student_id": student_id, "subject": subject.value}, {"_id": 0, "timestamp": 1}
+        ).sort("timestamp", -1).limit(10).to_list(10)
+        for subject in Subject
+    ]
+    recent_messages, *recent_by_subject = await asyncio.gather(*recent_queries)
+    
+    # Daily activity comes from the rollup buckets
+    daily_totals = await rollups.daily_totals(db, "student", [student_id], rollups.recent_days(STUDENT_ACTIVITY_DAYS))
     
     # Get practice test history
     practice_history = await db.practice_attempts.find(
-        {"student_id": student_id}
+        {"student_id": student_id},
+        {"_id": 0, "score": 1, "completed_at": 1, "time_taken": 1}
     ).sort("completed_at", 1).to_list(100)
     
     # Get mindfulness history
     mindfulness_history = await db.mindfulness_activities.find(
-        {"student_id": student_id}
+        {"student_id": student_id},
+        {"_id": 0, "duration": 1, "mood_before": 1, "mood_after": 1, "completed_at": 1}
     ).sort("completed_at", 1).to_list(100)
     
-    # Get calendar events
-    calendar_events = await db.calendar_events.find(
-        {"student_id": student_id}
-    ).sort("start_time", 1).to_list(100)
+    # Count calendar events
+    total_events = await db.calendar_events.count_documents({"student_id": student_id})
     
     # Calculate subject-wise analytics
+    stats = await loaders.student_stats.load(student_id)
+    
     subject_analytics = {}
-    for subject in Subject:
-        subject_messages = [msg for msg in chat_history if msg.get('subject') == subject.value]
-        subject_tests = []
-        
-        # Get practice questions for this subject from practice attempts
-        for attempt in practice_history:
-            # Get questions from this attempt
-            attempt_questions = await db.practice_questions.find(
-                {"id": {"$in": attempt.get('questions', [])}, "subject": subject.value}
-            ).to_list(100)
-            if attempt_questions:
-                subject_tests.append({
-                    "score": attempt.get('score', 0),
-                    "completed_at": attempt.get('completed_at'),
-                    "question_count": len(attempt_questions)
-                })
-        
+    for subject, subject_messages in zip(Subject, recent_by_subject):
         subject_analytics[subject.value] = {
-            "total_messages": len(subject_messages),
-            "total_tests": len(subject_tests),
-            "average_score": sum(t['score'] for t in subject_tests) / len(subject_tests) if subject_tests else 0,
-            "last_activity": max([msg.get('timestamp') for msg in subject_messages], default=None),
-            "progress_trend": [msg.get('timestamp') for msg in subject_messages[-10:]] if subject_messages else []
+            "total_messages": stats.get('messages_by_subject', {}).get(subject.value, 0),
+            "total_tests": stats.get('tests_by_subject', {}).get(subject.value, 0),
+            "average_score": student_stats.average_score(stats, subject.value),
+            "last_activity": stats.get('last_activity_by_subject', {}).get(subject.value),
+            "progress_trend": [msg.get('timestamp') for msg in reversed(subject_messages)]
         }
     
     # Calculate time-based analytics (daily activity)
-    from collections import defaultdict
-    daily_activity = defaultdict(int)
-    for msg in chat_history:
-        date = msg.get('timestamp', datetime.utcnow()).date()
-        daily_activity[date.isoformat()] += 1
+    daily_activity = {day.date().isoformat(): counters['messages'] for day, counters in daily_totals.items() if counters['messages']}
     
     # Performance trends over time
     performance_trend = []
@@ -1465,27 +2827,27 @@ async def get_student_detailed_analytics(student_id: str, token_data: dict = Dep
             "time_taken": attempt.get('time_taken')
         })
     
-    return {
-        "student_profile": StudentProfile(**student_profile),
+    return FastJSONResponse({
+        "student_profile": trusted(StudentProfile, student_profile),
         "subject_analytics": subject_analytics,
         "overall_stats": {
-            "total_messages": len(chat_history),
-            "total_tests": len(practice_history),
-            "total_mindfulness_sessions": len(mindfulness_history),
-            "total_events": len(calendar_events),
-            "average_test_score": sum(a.get('score', 0) for a in practice_history) / len(practice_history) if practice_history else 0,
+            "total_messages": stats.get('total_messages', 0),
+            "total_tests": stats.get('total_tests', 0),
+            "total_mindfulness_sessions": stats.get('mindfulness_sessions', 0),
+            "total_events": total_events,
+            "average_test_score": student_stats.average_score(stats),
             "study_streak": student_profile.get('streak_days', 0),
             "total_xp": student_profile.get('total_xp', 0),
             "current_level": student_profile.get('level', 1)
         },
         "activity_timeline": {
-            "daily_activity": dict(daily_activity),
+            "daily_activity": daily_activity,
             "performance_trend": performance_trend,
-            "recent_activity": chat_history[-10:] if chat_history else []
+            "recent_activity": list(reversed(recent_messages))
         },
         "wellness_data": {
-            "mindfulness_sessions": len(mindfulness_history),
-            "total_mindfulness_minutes": sum(s.get('duration', 0) for s in mindfulness_history),
+            "mindfulness_sessions": stats.get('mindfulness_sessions', 0),
+            "total_mindfulness_minutes": stats.get('mindfulness_minutes', 0),
             "mood_trends": [
                 {
                     "date": s.get('completed_at'),
@@ -1495,93 +2857,147 @@ async def get_student_detailed_analytics(student_id: str, token_data: dict = Dep
                 } for s in mindfulness_history
             ]
         }
-    }
+    })
 
 @api_router.get("/teacher/analytics/overview")
-async def get_teacher_analytics_overview(token_data: dict = Depends(verify_token)):
+async def get_teacher_analytics_overview(request: Request, token_data: dict = Depends(verify_token)):
     """Get teacher's overall analytics across all classes"""
     if token_data.get('user_type') != 'teacher':
         raise HTTPException(status_code=403, detail="Teacher access required")
     
-    # Get all teacher's classes
-    classes = await db.classrooms.find({"teacher_id": token_data['sub']}).to_list(100)
-    
-    # Get all students across all classes
-    all_student_ids = []
-    class_summary = []
-    
-    for cls in classes:
-        student_ids = cls.get('students', [])
-        all_student_ids.extend(student_ids)
-        
-        # Get basic stats for each class
-        student_profiles = await db.student_profiles.find({"user_id": {"$in": student_ids}}).to_list(100)
-        avg_xp = sum(p.get('total_xp', 0) for p in student_profiles) / len(student_profiles) if student_profiles else 0
-        
-        # Get recent activity count
-        recent_activity_count = await db.chat_messages.count_documents({
-            "student_id": {"$in": student_ids},
-            "timestamp": {"$gte": datetime.utcnow() - timedelta(days=7)}
-        })
-        
-        class_summary.append({
-            "class_info": ClassRoom(**cls),
-            "student_count": len(student_ids),
-            "average_xp": round(avg_xp, 1),
-            "weekly_activity": recent_activity_count
-        })
-    
-    unique_student_ids = list(set(all_student_ids))
-    
-    # Overall metrics
-    total_messages = await db.chat_messages.count_documents({"student_id": {"$in": unique_student_ids}})
-    total_tests = await db.practice_attempts.count_documents({"student_id": {"$in": unique_student_ids}})
-    
-    # Get average scores
-    avg_score_pipeline = await db.practice_attempts.aggregate([
-        {"$match": {"student_id": {"$in": unique_student_ids}}},
-        {"$group": {"_id": None, "avg_score": {"$avg": "$score"}}}
-    ]).to_list(1)
-    avg_score = avg_score_pipeline[0].get('avg_score', 0) if avg_score_pipeline else 0
-    
-    # Get subject distribution
-    subject_distribution = await db.chat_messages.aggregate([
-        {"$match": {"student_id": {"$in": unique_student_ids}}},
-        {"$group": {"_id": "$subject", "count": {"$sum": 1}}}
-    ]).to_list(10)
+    # Weekly windows slide with time, so the tag also changes every hour
+    etag = await compute_etag("analytics_overview", token_data['sub'], teacher_id=token_data['sub'], extra=datetime.utcnow().strftime("%Y-%m-%dT%H"))
+    cached = not_modified(request, "analytics_overview", etag)
+    if cached:
+        return cached
     
-    # Get weekly activity trend
-    weekly_activity = await db.chat_messages.aggregate([
-        {
-            "$match": {
-                "student_id": {"$in": unique_student_ids},
-                "timestamp": {"$gte": datetime.utcnow() - timedelta(days=30)}
-            }
-        },
+    # Per-class summaries and the unique roster are independent queries
+    class_rows, unique_student_ids = await asyncio.gather(
+        teacher_class_summaries(token_data['sub']),
+        teacher_student_ids(token_data['sub'])
+    )
+    class_summaries = [
         {
-            "$group": {
-                "_id": {
-                    "week": {"$week": "$timestamp"},
-                    "year": {"$year": "$timestamp"}
-                },
-                "count": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id.year": 1, "_id.week": 1}}
-    ]).to_list(10)
+            "class_info": trusted(ClassSummary, row['class_info']),
+            "student_count": row['student_count'],
+            "average_xp": round(row['xp_sum'] / row['profile_count'], 1) if row['profile_count'] else 0,
+            "weekly_activity": row['weekly_activity']
+        }
+        for row in class_rows
+    ]
+    
+    # Overall metrics come from the materialized student stats, computed
+    # concurrently with the weekly trend
+    totals, weekly_activity, repaired = await asyncio.gather(
+        student_stats_totals(unique_student_ids),
+        weekly_activity_trend(unique_student_ids),
+        ensure_class_versions(token_data['sub'], [row['class_info'] for row in class_rows])
+    )
     
-    return {
+    return FastJSONResponse({
         "overview_metrics": {
-            "total_classes": len(classes),
+            "total_classes": len(class_rows),
             "total_students": len(unique_student_ids),
-            "total_messages": total_messages,
-            "total_tests": total_tests,
-            "average_score": round(avg_score, 1)
+            "total_messages": totals['total_messages'],
+            "total_tests": totals['total_tests'],
+            "average_score": round(totals['score_sum'] / totals['total_tests'], 1) if totals['total_tests'] else 0
         },
-        "class_summary": class_summary,
-        "subject_distribution": [{"subject": item["_id"], "count": item["count"]} for item in subject_distribution],
-        "weekly_activity_trend": [{"week": f"{item['_id']['year']}-W{item['_id']['week']}", "count": item["count"]} for item in weekly_activity]
-    }
+        "class_summary": class_summaries,
+        "subject_distribution": totals['subject_distribution'],
+        "weekly_activity_trend": weekly_activity
+    }, headers={} if repaired else {"ETag": etag})
+
+async def teacher_class_summaries(teacher_id: str) -> List[dict]:
+    """Summarize every class of a teacher in one pipeline.
+
+    Rosters are unwound so each student's XP and last-7-days message count
+    are looked up once, then regrouped per class.
+    """
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    return await db.classrooms.aggregate([
+        {"$match": {"teacher_id": teacher_id}},
+        {"$unwind": {"path": "$students", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "student_profiles",
+            "let": {"student_id": "$students"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$student_id"]}}},
+                {"$project": {"_id": 0, "total_xp": 1}}
+            ],
+            "as": "profile"
+        }},
+        {"$lookup": {
+            "from": "chat_messages",
+            "let": {"student_id": "$students"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$student_id", "$$student_id"]},
+                    {"$gte": ["$timestamp", week_ago]}
+                ]}}},
+                {"$count": "count"}
+            ],
+            "as": "weekly"
+        }},
+        {"$group": {
+            "_id": "$class_id",
+            "class_info": {"$first": {
+                "class_id": "$class_id",
+                "join_code": "$join_code",
+                "subject": "$subject",
+                "class_name": "$class_name",
+                "grade_level": "$grade_level",
+                "description": "$description",
+                "created_at": "$created_at",
+                "is_active": "$is_active"
+            }},
+            "student_count": {"$sum": {"$cond": [{"$ifNull": ["$students", False]}, 1, 0]}},
+            "xp_sum": {"$sum": {"$ifNull": [{"$arrayElemAt": ["$profile.total_xp", 0]}, 0]}},
+            "profile_count": {"$sum": {"$size": "$profile"}},
+            "weekly_activity": {"$sum": {"$ifNull": [{"$arrayElemAt": ["$weekly.count", 0]}, 0]}}
+        }},
+        {"$sort": {"class_info.created_at": 1}},
+        {"$addFields": {"class_info.student_count": "$student_count"}}
+    ]).to_list(None)
+
+async def student_stats_totals(student_ids: List[str]) -> dict:
+    """Sum the materialized stats of a set of students in one aggregation"""
+    totals = {"total_messages": 0, "total_tests": 0, "score_sum": 0, "subject_distribution": []}
+    if not student_ids:
+        return totals
+    
+    await student_stats.ensure_student_stats(db, student_ids)
+    result = await db.student_stats.aggregate([
+        {"$match": {"student_id": {"$in": student_ids}}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "total_messages": {"$sum": "$total_messages"},
+                "total_tests": {"$sum": "$total_tests"},
+                "score_sum": {"$sum": "$score_sum"}
+            }}],
+            "subjects": [
+                {"$project": {"subjects": {"$objectToArray": {"$ifNull": ["$messages_by_subject", {}]}}}},
+                {"$unwind": "$subjects"},
+                {"$group": {"_id": "$subjects.k", "count": {"$sum": "$subjects.v"}}},
+                {"$sort": {"count": -1}}
+            ]
+        }}
+    ]).to_list(1)
+    
+    if result and result[0]['totals']:
+        row = result[0]['totals'][0]
+        totals.update(total_messages=row['total_messages'], total_tests=row['total_tests'], score_sum=row['score_sum'])
+    if result:
+        totals['subject_distribution'] = [{"subject": item["_id"], "count": item["count"]} for item in result[0]['subjects']]
+    return totals
+
+async def weekly_activity_trend(student_ids: List[str]) -> List[dict]:
+    """Messages per week over the last 30 days for a set of students"""
+    if not student_ids:
+        return []
+    
+    daily_totals = await rollups.daily_totals(db, "student", student_ids, datetime.utcnow() - timedelta(days=30))
+    return rollups.weekly_totals(daily_totals)
 
 # Health check routes
 @api_router.get("/")
@@ -1592,6 +3008,85 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow(), "version": "3.0"}
 
+@api_router.get("/health/live")
+async def liveness_check():
+    """Alive as long as the worker's event loop answers; never checks dependencies"""
+    return FastJSONResponse({"status": "alive", "pid": os.getpid()}, headers={"Cache-Control": "no-store"})
+
+@api_router.get("/health/ready")
+async def readiness_check(request: Request):
+    """Whether this worker should receive traffic; 503 means drain it"""
+    report = await request.app.state.readiness.check()
+    return FastJSONResponse(report, status_code=200 if report["ready"] else 503, headers={"Cache-Control": "no-store"})
+
+@api_router.get("/metrics/conditional-get")
+async def get_conditional_get_metrics(token_data: dict = Depends(require_admin)):
+    """Report how often conditional GETs were answered with 304 Not Modified"""
+    return {
+        scope: {
+            **stats,
+            "not_modified_rate": round(stats["not_modified"] / stats["requests"], 3) if stats["requests"] else 0
+        }
+        for scope, stats in conditional_get_stats.items()
+    }
+
+@api_router.get("/metrics/loaders")
+async def get_loader_metrics(token_data: dict = Depends(require_admin)):
+    """Per-route batching totals of the request-scoped loaders"""
+    return {
+        route: {
+            **stats,
+            "queries_per_request": round(stats["queries"] / stats["requests"], 2) if stats["requests"] else 0,
+            "loads_per_query": round(stats["loads"] / stats["queries"], 2) if stats["queries"] else 0
+        }
+        for route, stats in loader_stats.items()
+    }
+
+# Admin Routes
+@api_router.get("/admin/llm-usage")
+async def get_llm_usage(group_by: str = Query("bot", pattern="^(bot|day|user|school)$"),
+                        days: int = Query(7, ge=1, le=90), limit: int = Query(100, ge=1, le=1000),
+                        token_data: dict = Depends(require_admin)):
+    """LLM calls, tokens, latency and estimated cost since `days` ago, grouped by bot, day, user or school"""
+    await usage_recorder.flush()
+    since = datetime.utcnow() - timedelta(days=days - 1)
+    rows = await llm_usage.summarize(db, group_by, since, limit)
+    return {
+        "group_by": group_by,
+        "since": rollups.day_start(since),
+        "rows": rows,
+        "totals": {
+            name: sum(row[name] for row in rows)
+            for name in ("calls", "errors", "prompt_tokens", "completion_tokens", "total_tokens")
+        } if group_by in ("bot", "day") else None,
+        "daily_limits": llm_usage.DAILY_LIMITS
+    }
+
+@api_router.get("/admin/llm-usage/{scope}/{key}")
+async def get_llm_usage_today(scope: str, key: str, token_data: dict = Depends(require_admin)):
+    """Tokens a user or school has used today against its daily limit"""
+    if scope not in llm_usage.DAILY_LIMITS:
+        raise HTTPException(status_code=404, detail="Unknown usage scope")
+    return {
+        "scope": scope,
+        "key": key,
+        "used_today": await usage_recorder.used_today(scope, key),
+        "daily_limit": llm_usage.DAILY_LIMITS[scope],
+        "resets_in_seconds": llm_usage.seconds_until_reset()
+    }
+
+@api_router.get("/admin/llm-shadow")
+async def get_llm_shadow_comparisons(days: int = Query(7, ge=1, le=model_router.SHADOW_RETENTION_DAYS),
+                                     token_data: dict = Depends(require_admin)):
+    """Shadow comparisons of candidate models against each tier's model since `days` ago"""
+    since = datetime.utcnow() - timedelta(days=days)
+    return {
+        "tiers": {name: tier._asdict() for name, tier in llm_router.tiers.items()},
+        "shadows": {name: tier.model for name, tier in llm_router.shadows.items()},
+        "sample": llm_router.sample,
+        "comparisons": await model_router.summarize(db, since)
+    }
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -1608,6 +3103,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Development and test runs count MongoDB commands per request (see query_budget.py)
+if query_budget.QUERY_DEBUG:
+    app.add_middleware(query_budget.QueryBudgetMiddleware)
+
+# Outermost, so the timing covers the whole stack; /metrics sits outside /api
+# so the nginx proxy never exposes it
+app.add_middleware(metrics.PrometheusMiddleware)
+app.add_route("/metrics", metrics.render, include_in_schema=False)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1615,6 +3119,68 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def create_index(collection, keys, **options):
+    """Create one index, logging a failure (e.g. duplicates under a unique index) so the rest still get created"""
+    try:
+        await collection.create_index(keys, **options)
+    except Exception as e:
+        logger.error(f"Error creating index {keys} on {collection.name}: {str(e)}")
+
+async def ensure_indexes():
+    """Create the indexes the query paths rely on (no-op when they already exist)"""
+    # Keyset pagination of chat history, optionally narrowed by subject or session
+    await create_index(db.chat_messages, [("student_id", 1), ("timestamp", -1), ("id", -1)])
+    await create_index(db.chat_messages, [("student_id", 1), ("subject", 1), ("timestamp", -1), ("id", -1)])
+    await create_index(db.chat_messages, [("student_id", 1), ("session_id", 1), ("timestamp", -1), ("id", -1)])
+    await create_index(db.chat_messages, "id", unique=True)
+    
+    # Version counters behind conditional GETs
+    await create_index(db.resource_versions, "teacher_id", sparse=True)
+    await create_index(db.resource_versions, "students")
+    
+    # Materialized activity summaries
+    await create_index(db.student_stats, "student_id", unique=True)
+    
+    # Daily rollup buckets
+    await create_index(db.daily_activity, [("scope", 1), ("key", 1), ("day", 1), ("subject", 1)], unique=True)
+    
+    # LLM usage buckets: budget checks per key, summaries per day range
+    await create_index(db.llm_usage, [("scope", 1), ("key", 1), ("day", 1), ("bot", 1)], unique=True)
+    await create_index(db.llm_usage, [("scope", 1), ("day", 1)])
+    
+    # Question bank draws for degraded practice tests, lookups by id and
+    # near-duplicate candidates (see question_index.py)
+    await create_index(db.practice_questions, [("subject", 1), ("difficulty", 1)])
+    await create_index(db.practice_questions, "id")
+    await create_index(db.practice_questions, [("subject", 1), ("fingerprint.bands", 1)])
+    
+    # Shadow model comparisons, kept for SHADOW_RETENTION_DAYS
+    await create_index(db.llm_shadow, 
+        "created_at", expireAfterSeconds=model_router.SHADOW_RETENTION_DAYS * 86400
+    )
+    
+    # One mastery vector per student and subject
+    await create_index(db.student_mastery, [("student_id", 1), ("subject", 1)], unique=True)
+    
+    # Class assignments: lookups by id, a class's list, one submission per student,
+    # and a student's classes from rosters that predate class_memberships
+    await create_index(db.assignments, "id", unique=True)
+    await create_index(db.assignments, [("class_id", 1), ("created_at", -1)])
+    await create_index(db.assignment_submissions, [("assignment_id", 1), ("student_id", 1)], unique=True)
+    await create_index(db.assignment_submissions, [("student_id", 1), ("assignment_id", 1)])
+    await create_index(db.classrooms, "students")
+    
+    # Class memberships: access checks, roster counts and per-student lookups
+    await create_index(db.class_memberships, [("class_id", 1), ("student_id", 1)], unique=True)
+    await create_index(db.class_memberships, [("teacher_id", 1), ("student_id", 1)])
+    await create_index(db.class_memberships, [("student_id", 1), ("class_id", 1)])
+    await create_index(db.classrooms, [("teacher_id", 1), ("students", 1)])
+    
+    # Lookups joined from class rosters
+    await create_index(db.student_profiles, "user_id")
+    await create_index(db.classrooms, "teacher_id")
+
+    # Uniqueness the bulk roster import and class creation rely on; these fail
+    # (and are logged) if existing data already holds duplicates
+    await create_index(db.classrooms, "join_code", unique=True)
+    await create_index(db.users, "email", unique=True)
@@ -0,0 +1,252 @@
+"""Materialized per-student activity summaries.
+
+One ``student_stats`` document per student holds running counters that the
+write paths maintain with ``$inc``, so dashboards and analytics read a single
+document instead of re-aggregating raw chat messages, practice attempts and
+mindfulness sessions. ``rebuild_student_stats`` recomputes the documents from
+the raw collections (backfill and repair).
+
+The write paths only increment documents that already exist. A student
+without one (e.g. active before the upgrade) has theirs rebuilt from the raw
+collections instead, after the new activity is stored, and reads rebuild
+documents that are missing.
+
+Every increment also bumps the document's ``version``. A rebuild only
+replaces the version it read before aggregating, and starts over when an
+increment landed in between, so it never overwrites counts it didn't see.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+STATS_COLLECTION = "student_stats"
+REBUILD_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+def empty_stats(student_id: str) -> Dict[str, Any]:
+    """A stats document for a student with no recorded activity"""
+    return {
+        "student_id": student_id,
+        "total_messages": 0,
+        "messages_by_subject": {},
+        "last_message_at": None,
+        "last_activity_by_subject": {},
+        "total_tests": 0,
+        "tests_by_subject": {},
+        "score_sum": 0,
+        "score_sum_by_subject": {},
+        "time_taken_sum": 0,
+        "mindfulness_sessions": 0,
+        "mindfulness_minutes": 0,
+        "mood_delta_sum": 0,
+        "mood_delta_count": 0,
+        "last_activity": None,
+        "version": 0
+    }
+
+async def _increment(db, student_id: str, update: Dict[str, Any]):
+    """Apply update to a student's stats document, or rebuild it when there is none yet.
+
+    Callers store the raw activity first, so the rebuild counts it.
+    """
+    update = {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+    result = await db[STATS_COLLECTION].update_one({"student_id": student_id}, update)
+    if not result.matched_count:
+        await rebuild_student_stats(db, [student_id])
+
+async def record_chat_message(db, student_id: str, subject: str, timestamp: datetime):
+    """Count a chat message towards a student's stats"""
+    await _increment(
+        db, student_id,
+        {
+            "$inc": {"total_messages": 1, f"messages_by_subject.{subject}": 1},
+            "$max": {
+                "last_message_at": timestamp,
+                f"last_activity_by_subject.{subject}": timestamp,
+                "last_activity": timestamp
+            }
+        }
+    )
+
+async def record_practice_attempt(db, student_id: str, subject: Optional[str], score: float, time_taken: int, completed_at: datetime):
+    """Count a submitted practice test towards a student's stats"""
+    inc = {"total_tests": 1, "score_sum": score, "time_taken_sum": time_taken}
+    if subject:
+        inc[f"tests_by_subject.{subject}"] = 1
+        inc[f"score_sum_by_subject.{subject}"] = score
+    await _increment(db, student_id, {"$inc": inc, "$max": {"last_activity": completed_at}})
+
+async def record_mindfulness_session(db, student_id: str, duration: int, mood_before: Optional[int], mood_after: Optional[int], completed_at: datetime):
+    """Count a mindfulness session towards a student's stats"""
+    inc = {"mindfulness_sessions": 1, "mindfulness_minutes": duration}
+    if mood_before is not None and mood_after is not None:
+        inc["mood_delta_sum"] = mood_after - mood_before
+        inc["mood_delta_count"] = 1
+    await _increment(db, student_id, {"$inc": inc, "$max": {"last_activity": completed_at}})
+
+async def get_student_stats(db, student_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Stats documents keyed by student id, rebuilding any that are missing"""
+    docs = await db[STATS_COLLECTION].find({"student_id": {"$in": student_ids}}, {"_id": 0}).to_list(len(student_ids))
+    stats = {doc['student_id']: doc for doc in docs}
+    missing = [student_id for student_id in student_ids if student_id not in stats]
+    if missing:
+        stats.update(await rebuild_student_stats(db, missing))
+    return stats
+
+async def ensure_student_stats(db, student_ids: List[str]):
+    """Rebuild the stats documents that are missing for the given students"""
+    existing = set(await db[STATS_COLLECTION].distinct("student_id", {"student_id": {"$in": student_ids}}))
+    missing = [student_id for student_id in student_ids if student_id not in existing]
+    if missing:
+        await rebuild_student_stats(db, missing)
+
+def average_score(stats: Dict[str, Any], subject: Optional[str] = None) -> float:
+    """Mean practice test score, overall or for one subject"""
+    if subject:
+        tests = stats.get("tests_by_subject", {}).get(subject, 0)
+        return stats.get("score_sum_by_subject", {}).get(subject, 0) / tests if tests else 0
+    return stats.get("score_sum", 0) / stats["total_tests"] if stats.get("total_tests") else 0
+
+def average_mood_improvement(stats: Dict[str, Any]) -> float:
+    """Mean mood change across sessions that recorded both moods"""
+    count = stats.get("mood_delta_count", 0)
+    return stats.get("mood_delta_sum", 0) / count if count else 0
+
+async def rebuild_student_stats(db, student_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Recompute stats documents from the raw collections.
+
+    Rebuilds the given students, or every student with a profile when
+    ``student_ids`` is None. Returns the rebuilt documents keyed by student id.
+    """
+    if student_ids is None:
+        student_ids = await db.student_profiles.distinct("user_id")
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+    for _ in range(REBUILD_ATTEMPTS):
+        # Read versions before aggregating: an increment after this point
+        # bumps the version and fails the conditional replace below
+        current = await db[STATS_COLLECTION].find(
+            {"student_id": {"$in": student_ids}}, {"_id": 0, "student_id": 1, "version": 1}
+        ).to_list(len(student_ids))
+        versions = {doc['student_id']: doc.get('version') for doc in current}
+        stats = await _aggregate_stats(db, student_ids)
+
+        writes = []
+        for student_id, doc in stats.items():
+            if student_id in versions:
+                doc["version"] = (versions[student_id] or 0) + 1
+                writes.append(ReplaceOne({"student_id": student_id, "version": versions[student_id]}, doc))
+            else:
+                writes.append(InsertOne(doc))
+        try:
+            result = await db[STATS_COLLECTION].bulk_write(writes, ordered=False)
+            written = result.matched_count + result.inserted_count
+        except BulkWriteError as e:
+            # Another writer created the document first
+            written = e.details.get("nMatched", 0) + e.details.get("nInserted", 0)
+        if written == len(writes):
+            break
+    else:
+        logger.warning(f"Stats rebuild kept racing writes for {len(student_ids)} students; left them as written")
+    for doc in stats.values():
+        doc.pop("_id", None)
+    return stats
+
+async def _aggregate_stats(db, student_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Stats documents for the given students, computed from the raw collections"""
+    stats = {student_id: empty_stats(student_id) for student_id in student_ids}
+    match = {"$match": {"student_id": {"$in": student_ids}}}
+
+    chat_rows = await db.chat_messages.aggregate([
+        match,
+        {"$group": {
+            "_id": {"student_id": "$student_id", "subject": "$subject"},
+            "count": {"$sum": 1},
+            "last": {"$max": "$timestamp"}
+        }}
+    ]).to_list(None)
+    for row in chat_rows:
+        doc, subject = stats[row['_id']['student_id']], row['_id']['subject']
+        doc["total_messages"] += row['count']
+        doc["messages_by_subject"][subject] = row['count']
+        doc["last_activity_by_subject"][subject] = row['last']
+        doc["last_message_at"] = _latest(doc["last_message_at"], row['last'])
+        doc["last_activity"] = _latest(doc["last_activity"], row['last'])
+
+    # Attempts recorded before subjects were stored on them take the subject
+    # of their first question
+    practice_rows = await db.practice_attempts.aggregate([
+        match,
+        {"$lookup": {
+            "from": "practice_questions",
+            "let": {"first_question": {"$arrayElemAt": ["$questions", 0]}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$first_question"]}}},
+                {"$project": {"_id": 0, "subject": 1}}
+            ],
+            "as": "first_question"
+        }},
+        {"$group": {
+            "_id": {
+                "student_id": "$student_id",
+                "subject": {"$ifNull": ["$subject", {"$arrayElemAt": ["$first_question.subject", 0]}]}
+            },
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": "$score"},
+            "time_taken_sum": {"$sum": "$time_taken"},
+            "last": {"$max": "$completed_at"}
+        }}
+    ]).to_list(None)
+    for row in practice_rows:
+        doc, subject = stats[row['_id']['student_id']], row['_id'].get('subject')
+        doc["total_tests"] += row['count']
+        doc["score_sum"] += row['score_sum']
+        doc["time_taken_sum"] += row['time_taken_sum']
+        if subject:
+            doc["tests_by_subject"][subject] = row['count']
+            doc["score_sum_by_subject"][subject] = row['score_sum']
+        doc["last_activity"] = _latest(doc["last_activity"], row['last'])
+
+    both_moods = {"$and": [
+        {"$ne": [{"$ifNull": ["$mood_before", None]}, None]},
+        {"$ne": [{"$ifNull": ["$mood_after", None]}, None]}
+    ]}
+    mindfulness_rows = await db.mindfulness_activities.aggregate([
+        match,
+        {"$group": {
+            "_id": "$student_id",
+            "count": {"$sum": 1},
+            "minutes": {"$sum": "$duration"},
+            "mood_delta_sum": {"$sum": {"$cond": [
+                both_moods,
+                {"$subtract": ["$mood_after", "$mood_before"]},
+                0
+            ]}},
+            "mood_delta_count": {"$sum": {"$cond": [
+                both_moods,
+                1,
+                0
+            ]}},
+            "last": {"$max": "$completed_at"}
+        }}
+    ]).to_list(None)
+    for row in mindfulness_rows:
+        doc = stats[row['_id']]
+        doc["mindfulness_sessions"] = row['count']
+        doc["mindfulness_minutes"] = row['minutes']
+        doc["mood_delta_sum"] = row['mood_delta_sum']
+        doc["mood_delta_count"] = row['mood_delta_count']
+        doc["last_activity"] = _latest(doc["last_activity"], row['last'])
+    return stats
+
+def _latest(current: Optional[datetime], candidate: Optional[datetime]) -> Optional[datetime]:
+    if current is None:
+        return candidate
+    if candidate is None:
+        return current
+    return max(current, candidate)
@@ -0,0 +1,11 @@
+"""Gunicorn worker class used by gunicorn.conf.py"""
+from uvicorn.workers import UvicornWorker
+
+class ProductionWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools, with the app lifespan required"""
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+    }
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark: backend cold start.
+
+Measures how long ``import server`` takes (with a breakdown of the slowest
+imports from ``python -X importtime``) and how long a fresh uvicorn process
+takes from launch until /api/health/ready answers 200. Needs a reachable
+mongod for readiness.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_cold_start.py [--runs 5] [--json out.json] [--budget 10]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+def import_profile(top: int):
+    """Total import time of the server module and its slowest top-level imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    # Modules are listed after everything they import, so server.py's direct
+    # imports are the rows one level deeper between the previous top-level
+    # import and the server row itself
+    end = next(index for index, (_, _, name) in enumerate(rows) if name == "server")
+    server_total, server_indent, _ = rows[end]
+    start = end
+    while start > 0 and rows[start - 1][1] > server_indent:
+        start -= 1
+    direct = sorted(((cumulative, name) for cumulative, indent, name in rows[start:end] if indent == server_indent + 2), reverse=True)
+    return server_total / 1e6, [{"module": name, "seconds": cumulative / 1e6} for cumulative, name in direct[:top]]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_ready(timeout: float) -> float:
+    """Seconds from launching uvicorn until the readiness probe answers 200"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/ready", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"Server not ready after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports to list")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--budget', type=float, help="Exit non-zero if the median time to ready exceeds this many seconds")
+    args = parser.parse_args()
+
+    import_seconds, slowest = import_profile(args.top)
+    print(f"import server: {import_seconds:.3f} s")
+    for entry in slowest:
+        print(f"  {entry['seconds']:.3f} s  {entry['module']}")
+
+    ready_times = [time_to_ready(args.timeout) for _ in range(args.runs)]
+    median = statistics.median(ready_times)
+    print(f"time to ready: median {median:.3f} s, max {max(ready_times):.3f} s over {args.runs} runs")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({
+                "import_seconds": import_seconds,
+                "slowest_imports": slowest,
+                "ready_seconds": ready_times,
+                "ready_median_seconds": median
+            }, out, indent=2)
+
+    if args.budget is not None and median > args.budget:
+        print(f"Cold start budget exceeded: {median:.3f} s > {args.budget} s")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
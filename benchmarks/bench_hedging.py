@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Benchmark: LLM tail latency with and without hedged requests.
+
+Drives the LLM gateway with a fake Gemini whose latency has a long tail (see
+fake_gemini.py) and compares p50/p95/p99 with hedging off and on, with how
+often a hedge was sent and how often it won. Needs no network or database.
+
+Usage: python benchmarks/bench_hedging.py [--calls 2000] [--concurrency 16] [--latency-ms 300] [--sigma 0.9]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from fake_gemini import FakeGemini  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def drive(gateway: LLMGateway, calls: int, concurrency: int, think: float, seed: int):
+    rng = random.Random(seed)
+    latencies = []
+    remaining = iter(range(calls))
+
+    async def user():
+        for _ in remaining:
+            started = time.perf_counter()
+            await gateway.generate("Explain photosynthesis briefly.", bot="bench")
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return sorted(latencies)
+
+def run(hedge_percentile: float, args):
+    fake = FakeGemini(latency_ms=args.latency_ms, latency_sigma=args.sigma, tokens_per_second=args.tokens_per_second,
+                      completion_tokens=args.completion_tokens, seed=args.seed)
+    gateway = LLMGateway(max_concurrency=args.concurrency * 2)
+    gateway._genai = fake
+    gateway.hedge_percentile = hedge_percentile
+    try:
+        latencies = asyncio.run(drive(gateway, args.calls, args.concurrency, args.think, args.seed))
+    finally:
+        gateway.close()
+    return latencies, fake.calls, gateway.hedges_sent, gateway.hedges_won
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--think', type=float, default=0.01, help="Mean seconds between a user's calls")
+    parser.add_argument('--latency-ms', type=float, default=300, help="Median fake Gemini latency")
+    parser.add_argument('--sigma', type=float, default=0.9, help="Log-normal spread; larger means a longer tail")
+    parser.add_argument('--tokens-per-second', type=float, default=2000)
+    parser.add_argument('--completion-tokens', type=int, default=100)
+    parser.add_argument('--percentile', type=float, default=0.95, help="Hedge after this percentile of recent latencies")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    results = {}
+    for label, hedge_percentile in (("no hedging", 0), (f"hedge at p{args.percentile * 100:g}", args.percentile)):
+        latencies, backend_calls, sent, won = run(hedge_percentile, args)
+        results[label] = latencies
+        print(f"{label:>16}: p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  hedges {sent} ({sent / args.calls:.1%}, {won} won)  "
+              f"extra calls {backend_calls - args.calls}")
+
+    baseline, hedged = results.values()
+    improvement = 1 - percentile(hedged, 0.99) / percentile(baseline, 0.99)
+    print(f"p99 improvement: {improvement:.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Micro-benchmark suite: save and compare baselines of the CPU hot paths.
+
+Runs the pytest-benchmark suite in benchmarks/hot_paths. Baselines are stored
+in benchmarks/hot_paths/baselines, one directory per machine and Python
+version, so only compare runs from the same environment.
+
+Requires pytest-benchmark. Usage:
+    python benchmarks/bench_hot_paths.py save [--name baseline]
+    python benchmarks/bench_hot_paths.py compare [--against 0001] [--threshold 10]
+    python benchmarks/bench_hot_paths.py run [-k grade]
+"""
+import argparse
+import os
+import sys
+
+import pytest
+
+SUITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hot_paths')
+STORAGE = f"file://{os.path.join(SUITE_DIR, 'baselines')}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=["run", "save", "compare"])
+    parser.add_argument('--name', default="baseline", help="Name of the saved baseline")
+    parser.add_argument('--against', help="Saved run to compare with (default: the latest)")
+    parser.add_argument('--threshold', type=float, default=10, help="Fail when a median regresses by more than this percent")
+    parser.add_argument('-k', dest='keyword', help="Only run benchmarks matching this expression")
+    args = parser.parse_args()
+
+    pytest_args = [SUITE_DIR, "-q", f"--benchmark-storage={STORAGE}", "--benchmark-columns=min,median,max,ops,rounds",
+                   "--benchmark-sort=name"]
+    if args.keyword:
+        pytest_args += ["-k", args.keyword]
+    if args.command == "save":
+        pytest_args.append(f"--benchmark-save={args.name}")
+    elif args.command == "compare":
+        pytest_args.append(f"--benchmark-compare={args.against}" if args.against else "--benchmark-compare")
+        pytest_args.append(f"--benchmark-compare-fail=median:{args.threshold:g}%")
+    sys.exit(pytest.main(pytest_args))
+
+if __name__ == "__main__":
+    main()
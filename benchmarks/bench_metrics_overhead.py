@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: cost of the Prometheus instrumentation.
+
+Drives raw ASGI requests to /api/health/live through the app's router with
+and without ``PrometheusMiddleware`` and reports the added time per request,
+then times a ``CommandMetrics`` started/succeeded pair to get the cost per
+MongoDB command. Needs no database or network.
+
+Usage: python benchmarks/bench_metrics_overhead.py [--requests 20000] [--commands 200000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import metrics  # noqa: E402
+from server import app  # noqa: E402
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/api/health/live", "raw_path": b"/api/health/live",
+    "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+    "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8001)
+}
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+async def time_requests(asgi_app, count: int) -> float:
+    """Seconds per request through asgi_app"""
+    for _ in range(min(count, 1000)):  # warm up
+        await asgi_app({**SCOPE, "app": app}, receive, send)
+    started = time.perf_counter()
+    for _ in range(count):
+        await asgi_app({**SCOPE, "app": app}, receive, send)
+    return (time.perf_counter() - started) / count
+
+def time_commands(count: int) -> float:
+    """Seconds per MongoDB command spent in the listener"""
+    listener = metrics.CommandMetrics()
+    started_event = SimpleNamespace(command_name="find", command={"find": "users", "filter": {}},
+                                    connection_id=("localhost", 27017), request_id=0)
+    succeeded_event = SimpleNamespace(command_name="find", connection_id=("localhost", 27017),
+                                      request_id=0, duration_micros=850)
+    started = time.perf_counter()
+    for request_id in range(count):
+        started_event.request_id = succeeded_event.request_id = request_id
+        listener.started(started_event)
+        listener.succeeded(succeeded_event)
+    return (time.perf_counter() - started) / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--commands', type=int, default=200000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(time_requests(app.router, args.requests))
+    instrumented = asyncio.run(time_requests(metrics.PrometheusMiddleware(app.router), args.requests))
+    print(f"request without metrics: {bare * 1e6:.1f} µs")
+    print(f"request with metrics:    {instrumented * 1e6:.1f} µs "
+          f"(+{(instrumented - bare) * 1e6:.1f} µs, {(instrumented - bare) / bare:+.1%})")
+
+    per_command = time_commands(args.commands)
+    print(f"MongoDB command listener: {per_command * 1e6:.2f} µs per command")
+
+if __name__ == "__main__":
+    main()
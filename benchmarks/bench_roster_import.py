@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark: provisioning a school roster of 2,000 students.
+
+Runs a sample of students through the one-at-a-time path (register_user then
+join_class for each) and extrapolates it to the full roster, then imports the
+whole roster through the bulk provisioning pipeline, reporting wall time and
+MongoDB commands for both. Uses a scratch database on a local mongod.
+
+Usage: MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_roster_import.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from pymongo import monitoring  # noqa: E402
+
+import server  # noqa: E402
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def make_roster(students, classes, prefix):
+    return [
+        {"email": f"{prefix}{i}@school.example", "name": f"Student {i}", "grade_level": "9th",
+         "class_name": f"Period {i % classes + 1}", "subject": "math", "password": "Welcome123!"}
+        for i in range(students)
+    ]
+
+async def create_teacher():
+    response = await server.register_user(server.UserCreate(
+        email=f"teacher_{uuid.uuid4().hex[:8]}@school.example", password="Welcome123!",
+        name="Bench Teacher", user_type=server.UserType.TEACHER, school_name="Bench High"
+    ))
+    return response["user"].id
+
+async def one_at_a_time(rows, teacher_id):
+    join_codes = {}
+    for row in rows:
+        if row["class_name"] not in join_codes:
+            classroom = await server.create_class(
+                {"subject": row["subject"], "class_name": row["class_name"], "grade_level": row["grade_level"]},
+                {"sub": teacher_id, "user_type": "teacher"}
+            )
+            join_codes[row["class_name"]] = classroom.join_code
+        response = await server.register_user(server.UserCreate(user_type=server.UserType.STUDENT, **{
+            key: row[key] for key in ("email", "password", "name", "grade_level")
+        }))
+        await server.join_class(server.JoinClassRequest(join_code=join_codes[row["class_name"]]),
+                                {"sub": response["user"].id, "user_type": "student"})
+
+async def bulk(rows, teacher_id):
+    async for event in server.provision_roster(teacher_id, rows):
+        last = event
+    assert last["created"] == len(rows), last
+
+async def measure(label, fn, rows, teacher_id, counter, scale=1):
+    counter.count = 0
+    start = time.perf_counter()
+    await fn(rows, teacher_id)
+    elapsed = time.perf_counter() - start
+    note = f" (extrapolated from {len(rows)})" if scale != 1 else ""
+    print(f"{label}: {elapsed * scale:.1f} s, {counter.count * scale:.0f} MongoDB commands for "
+          f"{int(len(rows) * scale)} students{note}")
+
+async def main(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'), event_listeners=[counter])
+    db_name = f"bench_roster_{uuid.uuid4().hex[:8]}"
+    server.db = client[db_name]
+    try:
+        await server.ensure_indexes()
+        teacher_id = await create_teacher()
+        sample = make_roster(args.sample, args.classes, "single")
+        await measure("one at a time", one_at_a_time, sample, teacher_id, counter, scale=args.students / args.sample)
+        await measure("bulk import", bulk, make_roster(args.students, args.classes, "bulk"), teacher_id, counter)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--classes', type=int, default=8)
+    parser.add_argument('--sample', type=int, default=100, help="Students run through the one-at-a-time path")
+    asyncio.run(main(parser.parse_args()))
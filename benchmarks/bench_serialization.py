@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: validated vs trusted serialization of 1000-item read responses.
+
+Compares the previous read path (construct a pydantic model per stored
+document, ``jsonable_encoder``, stdlib ``json``) with the trusted path
+(``trusted_list`` + ``FastJSONResponse``) and reports the CPU time saved per
+request.
+
+Usage: python benchmarks/bench_serialization.py [--items 1000] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from serialization import FastJSONResponse, trusted_list  # noqa: E402
+from server import ChatMessage, ClassRoom  # noqa: E402
+
+def make_chat_messages(count):
+    """Stored chat message documents as they come back from MongoDB"""
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": uuid.uuid4().hex[:24],
+            "id": str(uuid.uuid4()),
+            "session_id": str(uuid.uuid4()),
+            "student_id": str(uuid.uuid4()),
+            "subject": "math",
+            "user_message": f"How do I solve equation number {i}?",
+            "bot_response": "Great question! Let's break it down step by step. " * 20,
+            "bot_type": "math_bot",
+            "timestamp": now - timedelta(minutes=i),
+            "difficulty_level": None,
+            "topic": "Algebra",
+            "confidence_score": None,
+            "learning_points": []
+        }
+        for i in range(count)
+    ]
+
+def make_classrooms(count):
+    """Stored classroom documents with 30-student rosters"""
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": uuid.uuid4().hex[:24],
+            "id": str(uuid.uuid4()),
+            "class_id": str(uuid.uuid4()),
+            "join_code": "ABC123",
+            "teacher_id": str(uuid.uuid4()),
+            "subject": "physics",
+            "class_name": f"Physics {i}",
+            "grade_level": "10th",
+            "description": "Mechanics and waves",
+            "students": [str(uuid.uuid4()) for _ in range(30)],
+            "created_at": now,
+            "is_active": True
+        }
+        for i in range(count)
+    ]
+
+def validated_path(model, docs):
+    items = [model(**doc) for doc in docs]
+    return JSONResponse(jsonable_encoder(items)).body
+
+def trusted_path(model, docs):
+    return FastJSONResponse(trusted_list(model, docs)).body
+
+def measure(fn, model, docs, repeat):
+    fn(model, docs)  # warm up caches
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(model, docs)
+    return (time.process_time() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    for label, model, docs in [
+        ("chat messages", ChatMessage, make_chat_messages(args.items)),
+        ("classrooms", ClassRoom, make_classrooms(args.items)),
+    ]:
+        assert json.loads(validated_path(model, docs)) == json.loads(trusted_path(model, docs))
+        before = measure(validated_path, model, docs, args.repeat)
+        after = measure(trusted_path, model, docs, args.repeat)
+        print(f"{label} x{args.items}: validated {before * 1000:.2f} ms, trusted {after * 1000:.2f} ms, "
+              f"saved {(before - after) * 1000:.2f} ms/request ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
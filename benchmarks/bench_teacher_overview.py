@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Benchmark: teacher analytics overview for a teacher with many classes.
+
+Seeds a scratch database on a local mongod with one teacher, 30 classes of
+30 students and a month of chat, practice and mindfulness activity, then
+times the per-class loop the overview used to run against the current
+single-pipeline implementation and counts the MongoDB commands each issues.
+
+Usage: MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_teacher_overview.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from pymongo import monitoring  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+import server  # noqa: E402
+import student_stats  # noqa: E402
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+async def seed(db, classes, students_per_class, messages_per_student):
+    teacher_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    subjects = [subject.value for subject in server.Subject]
+    classrooms, profiles, messages, attempts = [], [], [], []
+    for c in range(classes):
+        roster = [str(uuid.uuid4()) for _ in range(students_per_class)]
+        classrooms.append(server.ClassRoom(
+            class_id=str(uuid.uuid4()), join_code=f"B{c:05d}", teacher_id=teacher_id,
+            subject=server.Subject.MATH, class_name=f"Class {c}", grade_level=server.GradeLevel.GRADE_9,
+            students=roster
+        ).dict())
+        for student_id in roster:
+            profiles.append({"user_id": student_id, "student_id": student_id, "name": "Student",
+                             "grade_level": "9th", "total_xp": random.randint(0, 500), "level": 1})
+            for _ in range(messages_per_student):
+                messages.append({"id": str(uuid.uuid4()), "student_id": student_id, "session_id": "s",
+                                 "subject": random.choice(subjects), "user_message": "q", "bot_response": "a" * 500,
+                                 "bot_type": "math_bot", "timestamp": now - timedelta(minutes=random.randint(0, 60 * 24 * 30))})
+            attempts.append({"id": str(uuid.uuid4()), "student_id": student_id, "test_id": "t", "questions": [],
+                             "student_answers": {}, "score": random.uniform(0, 100), "time_taken": 300,
+                             "subject": "math", "completed_at": now})
+    await db.classrooms.insert_many(classrooms)
+    await db.student_profiles.insert_many(profiles)
+    await db.chat_messages.insert_many(messages)
+    await db.practice_attempts.insert_many(attempts)
+    await server.ensure_indexes()
+    await student_stats.rebuild_student_stats(db)
+    return teacher_id
+
+async def legacy_overview(db, teacher_id):
+    """The query pattern of the previous per-class implementation"""
+    classes = await db.classrooms.find({"teacher_id": teacher_id}).to_list(100)
+    all_student_ids = []
+    for cls in classes:
+        student_ids = cls.get('students', [])
+        all_student_ids.extend(student_ids)
+        await db.student_profiles.find({"user_id": {"$in": student_ids}}).to_list(100)
+        await db.chat_messages.count_documents({
+            "student_id": {"$in": student_ids},
+            "timestamp": {"$gte": datetime.utcnow() - timedelta(days=7)}
+        })
+    ids = list(set(all_student_ids))
+    await db.chat_messages.count_documents({"student_id": {"$in": ids}})
+    await db.practice_attempts.count_documents({"student_id": {"$in": ids}})
+    await db.practice_attempts.aggregate([{"$match": {"student_id": {"$in": ids}}},
+                                          {"$group": {"_id": None, "avg_score": {"$avg": "$score"}}}]).to_list(1)
+    await db.chat_messages.aggregate([{"$match": {"student_id": {"$in": ids}}},
+                                      {"$group": {"_id": "$subject", "count": {"$sum": 1}}}]).to_list(10)
+    await server.weekly_activity_trend(ids)
+
+async def current_overview(db, teacher_id):
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    return await server.get_teacher_analytics_overview(request, {"sub": teacher_id, "user_type": "teacher"})
+
+async def measure(label, fn, db, teacher_id, counter, repeat):
+    await fn(db, teacher_id)
+    timings, commands = [], []
+    for _ in range(repeat):
+        counter.count = 0
+        start = time.perf_counter()
+        await fn(db, teacher_id)
+        timings.append(time.perf_counter() - start)
+        commands.append(counter.count)
+    print(f"{label}: mean {statistics.mean(timings) * 1000:.1f} ms, "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:.1f} ms, "
+          f"{statistics.mean(commands):.0f} MongoDB commands/request")
+
+async def main(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'), event_listeners=[counter])
+    db_name = f"bench_overview_{uuid.uuid4().hex[:8]}"
+    db = client[db_name]
+    server.db = db
+    try:
+        teacher_id = await seed(db, args.classes, args.students, args.messages)
+        await measure("per-class loop", legacy_overview, db, teacher_id, counter, args.repeat)
+        await measure("single pipeline", current_overview, db, teacher_id, counter, args.repeat)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--classes', type=int, default=30)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark: request throughput of the production server with 1 vs N workers.
+
+Starts gunicorn with backend/gunicorn.conf.py for each worker count against a
+scratch database on a local mongod, registers a student, then drives the
+student dashboard (MongoDB reads plus JSON rendering) from concurrent
+keep-alive connections and reports requests/second and latency percentiles.
+
+Requires httpx. Usage:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_workers.py --workers 1 4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from pymongo import MongoClient
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(workers: int, port: int, db_name: str) -> subprocess.Popen:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "DB_NAME": db_name, "MAX_REQUESTS": "0"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+         "--access-logfile", "/dev/null", "server:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+async def wait_until_up(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError("Server did not start")
+
+async def register_student(base_url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{base_url}/api/auth/register", json={
+            "email": f"bench_{uuid.uuid4().hex[:8]}@example.com", "password": "BenchPass123!",
+            "name": "Bench Student", "user_type": "student", "grade_level": "9th"
+        })
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def drive(base_url: str, headers: dict, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def user():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                response = await client.get("/api/dashboard")
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return latencies, errors, elapsed
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run(workers: int, args, db_name: str):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(workers, port, db_name)
+    try:
+        await wait_until_up(base_url)
+        headers = await register_student(base_url)
+        await drive(base_url, headers, args.concurrency, min(args.duration, 3))  # warm up
+        latencies, errors, elapsed = await drive(base_url, headers, args.concurrency, args.duration)
+        print(f"{workers} worker(s): {len(latencies) / elapsed:.0f} req/s, "
+              f"p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+              f"{errors} errors")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 2])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=15, help="Seconds of load per worker count")
+    args = parser.parse_args()
+
+    db_name = f"bench_workers_{uuid.uuid4().hex[:8]}"
+    mongo = MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    try:
+        for workers in args.workers:
+            asyncio.run(run(workers, args, db_name))
+    finally:
+        mongo.drop_database(db_name)
+        mongo.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""A stand-in for the ``google.generativeai`` module for offline load tests.
+
+Install it on the app's gateway before the lifespan starts::
+
+    server.llm._genai = FakeGemini(latency_ms=800)
+
+Each call blocks its gateway thread like the real SDK does, for a time-to-first-token
+drawn from a log-normal distribution (median ``latency_ms``, spread ``latency_sigma``)
+plus the completion's length at ``tokens_per_second``. Completion lengths are
+normally distributed around ``completion_tokens`` and capped by a
+``max_output_tokens`` generation config. Practice-question prompts
+get a JSON array of questions, so the practice bot's parser takes its normal
+path. ``error_rate`` of the calls fail after their latency.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+QUESTION_COUNT = re.compile(r"Generate (\d+) practice questions")
+WORDS = ("let's", "think", "about", "the", "problem", "step", "by", "what", "do", "you", "notice",
+         "first", "try", "equation", "because", "great", "question", "so", "next", "we")
+
+class FakeGeminiError(Exception):
+    pass
+
+class FakeGemini:
+    """Quacks like the parts of google.generativeai the gateway uses"""
+
+    def __init__(self, latency_ms: float = 800, latency_sigma: float = 0.5, tokens_per_second: float = 80,
+                 completion_tokens: int = 250, error_rate: float = 0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def configure(self, **kwargs):
+        pass
+
+    def GenerativeModel(self, model_name: str):
+        return SimpleNamespace(
+            generate_content=lambda prompt, generation_config=None: self.respond(prompt, generation_config)
+        )
+
+    def respond(self, prompt: str, generation_config: dict = None):
+        max_tokens = (generation_config or {}).get("max_output_tokens")
+        with self._lock:
+            self.calls += 1
+            first_token = self.latency_ms / 1000 * math.exp(self._random.gauss(0, self.latency_sigma))
+            completion = max(1, int(self._random.gauss(self.completion_tokens, self.completion_tokens / 4)))
+            completion = min(completion, max_tokens or completion)
+            fail = self._random.random() < self.error_rate
+            words = [self._random.choice(WORDS) for _ in range(completion)]
+
+        match = QUESTION_COUNT.search(prompt)
+        if match:
+            text = json.dumps(practice_questions(int(match.group(1))))
+            completion = len(text) // 4
+        else:
+            text = " ".join(words)
+
+        time.sleep(first_token + completion / self.tokens_per_second)
+        if fail:
+            with self._lock:
+                self.failures += 1
+            raise FakeGeminiError("503 The model is overloaded. Please try again later.")
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=completion)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+def practice_questions(count: int) -> list:
+    return [
+        {
+            "question_text": f"Fake question {i + 1}: what is {i} + {i}?",
+            "question_type": "mcq",
+            "options": [f"A. {2 * i}", f"B. {2 * i + 1}", f"C. {2 * i + 2}", f"D. {2 * i + 3}"],
+            "correct_answer": f"A. {2 * i}",
+            "explanation": "Adding a number to itself doubles it.",
+            "learning_objective": "Addition"
+        }
+        for i in range(count)
+    ]
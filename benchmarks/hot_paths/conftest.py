@@ -0,0 +1,14 @@
+"""Fixtures for the hot-path micro-benchmarks"""
+import os
+import random
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'backend'))
+
+@pytest.fixture
+def rng():
+    return random.Random(42)
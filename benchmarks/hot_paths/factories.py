@@ -0,0 +1,103 @@
+"""Synthetic documents shaped like what the routes read back from MongoDB.
+
+Callers pass a seeded random.Random so every run, and every saved baseline,
+measures the same data.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+
+SUBJECTS = ("math", "physics", "chemistry", "biology", "english", "history", "geography")
+
+def make_questions(count, rng):
+    """Stored practice question documents"""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "subject": rng.choice(SUBJECTS),
+            "topics": ["Algebra", "Linear Equations"],
+            "question_type": "mcq",
+            "difficulty": "medium",
+            "question_text": f"If 3x + {i} = {3 * i + i}, what is x? Explain each step of your reasoning.",
+            "options": [f"A. {i}", f"B. {i + 1}", f"C. {i + 2}", f"D. {i + 3}"],
+            "correct_answer": f"A. {i}",
+            "explanation": "Subtract the constant from both sides, then divide by the coefficient. " * 3,
+            "learning_objectives": ["Solve linear equations"],
+            "created_at": now
+        }
+        for i in range(count)
+    ]
+
+TOPICS = ("Algebra", "Linear Equations", "Quadratics", "Geometry", "Trigonometry", "Probability", "Statistics",
+          "Exponents", "Polynomials", "Coordinate Geometry", "Mensuration", "Number Systems")
+DIFFICULTIES = ("easy", "medium", "hard")
+
+def make_question_pool(count, rng):
+    """id, topics and difficulty of stored questions, as an adaptive pool loads them"""
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "topics": rng.sample(TOPICS, rng.randint(1, 3)),
+            "difficulty": rng.choice(DIFFICULTIES)
+        }
+        for _ in range(count)
+    ]
+
+def make_graded_answers(pool, count, rng):
+    """(question id, topics, correct) for a submission answering count questions of a pool"""
+    return [(question['id'], question['topics'], rng.random() < 0.6) for question in rng.sample(pool, count)]
+
+def make_attempt(questions, rng):
+    """A stored practice attempt answering questions, about 70% correctly"""
+    answers = {
+        question['id']: question['correct_answer'] if rng.random() < 0.7 else question['options'][-1]
+        for question in questions
+    }
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "student_id": "student",
+        "test_id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "questions": [question['id'] for question in questions],
+        "student_answers": answers,
+        "score": rng.uniform(0, 100),
+        "time_taken": rng.randint(60, 900),
+        "completed_at": datetime.utcnow() - timedelta(minutes=rng.randint(0, 10000))
+    }
+
+def make_roster(count, rng):
+    """Student summaries and materialized stats documents for a class"""
+    profiles, stats = [], []
+    for i in range(count):
+        student_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        profiles.append({
+            "user_id": student_id, "name": f"Student {i}", "grade_level": "9th",
+            "total_xp": rng.randint(0, 5000), "level": rng.randint(1, 20), "streak_days": rng.randint(0, 30),
+            "last_active": datetime.utcnow()
+        })
+        # Every fifth student has no activity yet, so has no stats document
+        if i % 5:
+            tests = rng.randint(0, 40)
+            stats.append({
+                "student_id": student_id, "total_messages": rng.randint(0, 500),
+                "messages_by_subject": {subject: rng.randint(0, 80) for subject in rng.sample(SUBJECTS, 3)},
+                "last_message_at": datetime.utcnow(), "total_tests": tests, "score_sum": tests * rng.uniform(40, 95),
+                "time_taken_sum": tests * rng.randint(60, 900), "mindfulness_sessions": rng.randint(0, 10),
+                "mindfulness_minutes": rng.randint(0, 120), "mood_delta_sum": rng.randint(0, 20), "mood_delta_count": rng.randint(0, 10)
+            })
+    return profiles, stats
+
+def make_llm_response(count):
+    """A practice bot reply: a JSON array wrapped in the model's chatter"""
+    questions = [
+        {
+            "question_text": f"What is the value of {i} squared?",
+            "question_type": ["mcq", "Multiple Choice", "short answer", "numeric"][i % 4],
+            "options": [f"A. {i * i}", f"B. {i * 2}", f"C. {i + 2}", f"D. {i}"],
+            "correct_answer": f"A. {i * i}",
+            "explanation": "Squaring a number multiplies it by itself.",
+            "learning_objective": "Exponents"
+        }
+        for i in range(count)
+    ]
+    return "Here are your practice questions:\n```json\n" + json.dumps(questions, indent=2) + "\n```\nGood luck!"
@@ -0,0 +1,78 @@
+"""Micro-benchmarks of the pure-Python work behind the busiest routes.
+
+Each benchmark runs at several input sizes; see bench_hot_paths.py for saving
+baselines and comparing against them.
+"""
+import pytest
+
+import mastery
+from factories import make_attempt, make_graded_answers, make_llm_response, make_question_pool, make_questions, make_roster
+from serialization import FastJSONResponse, trusted_list
+from server import (DifficultyLevel, PracticeQuestion, Subject, build_practice_results, combine_class_analytics,
+                    grade_answers, parse_practice_questions)
+
+@pytest.mark.parametrize("count", [5, 50, 500])
+def test_grade_answers(benchmark, rng, count):
+    """Grading in submit_practice_test"""
+    questions = make_questions(count, rng)
+    answers = list(make_attempt(questions, rng)['student_answers'].values())
+    correct, _ = benchmark(grade_answers, questions, answers)
+    assert 0 < correct <= count
+
+@pytest.mark.parametrize("attempts", [10, 100])
+@pytest.mark.parametrize("per_attempt", [5, 20])
+def test_build_practice_results(benchmark, rng, attempts, per_attempt):
+    """Result assembly in get_practice_results"""
+    questions_by_attempt = [make_questions(per_attempt, rng) for _ in range(attempts)]
+    stored = [make_attempt(questions, rng) for questions in questions_by_attempt]
+    results = benchmark(build_practice_results, stored, questions_by_attempt)
+    assert len(results) == attempts
+
+@pytest.mark.parametrize("students", [30, 300, 3000])
+def test_combine_class_analytics(benchmark, rng, students):
+    """Profile and stats join in get_class_analytics"""
+    profiles, stats = make_roster(students, rng)
+    analytics, metrics = benchmark(combine_class_analytics, profiles, stats)
+    assert len(analytics) == students
+
+@pytest.mark.parametrize("count", [5, 20, 50])
+def test_parse_practice_questions(benchmark, count):
+    """JSON parsing and model construction in generate_practice_questions"""
+    text = make_llm_response(count)
+    questions = benchmark(parse_practice_questions, text, Subject.MATH, ["Exponents"], DifficultyLevel.MEDIUM)
+    assert len(questions) == count
+
+@pytest.mark.parametrize("count", [5, 50, 500])
+def test_practice_question_models(benchmark, rng, count):
+    """Validating stored questions with pydantic and dumping them back to dicts"""
+    docs = make_questions(count, rng)
+    dumped = benchmark(lambda: [PracticeQuestion(**doc).dict() for doc in docs])
+    assert len(dumped) == count
+
+@pytest.mark.parametrize("count", [5, 50, 500])
+def test_trusted_serialization(benchmark, rng, count):
+    """The read path: trusted shaping plus orjson rendering"""
+    docs = make_questions(count, rng)
+    body = benchmark(lambda: FastJSONResponse(trusted_list(PracticeQuestion, docs)).body)
+    assert body.startswith(b"[")
+
+@pytest.mark.parametrize("pool_size", [500, 5000])
+@pytest.mark.parametrize("count", [10, 50])
+def test_select_adaptive_questions(benchmark, rng, pool_size, count):
+    """Scoring a question pool against a mastery vector in generate_adaptive_test"""
+    questions = make_question_pool(pool_size, rng)
+    pool = mastery.build_pool(questions)
+    student = mastery.empty_mastery()
+    for _ in range(20):
+        student = mastery.updated(student, make_graded_answers(questions, 10, rng))
+    picks = benchmark(mastery.select_questions, pool, student, count)
+    assert len(picks) == count
+
+@pytest.mark.parametrize("answers", [5, 50])
+def test_update_mastery(benchmark, rng, answers):
+    """Folding a submission into a mastery vector in submit_practice_test"""
+    questions = make_question_pool(500, rng)
+    student = mastery.updated(mastery.empty_mastery(), make_graded_answers(questions, 50, rng))
+    graded = make_graded_answers(questions, answers, rng)
+    result = benchmark(mastery.updated, student, graded)
+    assert result.version == student.version + 1
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Load test: replay student and teacher sessions against the app in-process.
+
+Runs backend/server.py inside this process, lifespan included, over httpx's
+ASGI transport. The app uses a scratch database on a local mongod; the
+in-memory mongomock stand-in can't run the app's aggregation projections
+(``$size``, ``$substrCP``). Gemini is replaced by ``FakeGemini`` (see
+fake_gemini.py) with the latency and token rate given on the command line.
+Nothing leaves the machine.
+
+Virtual students repeatedly log in and then chat, take a practice test
+(generate, submit, review results) or browse their dashboard and history,
+picked by ``--mix``. Virtual teachers log in and read their dashboard and
+analytics. Requests are separated by exponential think time. Throughput and
+p50/p95/p99 latency are reported per route. A request that doesn't get its
+expected status counts as an error; server errors (5xx) are also counted on
+their own, and an exception in one route doesn't stop the run.
+
+Requires httpx. Usage:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/load_test.py --students 40 --teachers 4 --duration 60
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/load_test.py --llm-latency-ms 1200 --llm-tokens-per-second 50 --json load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from fake_gemini import FakeGemini  # noqa: E402
+
+SUBJECTS = ("math", "physics", "chemistry", "biology", "english", "history", "geography")
+PASSWORD = "LoadTest123!"
+
+class RouteStats:
+    """Latencies and failures per route label"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.server_errors = defaultdict(int)
+
+    def add(self, route: str, seconds: float, ok: bool, status_code: int):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+        if status_code >= 500:
+            self.server_errors[route] += 1
+
+    def report(self, elapsed: float) -> list:
+        rows = []
+        for route in sorted(self.latencies):
+            latencies = sorted(self.latencies[route])
+            rows.append({
+                "route": route,
+                "requests": len(latencies),
+                "errors": self.errors[route],
+                "server_errors": self.server_errors[route],
+                "rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1)
+            })
+        return rows
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, stats: RouteStats, rng: random.Random, think: float):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.think = think
+        self.headers = {}
+
+    async def request(self, route: str, method: str, url: str, expect=200, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        self.stats.add(route, time.perf_counter() - started, response.status_code == expect, response.status_code)
+        if self.think:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think))
+        return response
+
+    async def login(self, email: str):
+        response = await self.request("POST /auth/login", "POST", "/api/auth/login", json={"email": email, "password": PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response.status_code == 200
+
+class Student(VirtualUser):
+    async def session(self, email: str, mix: dict):
+        if not await self.login(email):
+            return
+        activity = self.rng.choices(list(mix), weights=list(mix.values()))[0]
+        await getattr(self, activity)()
+
+    async def chat(self):
+        subject = self.rng.choice(SUBJECTS)
+        response = await self.request("POST /chat/session", "POST", "/api/chat/session", json={"subject": subject})
+        if response.status_code != 200:
+            return
+        session_id = response.json()['session_id']
+        for turn in range(self.rng.randint(1, 4)):
+            await self.request("POST /chat/message", "POST", "/api/chat/message", json={
+                "session_id": session_id, "subject": subject, "user_message": f"Can you help me with question {turn + 1}?"
+            })
+        await self.request("GET /chat/history", "GET", "/api/chat/history", params={"session_id": session_id})
+
+    async def practice(self):
+        subject = self.rng.choice(SUBJECTS)
+        response = await self.request("POST /practice/generate", "POST", "/api/practice/generate", json={
+            "subject": subject, "topics": ["Basics"], "difficulty": "medium", "question_count": 5
+        })
+        if response.status_code != 200:
+            return
+        questions = response.json()['questions']
+        answers = {
+            question['id']: question['correct_answer'] if self.rng.random() < 0.7 else (question.get('options') or [""])[-1]
+            for question in questions
+        }
+        await self.request("POST /practice/submit", "POST", "/api/practice/submit", json={
+            "test_id": response.json()['test_id'], "questions": [question['id'] for question in questions],
+            "student_answers": answers, "time_taken": self.rng.randint(60, 600)
+        })
+        await self.request("GET /practice/results", "GET", "/api/practice/results")
+        await self.request("GET /practice/stats/{subject}", "GET", f"/api/practice/stats/{subject}")
+
+    async def browse(self):
+        await self.request("GET /dashboard", "GET", "/api/dashboard")
+        await self.request("GET /student/classes", "GET", "/api/student/classes")
+        await self.request("GET /chat/history", "GET", "/api/chat/history")
+
+class Teacher(VirtualUser):
+    async def session(self, email: str, class_id: str, student_ids: list):
+        if not await self.login(email):
+            return
+        await self.request("GET /teacher/dashboard", "GET", "/api/teacher/dashboard")
+        await self.request("GET /teacher/analytics/overview", "GET", "/api/teacher/analytics/overview")
+        await self.request("GET /teacher/analytics/class/{class_id}", "GET", f"/api/teacher/analytics/class/{class_id}")
+        if student_ids:
+            student_id = self.rng.choice(student_ids)
+            await self.request("GET /teacher/analytics/student/{student_id}", "GET", f"/api/teacher/analytics/student/{student_id}")
+
+async def register(client: httpx.AsyncClient, user_type: str, index: int, run_id: str, **extra) -> dict:
+    response = await client.post("/api/auth/register", json={
+        "email": f"load_{run_id}_{user_type}_{index}@example.com", "password": PASSWORD,
+        "name": f"Load {user_type.title()} {index}", "user_type": user_type, **extra
+    })
+    response.raise_for_status()
+    body = response.json()
+    return {"email": body['user']['email'], "id": body['user']['id'], "headers": {"Authorization": f"Bearer {body['access_token']}"}}
+
+async def populate(client: httpx.AsyncClient, args, run_id: str):
+    """Teachers with one class each and students spread over the classes"""
+    teachers = await asyncio.gather(*(
+        register(client, "teacher", i, run_id, school_name="Load Test High") for i in range(args.teachers)
+    ))
+    for i, teacher in enumerate(teachers):
+        response = await client.post("/api/teacher/classes", headers=teacher['headers'], json={
+            "subject": SUBJECTS[i % len(SUBJECTS)], "class_name": f"Load Class {i}", "grade_level": "9th"
+        })
+        response.raise_for_status()
+        teacher.update(class_id=response.json()['class_id'], join_code=response.json()['join_code'], students=[])
+
+    students = await asyncio.gather(*(
+        register(client, "student", i, run_id, grade_level="9th") for i in range(args.students)
+    ))
+    for i, student in enumerate(students):
+        teacher = teachers[i % len(teachers)] if teachers else None
+        if teacher:
+            response = await client.post("/api/student/join-class", headers=student['headers'], json={"join_code": teacher['join_code']})
+            response.raise_for_status()
+            teacher['students'].append(student['id'])
+    return teachers, students
+
+async def run(server, args):
+    stats = RouteStats()
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:8]
+    mix = {name: float(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+    # Unhandled exceptions come back as 500s to be counted, instead of ending the run
+    transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            print(f"Populating {args.teachers} teachers and {args.students} students...")
+            teachers, students = await populate(client, args, run_id)
+            deadline = time.monotonic() + args.duration
+
+            async def student_loop(student):
+                user = Student(client, stats, random.Random(rng.random()), args.think)
+                while time.monotonic() < deadline:
+                    await user.session(student['email'], mix)
+
+            async def teacher_loop(teacher):
+                user = Teacher(client, stats, random.Random(rng.random()), args.think)
+                while time.monotonic() < deadline:
+                    await user.session(teacher['email'], teacher['class_id'], teacher['students'])
+
+            print(f"Running for {args.duration:.0f}s...")
+            started = time.monotonic()
+            await asyncio.gather(*(student_loop(s) for s in students), *(teacher_loop(t) for t in teachers))
+            elapsed = time.monotonic() - started
+    return stats, elapsed
+
+def configure_environment(args):
+    """Point the app at a scratch database and lift limits that would skew a load test"""
+    os.environ['DB_NAME'] = args.db_name
+    os.environ['LLM_DAILY_USER_TOKENS'] = "0"
+    os.environ['LLM_DAILY_SCHOOL_TOKENS'] = "0"
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--teachers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=60, help="Seconds of load after populating")
+    parser.add_argument('--think', type=float, default=0.5, help="Mean seconds between a user's requests")
+    parser.add_argument('--mix', default="chat=5,practice=3,browse=2", help="Weights of the student activities")
+    parser.add_argument('--llm-latency-ms', type=float, default=800, help="Median fake Gemini latency before tokens")
+    parser.add_argument('--llm-latency-sigma', type=float, default=0.5, help="Log-normal spread of that latency")
+    parser.add_argument('--llm-tokens-per-second', type=float, default=80)
+    parser.add_argument('--llm-completion-tokens', type=int, default=250, help="Mean chat completion length")
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--db-name', default=f"load_test_{uuid.uuid4().hex[:8]}")
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch database afterwards")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Write the per-route results to this file")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    import server
+
+    fake = FakeGemini(latency_ms=args.llm_latency_ms, latency_sigma=args.llm_latency_sigma,
+                      tokens_per_second=args.llm_tokens_per_second, completion_tokens=args.llm_completion_tokens,
+                      error_rate=args.llm_error_rate, seed=args.seed)
+    server.llm._genai = fake
+
+    try:
+        stats, elapsed = asyncio.run(run(server, args))
+    finally:
+        if not args.keep:
+            from pymongo import MongoClient
+            mongo = MongoClient(server.mongo_url)
+            mongo.drop_database(args.db_name)
+            mongo.close()
+
+    rows = stats.report(elapsed)
+    total = sum(row['requests'] for row in rows)
+    errors = sum(row['errors'] for row in rows)
+    server_errors = sum(row['server_errors'] for row in rows)
+    print(f"\n{'route':<44} {'reqs':>7} {'errs':>5} {'5xx':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        print(f"{row['route']:<44} {row['requests']:>7} {row['errors']:>5} {row['server_errors']:>5} {row['rps']:>7.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), {errors} errors ({server_errors} 5xx), {fake.calls} fake Gemini calls")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"elapsed_seconds": elapsed, "requests": total, "errors": errors, "server_errors": server_errors,
+                       "llm_calls": fake.calls, "routes": rows}, out, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import requests
+import unittest
+import uuid
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+class TestChatHistoryPagination(unittest.TestCase):
+    """Test cases for keyset-paginated chat history"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Register a student and send a few messages in one session"""
+        print("\n🔍 Registering a student account...")
+        response = requests.post(f"{API_URL}/auth/register", json={
+            "email": f"student_history_{uuid.uuid4()}@example.com",
+            "password": "SecurePass123!",
+            "name": "History Test Student",
+            "user_type": "student",
+            "grade_level": "10th"
+        })
+        assert response.status_code == 200, f"Failed to register student: {response.text}"
+        data = response.json()
+        cls.headers = {"Authorization": f"Bearer {data['access_token']}"}
+        cls.student_id = data["user"]["id"]
+
+        response = requests.post(f"{API_URL}/chat/session", json={"subject": "math"}, headers=cls.headers)
+        assert response.status_code == 200, f"Failed to create session: {response.text}"
+        cls.session_id = response.json()["session_id"]
+
+        cls.message_ids = []
+        for question in ["What is 2 + 2?", "What is a prime number?", "What is an equation?"]:
+            response = requests.post(f"{API_URL}/chat/message", json={
+                "session_id": cls.session_id,
+                "subject": "math",
+                "user_message": question
+            }, headers=cls.headers)
+            assert response.status_code == 200, f"Failed to send message: {response.text}"
+            cls.message_ids.append(response.json()["id"])
+        print(f"Sent {len(cls.message_ids)} messages in session {cls.session_id}")
+
+    def test_01_first_page_is_newest(self):
+        """The first page holds the newest messages in chronological order"""
+        print("\n🔍 Testing first page of chat history...")
+        response = requests.get(f"{API_URL}/chat/history/page", params={"limit": 2}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual([m["id"] for m in data["messages"]], self.message_ids[1:])
+        self.assertTrue(data["has_older"])
+        self.assertFalse(data["has_newer"])
+        self.assertIsNotNone(data["older_cursor"])
+
+        for message in data["messages"]:
+            self.assertNotIn("bot_response", message, "List view should not include full bot responses")
+            self.assertIn("bot_response_preview", message)
+        print("✅ First page test passed")
+
+    def test_02_page_backwards_and_forwards(self):
+        """Cursors page to older messages and back to newer ones"""
+        print("\n🔍 Testing cursor navigation...")
+        first = requests.get(f"{API_URL}/chat/history/page", params={"limit": 2}, headers=self.headers).json()
+
+        older = requests.get(f"{API_URL}/chat/history/page", params={"limit": 2, "before": first["older_cursor"]}, headers=self.headers).json()
+        self.assertEqual([m["id"] for m in older["messages"]], self.message_ids[:1])
+        self.assertFalse(older["has_older"])
+        self.assertTrue(older["has_newer"])
+
+        newer = requests.get(f"{API_URL}/chat/history/page", params={"limit": 2, "after": older["newer_cursor"]}, headers=self.headers).json()
+        self.assertEqual([m["id"] for m in newer["messages"]], self.message_ids[1:])
+        self.assertFalse(newer["has_newer"])
+        print("✅ Cursor navigation test passed")
+
+    def test_03_session_filter(self):
+        """Filtering by an unknown session returns nothing"""
+        print("\n🔍 Testing session filter...")
+        response = requests.get(f"{API_URL}/chat/history/page", params={"session_id": str(uuid.uuid4())}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["messages"], [])
+
+        response = requests.get(f"{API_URL}/chat/history/page", params={"session_id": self.session_id}, headers=self.headers)
+        self.assertEqual(len(response.json()["messages"]), len(self.message_ids))
+        print("✅ Session filter test passed")
+
+    def test_04_expand_message(self):
+        """Expanding a message returns the full bot response"""
+        print("\n🔍 Testing message expansion...")
+        response = requests.get(f"{API_URL}/chat/messages/{self.message_ids[0]}", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["student_id"], self.student_id)
+        self.assertIsNotNone(data.get("bot_response"))
+        print("✅ Message expansion test passed")
+
+    def test_05_legacy_history_returns_newest(self):
+        """The legacy list endpoint returns the newest messages, oldest first"""
+        print("\n🔍 Testing legacy chat history...")
+        response = requests.get(f"{API_URL}/chat/history", params={"limit": 2}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["id"] for m in response.json()], self.message_ids[1:])
+        print("✅ Legacy chat history test passed")
+
+    def test_06_invalid_cursor(self):
+        """A malformed cursor is rejected"""
+        response = requests.get(f"{API_URL}/chat/history/page", params={"before": "not-a-cursor"}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import requests
+import unittest
+import uuid
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+# Optional: a token of an account listed in the backend's ADMIN_EMAILS
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def register(user_type, **extra):
+    response = requests.post(f"{API_URL}/auth/register", json={
+        "email": f"{user_type}_etag_{uuid.uuid4()}@example.com",
+        "password": "SecurePass123!",
+        "name": f"ETag Test {user_type.title()}",
+        "user_type": user_type,
+        **extra
+    })
+    assert response.status_code == 200, f"Failed to register {user_type}: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+class TestConditionalGet(unittest.TestCase):
+    """Test ETag / If-None-Match handling on dashboard, class and calendar endpoints"""
+
+    def setUp(self):
+        self.student_headers = register("student", grade_level="9th")
+        self.teacher_headers = register("teacher", school_name="ETag High")
+
+    def assert_revalidates(self, url, headers):
+        """A repeated GET with the returned ETag gets 304 and an empty body"""
+        first = requests.get(url, headers=headers)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers.get("ETag")
+        self.assertIsNotNone(etag, f"{url} should return an ETag")
+
+        second = requests.get(url, headers={**headers, "If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        return etag
+
+    def test_01_student_dashboard(self):
+        """Student dashboard revalidates until the student writes something"""
+        print("\n🔍 Testing student dashboard ETag...")
+        url = f"{API_URL}/dashboard"
+        etag = self.assert_revalidates(url, self.student_headers)
+
+        requests.post(f"{API_URL}/calendar/events", json={
+            "title": "Revise algebra",
+            "event_type": "study_session",
+            "start_time": "2030-01-01T10:00:00",
+            "end_time": "2030-01-01T11:00:00"
+        }, headers=self.student_headers)
+
+        response = requests.get(url, headers={**self.student_headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200, "A write should invalidate the ETag")
+        self.assertNotEqual(response.headers.get("ETag"), etag)
+        print("✅ Student dashboard ETag test passed")
+
+    def test_02_calendar(self):
+        """Calendar events revalidate"""
+        print("\n🔍 Testing calendar ETag...")
+        self.assert_revalidates(f"{API_URL}/calendar/events", self.student_headers)
+        print("✅ Calendar ETag test passed")
+
+    def test_03_teacher_classes_follow_student_joins(self):
+        """A student joining a class invalidates the teacher's class list"""
+        print("\n🔍 Testing teacher class list ETag...")
+        response = requests.post(f"{API_URL}/teacher/classes", json={
+            "subject": "physics",
+            "class_name": "ETag Physics",
+            "grade_level": "9th"
+        }, headers=self.teacher_headers)
+        join_code = response.json()["join_code"]
+
+        url = f"{API_URL}/teacher/classes"
+        etag = self.assert_revalidates(url, self.teacher_headers)
+        self.assert_revalidates(f"{API_URL}/teacher/dashboard", self.teacher_headers)
+
+        requests.post(f"{API_URL}/student/join-class", json={"join_code": join_code}, headers=self.student_headers)
+
+        response = requests.get(url, headers={**self.teacher_headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["student_count"], 1)
+        print("✅ Teacher class list ETag test passed")
+
+    def test_04_etags_are_per_user(self):
+        """One user's ETag never matches another user's view"""
+        other_headers = register("student", grade_level="9th")
+        etag = requests.get(f"{API_URL}/dashboard", headers=self.student_headers).headers["ETag"]
+        response = requests.get(f"{API_URL}/dashboard", headers={**other_headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_05_metrics(self):
+        """The 304 rate is reported per endpoint, to administrators only"""
+        self.assert_revalidates(f"{API_URL}/calendar/events", self.student_headers)
+        response = requests.get(f"{API_URL}/metrics/conditional-get", headers=self.student_headers)
+        self.assertEqual(response.status_code, 403)
+        if not ADMIN_TOKEN:
+            self.skipTest("ADMIN_TOKEN not set")
+        stats = requests.get(f"{API_URL}/metrics/conditional-get", headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}).json()
+        self.assertGreater(stats["calendar"]["not_modified"], 0)
+        self.assertGreater(stats["calendar"]["not_modified_rate"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,17 +5,33 @@ set -e
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
 echo "Starting FastAPI backend"
-# Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+# Production mode runs gunicorn with auto-sized uvicorn workers (see
+# backend/gunicorn.conf.py); SERVE_MODE=single runs one uvicorn process
+if [ "${SERVE_MODE:-production}" = "single" ]; then
+    uvicorn server:app --host 0.0.0.0 --port 8001 &
+else
+    export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+    gunicorn -c gunicorn.conf.py --bind 0.0.0.0:8001 server:app &
+fi
 BACKEND_PID=$!
 
-echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+echo "Waiting for backend to become ready..."
+READY_TIMEOUT=${READY_TIMEOUT:-60}
+WAITED=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/health/ready 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ "$WAITED" -ge "$((READY_TIMEOUT * 4))" ]; then
+        echo "Backend not ready after ${READY_TIMEOUT}s, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 0.25
+    WAITED=$((WAITED + 1))
+done
+echo "Backend ready after about $((WAITED / 4))s"
 
 # Start Nginx
 nginx -g 'daemon off;' &
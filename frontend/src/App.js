@@ -2822,7 +2822,7 @@ const TeacherDashboard = ({ teacher, onLogout }) => {
               </div>
               <div>
                 <div className="text-2xl font-bold text-gray-900">
-                  {classes.reduce((total, cls) => total + cls.students.length, 0)}
+                  {classes.reduce((total, cls) => total + (cls.student_count ?? cls.students?.length ?? 0), 0)}
                 </div>
                 <div className="text-sm text-gray-600">Total Students</div>
               </div>
@@ -2880,7 +2880,7 @@ const TeacherDashboard = ({ teacher, onLogout }) => {
                   <p className="text-sm text-gray-600 mb-4">{classItem.description}</p>
                   <div className="flex justify-between items-center text-sm">
                     <span className="text-gray-600">Grade {classItem.grade_level}</span>
-                    <span className="text-gray-600">{classItem.students.length} students</span>
+                    <span className="text-gray-600">{classItem.student_count ?? classItem.students?.length ?? 0} students</span>
                   </div>
                 </div>
               ))}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import requests
+import unittest
+import uuid
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+# Optional: a token of an account listed in the backend's ADMIN_EMAILS
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+class TestLLMUsage(unittest.TestCase):
+    """Test LLM usage accounting endpoints and budget enforcement"""
+
+    def setUp(self):
+        response = requests.post(f"{API_URL}/auth/register", json={
+            "email": f"student_usage_{uuid.uuid4()}@example.com",
+            "password": "SecurePass123!",
+            "name": "Usage Test Student",
+            "user_type": "student",
+            "grade_level": "9th"
+        })
+        self.assertEqual(response.status_code, 200, f"Failed to register student: {response.text}")
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        self.user_id = response.json()['user']['id']
+
+    def test_01_usage_requires_admin(self):
+        """Usage summaries are only served to administrators"""
+        print("\n🔍 Testing usage endpoints reject non-admins...")
+        response = requests.get(f"{API_URL}/admin/llm-usage", headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+        response = requests.get(f"{API_URL}/admin/llm-usage/user/{self.user_id}", headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+        print("✅ Non-admins are rejected")
+
+    def test_02_chat_is_recorded(self):
+        """A chat message is charged to the student"""
+        if not ADMIN_TOKEN:
+            self.skipTest("ADMIN_TOKEN not set")
+        print("\n🔍 Testing chat usage is recorded...")
+        session = requests.post(f"{API_URL}/chat/session", headers=self.headers, json={"subject": "math"})
+        self.assertEqual(session.status_code, 200, session.text)
+        response = requests.post(f"{API_URL}/chat/message", headers=self.headers, json={
+            "session_id": session.json()['session_id'],
+            "subject": "math",
+            "user_message": "What is 2 + 2?"
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+
+        admin_headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+        usage = requests.get(f"{API_URL}/admin/llm-usage/user/{self.user_id}", headers=admin_headers)
+        self.assertEqual(usage.status_code, 200, usage.text)
+        self.assertGreater(usage.json()['used_today'], 0)
+
+        summary = requests.get(f"{API_URL}/admin/llm-usage", params={"group_by": "bot", "days": 1}, headers=admin_headers)
+        self.assertEqual(summary.status_code, 200, summary.text)
+        self.assertIn("math_bot", [row['bot'] for row in summary.json()['rows']])
+        print(f"✅ {usage.json()['used_today']} tokens recorded")
+
+if __name__ == "__main__":
+    unittest.main()
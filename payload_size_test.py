@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import requests
+import unittest
+import uuid
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+# Upper bounds on response sizes (bytes) for the summary views
+CLASS_LIST_BYTES_PER_CLASS = 400
+TEACHER_DASHBOARD_MAX_BYTES = 12000
+CLASS_ANALYTICS_BYTES_PER_STUDENT = 700
+
+def register(user_type, **extra):
+    payload = {
+        "email": f"{user_type}_payload_{uuid.uuid4()}@example.com",
+        "password": "SecurePass123!",
+        "name": f"Payload Test {user_type.title()}",
+        "user_type": user_type,
+        **extra
+    }
+    response = requests.post(f"{API_URL}/auth/register", json=payload)
+    assert response.status_code == 200, f"Failed to register {user_type}: {response.text}"
+    data = response.json()
+    return {"Authorization": f"Bearer {data['access_token']}"}, data["user"]["id"]
+
+class TestSummaryPayloadSizes(unittest.TestCase):
+    """Test that list and overview endpoints send slim summaries"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a teacher with a class of students who have chatted"""
+        print("\n🔍 Setting up teacher, class and students...")
+        cls.teacher_headers, cls.teacher_id = register("teacher", school_name="Payload High")
+
+        response = requests.post(f"{API_URL}/teacher/classes", json={
+            "subject": "math",
+            "class_name": "Payload Algebra",
+            "grade_level": "10th",
+            "description": "Payload size checks"
+        }, headers=cls.teacher_headers)
+        assert response.status_code == 200, f"Failed to create class: {response.text}"
+        cls.class_id = response.json()["class_id"]
+        join_code = response.json()["join_code"]
+
+        cls.student_count = 3
+        for _ in range(cls.student_count):
+            headers, _ = register("student", grade_level="10th")
+            requests.post(f"{API_URL}/student/join-class", json={"join_code": join_code}, headers=headers)
+            session = requests.post(f"{API_URL}/chat/session", json={"subject": "math"}, headers=headers).json()
+            requests.post(f"{API_URL}/chat/message", json={
+                "session_id": session["session_id"],
+                "subject": "math",
+                "user_message": "Can you explain the quadratic formula in detail?"
+            }, headers=headers)
+
+    def test_01_teacher_classes_summary(self):
+        """Class list carries a student count instead of the roster"""
+        print("\n🔍 Testing teacher class list payload...")
+        response = requests.get(f"{API_URL}/teacher/classes", headers=self.teacher_headers)
+        self.assertEqual(response.status_code, 200)
+        classes = response.json()
+
+        self.assertEqual(len(classes), 1)
+        self.assertNotIn("students", classes[0])
+        self.assertEqual(classes[0]["student_count"], self.student_count)
+        self.assertLessEqual(len(response.content), CLASS_LIST_BYTES_PER_CLASS * len(classes))
+        print(f"Class list payload: {len(response.content)} bytes")
+        print("✅ Teacher class list payload test passed")
+
+    def test_02_teacher_dashboard_summary(self):
+        """Dashboard recent activity omits full bot responses"""
+        print("\n🔍 Testing teacher dashboard payload...")
+        response = requests.get(f"{API_URL}/teacher/dashboard", headers=self.teacher_headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data["stats"]["total_students"], self.student_count)
+        for message in data["recent_activity"]:
+            self.assertNotIn("bot_response", message)
+        self.assertLessEqual(len(response.content), TEACHER_DASHBOARD_MAX_BYTES)
+        print(f"Teacher dashboard payload: {len(response.content)} bytes")
+        print("✅ Teacher dashboard payload test passed")
+
+    def test_03_class_analytics_summary(self):
+        """Class analytics carries student summaries, not full profiles"""
+        print("\n🔍 Testing class analytics payload...")
+        response = requests.get(f"{API_URL}/teacher/analytics/class/{self.class_id}", headers=self.teacher_headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertNotIn("students", data["class_info"])
+        for analytics in data["student_analytics"].values():
+            self.assertNotIn("email", analytics["profile"])
+            self.assertNotIn("joined_classes", analytics["profile"])
+        self.assertLessEqual(len(response.content), CLASS_ANALYTICS_BYTES_PER_STUDENT * self.student_count + 1000)
+        print(f"Class analytics payload: {len(response.content)} bytes")
+        print("✅ Class analytics payload test passed")
+
+if __name__ == "__main__":
+    unittest.main()
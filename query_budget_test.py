@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Query budgets: fails when an endpoint issues more MongoDB commands than budgeted.
+
+Run against a backend started with QUERY_DEBUG=1, which reports the commands
+behind each response in the X-Query-Count and X-Query-Repeats headers.
+"""
+import requests
+import unittest
+import uuid
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+# Maximum MongoDB commands per request, counted with cold per-worker caches
+BUDGETS = {
+    "dashboard": 8,
+    "practice_results": 3,
+    "class_analytics": 8,
+    "student_analytics": 18,
+}
+
+class TestQueryBudgets(unittest.TestCase):
+    """Hold the read-heavy endpoints to their query budgets"""
+
+    @classmethod
+    def setUpClass(cls):
+        teacher = requests.post(f"{API_URL}/auth/register", json={
+            "email": f"teacher_budget_{uuid.uuid4()}@example.com",
+            "password": "SecurePass123!",
+            "name": "Budget Test Teacher",
+            "user_type": "teacher",
+            "school_name": "Budget High"
+        })
+        assert teacher.status_code == 200, f"Failed to register teacher: {teacher.text}"
+        cls.teacher_headers = {"Authorization": f"Bearer {teacher.json()['access_token']}"}
+
+        student = requests.post(f"{API_URL}/auth/register", json={
+            "email": f"student_budget_{uuid.uuid4()}@example.com",
+            "password": "SecurePass123!",
+            "name": "Budget Test Student",
+            "user_type": "student",
+            "grade_level": "9th"
+        })
+        assert student.status_code == 200, f"Failed to register student: {student.text}"
+        cls.student_headers = {"Authorization": f"Bearer {student.json()['access_token']}"}
+        cls.student_id = student.json()['user']['id']
+
+        classroom = requests.post(f"{API_URL}/teacher/classes", headers=cls.teacher_headers, json={
+            "subject": "math",
+            "class_name": "Budget Math",
+            "grade_level": "9th"
+        })
+        assert classroom.status_code == 200, f"Failed to create class: {classroom.text}"
+        cls.class_id = classroom.json()['class_id']
+
+        joined = requests.post(f"{API_URL}/student/join-class", headers=cls.student_headers,
+                               json={"join_code": classroom.json()['join_code']})
+        assert joined.status_code == 200, f"Failed to join class: {joined.text}"
+
+        # Results load the questions of every attempt; several attempts over
+        # the same stored questions must still batch into one query
+        test = requests.post(f"{API_URL}/practice/generate", headers=cls.student_headers, json={
+            "subject": "math",
+            "topics": ["Linear Equations"],
+            "difficulty": "easy",
+            "question_count": 5
+        })
+        assert test.status_code == 200, f"Failed to generate a practice test: {test.text}"
+        questions = test.json()['questions']
+        for answer_correctly in (True, False, True):
+            submitted = requests.post(f"{API_URL}/practice/submit", headers=cls.student_headers, json={
+                "test_id": test.json()['test_id'],
+                "questions": [q['id'] for q in questions],
+                "student_answers": {q['id']: q['correct_answer'] if answer_correctly else "" for q in questions},
+                "time_taken": 90
+            })
+            assert submitted.status_code == 200, f"Failed to submit a practice test: {submitted.text}"
+
+    def assert_within_budget(self, response, budget_name, allowed_repeats=0):
+        self.assertEqual(response.status_code, 200, response.text)
+        if "X-Query-Count" not in response.headers:
+            self.skipTest("Backend is not running with QUERY_DEBUG=1")
+        count = int(response.headers["X-Query-Count"])
+        repeats = int(response.headers["X-Query-Repeats"])
+        print(f"   {budget_name}: {count} queries (budget {BUDGETS[budget_name]}), {repeats} repeated shapes")
+        self.assertLessEqual(count, BUDGETS[budget_name], f"{budget_name} is over its query budget")
+        self.assertLessEqual(repeats, allowed_repeats, f"{budget_name} repeats a query shape (possible N+1)")
+
+    def test_01_student_dashboard(self):
+        """Student dashboard stays within its query budget"""
+        print("\n🔍 Testing student dashboard query budget...")
+        response = requests.get(f"{API_URL}/dashboard", headers=self.student_headers)
+        self.assert_within_budget(response, "dashboard")
+        print("✅ Student dashboard within budget")
+
+    def test_02_practice_results(self):
+        """Practice results stay within their query budget"""
+        print("\n🔍 Testing practice results query budget...")
+        response = requests.get(f"{API_URL}/practice/results", headers=self.student_headers)
+        self.assert_within_budget(response, "practice_results")
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(int(response.headers["X-Query-Repeats"]), 0)
+        print("✅ Practice results within budget")
+
+    def test_03_class_analytics(self):
+        """Class analytics stay within their query budget"""
+        print("\n🔍 Testing class analytics query budget...")
+        response = requests.get(f"{API_URL}/teacher/analytics/class/{self.class_id}", headers=self.teacher_headers)
+        self.assert_within_budget(response, "class_analytics")
+        print("✅ Class analytics within budget")
+
+    def test_04_student_analytics(self):
+        """Student analytics stay within their query budget"""
+        print("\n🔍 Testing student analytics query budget...")
+        response = requests.get(f"{API_URL}/teacher/analytics/student/{self.student_id}", headers=self.teacher_headers)
+        # The per-subject recent-message queries are one indexed query per
+        # subject, issued concurrently, and are the only repeat allowed
+        self.assert_within_budget(response, "student_analytics", allowed_repeats=1)
+        print("✅ Student analytics within budget")
+
+if __name__ == "__main__":
+    unittest.main()
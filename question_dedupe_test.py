@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+import sys
+import unittest
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+try:
+    from mongomock_motor import AsyncMongoMockClient
+except ImportError:
+    AsyncMongoMockClient = None
+
+import maintenance
+import question_index
+
+OPTIONS = ["A. Paris", "B. Madrid", "C. Rome", "D. Berlin"]
+
+def stored_question(text, answer, minutes_ago):
+    """A practice question as stored before fingerprints existed"""
+    return {
+        "id": str(uuid.uuid4()),
+        "subject": "geography",
+        "topics": ["Capitals"],
+        "question_type": "mcq",
+        "difficulty": "easy",
+        "question_text": text,
+        "options": OPTIONS,
+        "correct_answer": answer,
+        "explanation": "Capitals of Europe.",
+        "created_at": datetime.utcnow() - timedelta(minutes=minutes_ago)
+    }
+
+@unittest.skipIf(AsyncMongoMockClient is None, "needs mongomock-motor")
+class TestQuestionDedupe(unittest.TestCase):
+    """Test the dedupe-questions job against stored questions"""
+
+    def setUp(self):
+        self.db = AsyncMongoMockClient()[f"dedupe_{uuid.uuid4().hex[:8]}"]
+        self.france = stored_question("What is the capital city of France?", "A. Paris", 10)
+        self.spain = stored_question("What is the capital city of Spain?", "B. Madrid", 5)
+
+    def run_job(self, **options):
+        args = argparse.Namespace(**{"dry_run": False, "prune": True, "batch_size": 100, **options})
+        asyncio.run(maintenance.dedupe_questions(self.db, args))
+
+    def find(self, question_id):
+        return asyncio.run(self.db.practice_questions.find_one({"id": question_id}, {"_id": 0}))
+
+    def test_01_answers_keep_similar_questions_apart(self):
+        """Questions worded alike but with different answers aren't marked or pruned"""
+        print("\n🔍 Testing dedupe of questions with different answers...")
+        asyncio.run(self.db.practice_questions.insert_many([self.france, self.spain]))
+        self.run_job()
+
+        spain = self.find(self.spain['id'])
+        self.assertIsNotNone(spain, "Spain question was pruned")
+        self.assertNotIn("duplicate_of", spain)
+        self.assertEqual(spain['fingerprint']['answer'], question_index.normalize("B. Madrid"))
+        print("✅ Different answers keep questions apart")
+
+    def test_02_regeneration_reuses_backfilled_question(self):
+        """A regenerated copy of a backfilled question is served from the store"""
+        print("\n🔍 Testing reuse of a backfilled question...")
+        asyncio.run(self.db.practice_questions.insert_many([self.france, self.spain]))
+        self.run_job()
+
+        regenerated = stored_question("What is the capital city of France?", "A. Paris", 0)
+        served = asyncio.run(question_index.store_questions(self.db, [regenerated]))
+        self.assertEqual(served[0]['id'], self.france['id'])
+        self.assertEqual(asyncio.run(self.db.practice_questions.count_documents({})), 2)
+        print("✅ Regenerated question reused")
+
+    def test_03_prune_keeps_assigned_repeats(self):
+        """Repeats an assignment references survive --prune; unreferenced ones are deleted"""
+        print("\n🔍 Testing prune of assigned repeats...")
+        assigned = stored_question("What is the capital city of France?", "A. Paris", 8)
+        unused = stored_question("What is the capital city of France?", "A. Paris", 6)
+        asyncio.run(self.db.practice_questions.insert_many([self.france, assigned, unused]))
+        asyncio.run(self.db.assignments.insert_one({"id": str(uuid.uuid4()), "question_ids": [assigned['id']]}))
+        self.run_job()
+
+        kept = self.find(assigned['id'])
+        self.assertIsNotNone(kept, "Assigned repeat was pruned")
+        self.assertEqual(kept['duplicate_of'], self.france['id'])
+        self.assertIsNone(self.find(unused['id']))
+        print("✅ Assigned repeats kept")
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
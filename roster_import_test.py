@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import requests
+import unittest
+import uuid
+import json
+from dotenv import load_dotenv
+import os
+import sys
+
+# Load environment variables from frontend/.env to get the backend URL
+load_dotenv('/app/frontend/.env')
+
+# Get the backend URL from environment variables
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL')
+if not BACKEND_URL:
+    print("Error: REACT_APP_BACKEND_URL not found in environment variables")
+    sys.exit(1)
+
+# Add /api prefix to the backend URL
+API_URL = f"{BACKEND_URL}/api"
+print(f"Using API URL: {API_URL}")
+
+class TestRosterImport(unittest.TestCase):
+    """Test bulk roster provisioning from CSV and JSON"""
+
+    def setUp(self):
+        response = requests.post(f"{API_URL}/auth/register", json={
+            "email": f"teacher_roster_{uuid.uuid4()}@example.com",
+            "password": "SecurePass123!",
+            "name": "Roster Test Teacher",
+            "user_type": "teacher",
+            "school_name": "Roster High"
+        })
+        self.assertEqual(response.status_code, 200, f"Failed to register teacher: {response.text}")
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        self.prefix = uuid.uuid4().hex[:8]
+
+    def import_roster(self, body, content_type):
+        response = requests.post(f"{API_URL}/teacher/roster/import", data=body,
+                                 headers={**self.headers, "Content-Type": content_type})
+        self.assertEqual(response.status_code, 200, response.text)
+        events = [json.loads(line) for line in response.text.splitlines() if line]
+        self.assertEqual(events[-1]["stage"], "complete", events[-1])
+        return events
+
+    def test_01_csv_roster_creates_students_and_class(self):
+        """CSV roster creates accounts, a class with a join code and memberships"""
+        print("\n🔍 Testing CSV roster import...")
+        body = "email,name,grade_level,class_name,subject,password\n" + "\n".join(
+            f"{self.prefix}_{i}@example.com,Student {i},9th,Period 1,math,SecurePass123!" for i in range(5)
+        )
+        events = self.import_roster(body, "text/csv")
+        summary = events[-1]
+        self.assertEqual(summary["created"], 5)
+        self.assertEqual(len(summary["classes"]), 1)
+        self.assertEqual(summary["classes"][0]["added"], 5)
+        self.assertTrue(any(event["stage"] == "hashing" for event in events))
+
+        login = requests.post(f"{API_URL}/auth/login", json={"email": f"{self.prefix}_0@example.com", "password": "SecurePass123!"})
+        self.assertEqual(login.status_code, 200)
+        classes = requests.get(f"{API_URL}/student/classes", headers={"Authorization": f"Bearer {login.json()['access_token']}"})
+        self.assertEqual([cls["class_id"] for cls in classes.json()], [summary["classes"][0]["class_id"]])
+        print("✅ CSV roster import test passed")
+
+    def test_02_json_roster_reports_problems(self):
+        """Invalid rows, duplicates and existing accounts are reported; missing passwords are generated"""
+        print("\n🔍 Testing JSON roster import errors...")
+        students = [
+            {"email": f"{self.prefix}_a@example.com", "name": "A", "grade_level": "10th"},
+            {"email": f"{self.prefix}_a@example.com", "name": "A again", "grade_level": "10th"},
+            {"email": f"{self.prefix}_b@example.com", "name": "B", "grade_level": "not a grade"},
+        ]
+        summary = self.import_roster(json.dumps({"students": students}), "application/json")[-1]
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual(sorted(error["row"] for error in summary["errors"]), [2, 3])
+        self.assertEqual([credential["email"] for credential in summary["credentials"]], [f"{self.prefix}_a@example.com"])
+
+        login = requests.post(f"{API_URL}/auth/login", json=summary["credentials"][0])
+        self.assertEqual(login.status_code, 200)
+
+        again = self.import_roster(json.dumps(students[:1]), "application/json")[-1]
+        self.assertEqual(again["created"], 0)
+        self.assertEqual(again["skipped"], [f"{self.prefix}_a@example.com"])
+        print("✅ JSON roster import test passed")
+
+    def test_03_students_cannot_import(self):
+        """Only teachers can import rosters"""
+        print("\n🔍 Testing roster import access control...")
+        response = requests.post(f"{API_URL}/auth/register", json={
+            "email": f"student_roster_{uuid.uuid4()}@example.com",
+            "password": "SecurePass123!",
+            "name": "Roster Test Student",
+            "user_type": "student",
+            "grade_level": "9th"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}", "Content-Type": "application/json"}
+        response = requests.post(f"{API_URL}/teacher/roster/import", data="[]", headers=headers)
+        self.assertEqual(response.status_code, 403)
+        print("✅ Roster import access control test passed")
+
+if __name__ == "__main__":
+    unittest.main()